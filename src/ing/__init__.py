@@ -1,6 +1,11 @@
 from .any_data_source_reader import AnyDataSourceReader
 from .data_manager import DataManager
+from .interface_source_data_reader import MessageDeduplicator, MessageFilter
+from .ingest_cache import IngestCache
+from .dataframe_file_formats import read_te_edges
 from .transfer_entropy_calculator import TransferEntropyCalculator
+from .te_series_options import TeSeriesOptions
+from .scenario_batch_runner import ScenarioBatchRunner, ScenarioSpec
 from .news_domain_identifier import NewsDomainIdentifier
 from .news_domain_classifier import NewsDomainClassifier
 from .url_expander import URLExpander
@@ -1,6 +1,7 @@
+import concurrent.futures
 import glob
 import os.path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 import s3fs
@@ -8,32 +9,163 @@ import s3fs
 from .reddit_data_reader import RedditDataReader
 from .brandwatch_data_reader import BrandwatchDataReader
 from .fourchan_data_reader import FourChanDataReader
+from .ingest_cache import IngestCache
+from .interface_source_data_reader import IDataSourceReader, MessageDeduplicator, MessageFilter
+from .parallel_file_reader import read_files_parallel
+from .source_file_format import FileFormatCache, detect_head_file_format, get_file_fingerprint, \
+    get_file_format_reader, read_file_head
 
 
 class AnyDataSourceReader:
+    # file formats detected by all readers in this process, see __init__
+    file_format_cache = FileFormatCache()
 
-    def __init__(self):
+    def __init__(self, in_file_format_cache_path: str = None, in_ingest_cache: IngestCache = None):
+        """
+        Parameters
+        ----------
+        in_file_format_cache_path :
+            JSON file that keeps the detected format of each data file across runs (see FileFormatCache). If None,
+            the formats are only cached in memory, by all AnyDataSourceReaders of the process.
+        in_ingest_cache :
+            On-disk cache of the dataframes of the data files, None to always parse the files.
+        """
+        self.ingest_cache = in_ingest_cache
         self.reddit_reader = RedditDataReader()
         self.bw_reader = BrandwatchDataReader()
         self.fourchan_reader = FourChanDataReader()
+        self.readers: List[IDataSourceReader] = [self.bw_reader, self.reddit_reader, self.fourchan_reader]
+        if in_file_format_cache_path is not None:
+            self.file_format_cache = FileFormatCache(in_file_format_cache_path)
+
+    def detect_file_format(self, in_file_path: str) -> Tuple[Optional[IDataSourceReader], Optional[str]]:
+        """
+        Detects the format of a data file by matching the signatures of all readers against one read of its head,
+        unless the format of the unchanged file is cached.
+
+        Returns
+        -------
+            (reader, file format), (None, None) if no reader matches
+        """
+        fingerprint = get_file_fingerprint(in_file_path)
+        file_format = self.file_format_cache.get(in_file_path, fingerprint)
+        if file_format is None:
+            reader, file_format = self.detect_head_format(read_file_head(in_file_path))
+            if file_format is None:
+                return None, None
+            self.file_format_cache.set(in_file_path, fingerprint, file_format)
+        return get_file_format_reader(self.readers, file_format), file_format
+
+    def detect_head_format(self, in_file_head: str) -> Tuple[Optional[IDataSourceReader], Optional[str]]:
+        """
+        Returns the first (reader, file format) whose signature matches the head of a file, (None, None) if no reader
+        matches.
+        """
+        file_format = detect_head_file_format(self.readers, in_file_head)
+        if file_format is None:
+            return None, None
+        return get_file_format_reader(self.readers, file_format), file_format
 
-    def read_data_file(self, in_file_path: str) -> pd.DataFrame:
-        df = None
-        if df is None:
-            df = self.bw_reader.read_data_file(in_file_path)
-        if df is None:
-            df = self.reddit_reader.read_data_file(in_file_path)
-        if df is None:
-            df = self.fourchan_reader.read_data_file(in_file_path)
+    def read_data_file(self, in_file_path: str, in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        entry_path = None if self.ingest_cache is None else \
+            self.ingest_cache.get_entry_path(in_file_path, in_message_filter)
+        if entry_path is not None:
+            df = self.ingest_cache.load(entry_path)
+            if df is not None:
+                print(f"Cached data : {in_file_path}")
+                return df
+        reader, file_format = self.detect_file_format(in_file_path)
+        if reader is None:
+            return None
+        df = reader.read_file_of_format(in_file_path, file_format, None, in_message_filter)
+        if entry_path is not None:
+            self.ingest_cache.store(entry_path, df)
         return df
 
-    def read_files_list(self, in_file_path_list: List[str]) -> pd.DataFrame:
+    def read_data_files(self, in_file_path_list: List[str], in_num_io_threads: int = 4,
+                        in_num_parse_processes: int = 0, in_max_files_in_flight: int = None,
+                        in_message_filter: MessageFilter = None) -> List[Optional[pd.DataFrame]]:
+        """
+        Reads data files concurrently (see read_files_parallel). The files cached in ingest_cache are loaded from
+        the cache, and the others are added to it. The formats of the unchanged files are taken from
+        file_format_cache, so their heads are not read again, and the detected formats are added to it.
+
+        Returns
+        -------
+            The dataframe of each file in the order of in_file_path_list, None for the files that no reader matches.
+        """
+        entry_paths = [None] * len(in_file_path_list) if self.ingest_cache is None else \
+            [self.ingest_cache.get_entry_path(data_file, in_message_filter) for data_file in in_file_path_list]
+        dfs = [None if entry_path is None else self.ingest_cache.load(entry_path) for entry_path in entry_paths]
+        missing_file_indices = [file_idx for file_idx, df in enumerate(dfs) if df is None]
+        if self.ingest_cache is not None:
+            print(f"Loaded {len(dfs) - len(missing_file_indices)} of {len(dfs)} data files from the ingest cache")
+        missing_file_paths = [in_file_path_list[file_idx] for file_idx in missing_file_indices]
+        with concurrent.futures.ThreadPoolExecutor(max(1, in_num_io_threads)) as io_executor:
+            fingerprints = list(io_executor.map(get_file_fingerprint, missing_file_paths))
+        cached_file_formats = [self.file_format_cache.get(file_path, fingerprint)
+                               for file_path, fingerprint in zip(missing_file_paths, fingerprints)]
+        file_formats = list(cached_file_formats)
+        missing_dfs = read_files_parallel(missing_file_paths, self.readers, in_num_io_threads, in_num_parse_processes,
+                                          in_max_files_in_flight, in_message_filter, file_formats)
+        new_file_formats = [(file_path, fingerprint, file_format) for file_path, fingerprint, file_format, cached_format
+                            in zip(missing_file_paths, fingerprints, file_formats, cached_file_formats)
+                            if file_format is not None and cached_format is None]
+        for file_path, fingerprint, file_format in new_file_formats:
+            self.file_format_cache.set(file_path, fingerprint, file_format, in_save=False)
+        if new_file_formats:
+            self.file_format_cache.save()
+        for file_idx, df in zip(missing_file_indices, missing_dfs):
+            dfs[file_idx] = df
+            if entry_paths[file_idx] is not None:
+                self.ingest_cache.store(entry_paths[file_idx], df)
+        return dfs
+
+    def read_files_list(self, in_file_path_list: List[str],
+                        inout_file_to_df: Dict[str, pd.DataFrame] = None, in_num_io_threads: int = 4,
+                        in_num_parse_processes: int = 0, in_max_files_in_flight: int = None,
+                        in_message_filter: MessageFilter = None,
+                        in_message_deduplicator: MessageDeduplicator = None) -> pd.DataFrame:
         """
         Reads all "*.csv" files that have the from of Brandwatch mentions file structure.
-        Removes duplicates based on the source_msg_id ("URL") column.
+        Removes duplicates based on the (platform, source_msg_id) columns, file by file in the order of
+        in_file_path_list, so that only the first message of each key is concatenated.
+
+        Parameters
+        ----------
+        in_file_path_list :
+            Paths of the data files
+        inout_file_to_df :
+            Cache of the dataframes of the files already read, keyed by file path. Only the missing files are read,
+            and they are added to the cache. The cached dataframes are not modified.
+        in_num_io_threads :
+            Number of threads that fetch and parse the files, see read_files_parallel
+        in_num_parse_processes :
+            Number of processes that fetch and parse the files instead of the threads, 0 (the default) for threads
+            only. The processes are started with forkserver, so the calling script needs an
+            if __name__ == "__main__": guard.
+        in_max_files_in_flight :
+            Maximum number of files that are fetched or parsed at the same time.
+        in_message_filter :
+            Keeps only the messages that pass the filter, applied to each chunk of a file while it is parsed. The
+            duplicates are removed among the kept messages. A shared inout_file_to_df must be used with one filter.
+        in_message_deduplicator :
+            Keeps the seen messages and the duplicate statistics of each file, e.g. to also skip the messages of a
+            previous read. Defaults to a new MessageDeduplicator.
         """
-        result_df = pd.concat([self.read_data_file(data_file) for data_file in in_file_path_list])
-        result_df.drop_duplicates(subset=["source_msg_id", "platform"], keep="first", inplace=True)
+        if inout_file_to_df is None:
+            inout_file_to_df = {}
+        missing_file_paths = [data_file for data_file in dict.fromkeys(in_file_path_list)
+                              if data_file not in inout_file_to_df]
+        missing_dfs = self.read_data_files(missing_file_paths, in_num_io_threads, in_num_parse_processes,
+                                           in_max_files_in_flight, in_message_filter)
+        inout_file_to_df.update(zip(missing_file_paths, missing_dfs))
+        if in_message_deduplicator is None:
+            in_message_deduplicator = MessageDeduplicator()
+        # the cached dataframes of inout_file_to_df are kept whole, only their new messages are concatenated
+        result_df = pd.concat([in_message_deduplicator.deduplicate(inout_file_to_df[data_file], data_file)
+                               for data_file in in_file_path_list])
+        in_message_deduplicator.print_stats()
         result_df.reset_index(drop=True, inplace=True)
         return result_df
 
@@ -0,0 +1,260 @@
+from typing import Dict, List
+
+import numpy as np
+
+from .transfer_entropy_matrix import compute_te_matrix_from_counts
+
+WORD_BITS = 64
+# superclass to the pair of classes it is the OR of (see compute_super_class_timeseries)
+SUPERCLASS_TO_CLASSES = {"T": ("TF", "TM"), "U": ("UF", "UM"), "F": ("TF", "UF"), "M": ("TM", "UM")}
+# popcount of each byte value, used when np.bitwise_count is not available (numpy < 2.0)
+BYTE_POPCOUNTS = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def get_num_words(in_num_bits: int) -> int:
+    return -(-in_num_bits // WORD_BITS)
+
+
+def pack_bits(in_matrix: np.ndarray) -> np.ndarray:
+    """
+    Packs the last axis of a binary array into uint64 words. Time step t is bit t % 64 (little endian) of word t // 64,
+    and the bits after the last time step are 0.
+
+    Returns
+    -------
+        uint64 array of shape in_matrix.shape[:-1] + (ceil(T / 64),)
+    """
+    packed_bytes = np.packbits(np.asarray(in_matrix) > 0, axis=-1, bitorder="little")
+    padded_bytes = np.zeros(packed_bytes.shape[:-1] + (get_num_words(in_matrix.shape[-1]) * 8,), dtype=np.uint8)
+    padded_bytes[..., :packed_bytes.shape[-1]] = packed_bytes
+    return padded_bytes.view("<u8").astype(np.uint64, copy=False)
+
+
+def unpack_bits(in_words: np.ndarray, in_num_bits: int) -> np.ndarray:
+    """
+    Unpacks the first in_num_bits bits of the words of pack_bits into a uint8 array of 0s and 1s.
+    """
+    word_bytes = np.ascontiguousarray(in_words, dtype="<u8").view(np.uint8)
+    return np.unpackbits(word_bytes, axis=-1, count=in_num_bits, bitorder="little")
+
+
+def popcount(in_words: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of set bits of each uint64 word.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(in_words)
+    word_bytes = np.ascontiguousarray(in_words, dtype="<u8").view(np.uint8)
+    return BYTE_POPCOUNTS[word_bytes].reshape(in_words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def get_tail_mask(in_num_bits: int) -> np.ndarray:
+    """
+    Returns the words with the first in_num_bits bits set.
+    """
+    mask = np.full(get_num_words(in_num_bits), np.iinfo(np.uint64).max, dtype=np.uint64)
+    if in_num_bits % WORD_BITS:
+        mask[-1] = np.uint64((1 << (in_num_bits % WORD_BITS)) - 1)
+    return mask
+
+
+def slice_bits(in_words: np.ndarray, in_bit_start: int, in_num_bits: int) -> np.ndarray:
+    """
+    Returns the words of the bits [in_bit_start, in_bit_start + in_num_bits) of each row, shifted to start at bit 0.
+    The bits after in_num_bits are 0.
+    """
+    word_start, bit_offset = divmod(in_bit_start, WORD_BITS)
+    num_words = get_num_words(in_num_bits)
+    words = np.zeros(in_words.shape[:-1] + (num_words + 1,), dtype=np.uint64)
+    source_words = in_words[..., word_start:word_start + num_words + 1]
+    words[..., :source_words.shape[-1]] = source_words
+    if bit_offset:
+        words = (words[..., :-1] >> np.uint64(bit_offset)) | (words[..., 1:] << np.uint64(WORD_BITS - bit_offset))
+    else:
+        words = words[..., :-1]
+    return words & get_tail_mask(in_num_bits)
+
+
+def calculate_bit_packed_te_matrix(in_src_words: np.ndarray, in_tgt_words: np.ndarray, in_num_time_steps: int,
+                                   in_max_block_words: int = 1 << 16) -> np.ndarray:
+    """
+    Calculates the transfer entropy (history length 1, lag 1) from every source to every target of bit packed series,
+    with the values of calculate_te_matrix. The joint counts of each pair are popcounts of the AND of the source words
+    with the words of each target state (target_t, target_{t+1}), which are ANDs and NOTs of the target words.
+
+    Parameters
+    ----------
+    in_src_words :
+        uint64 words of shape (num_sources, num_words), see pack_bits
+    in_tgt_words :
+        uint64 words of shape (num_targets, num_words)
+    in_num_time_steps :
+        Length T of the series
+    in_max_block_words :
+        Sources are processed in blocks so that the (sources, targets, words) AND of a block has at most this many
+        words.
+
+    Returns
+    -------
+        Transfer entropy matrix of shape (num_sources, num_targets).
+    """
+    num_observations = in_num_time_steps - 1
+    if num_observations < 1:
+        raise ValueError("timeseries is too short")
+    num_sources, num_targets = in_src_words.shape[0], in_tgt_words.shape[0]
+    valid_mask = get_tail_mask(num_observations)
+    src_values = slice_bits(in_src_words, 0, num_observations)
+    tgt_history = slice_bits(in_tgt_words, 0, num_observations)
+    tgt_future = slice_bits(in_tgt_words, 1, num_observations)
+    # joint states z = 2 * history + future
+    tgt_states = np.stack([~tgt_history & ~tgt_future & valid_mask, ~tgt_history & tgt_future & valid_mask,
+                           tgt_history & ~tgt_future, tgt_history & tgt_future])
+    tgt_state_counts = popcount(tgt_states).sum(axis=-1, dtype=np.int64).T
+    src_counts = popcount(src_values).sum(axis=-1, dtype=np.int64)
+    src_joint_counts = np.zeros((num_sources, num_targets, 4), dtype=np.int64)
+    block_size = max(1, in_max_block_words // max(1, num_targets * src_values.shape[1]))
+    for src_idx_start in range(0, num_sources, block_size):
+        src_block = src_values[src_idx_start:src_idx_start + block_size, None, :]
+        for z in range(3):
+            src_joint_counts[src_idx_start:src_idx_start + block_size, :, z] = \
+                popcount(src_block & tgt_states[z][None, :, :]).sum(axis=-1, dtype=np.int64)
+    # the states partition the observations, so the last count is what is left of the source count
+    src_joint_counts[:, :, 3] = src_counts[:, None] - src_joint_counts[:, :, :3].sum(axis=-1)
+    return compute_te_matrix_from_counts(src_joint_counts.astype(np.float64), tgt_state_counts.astype(np.float64),
+                                         num_observations)
+
+
+class BitPackedTimeseries:
+    """
+    Binary class timeseries of all actors, bit packed into uint64 words (1 bit per time step instead of the 32 or 64
+    bits of the actor timeseries dicts). This is the store of the timeseries of a TE network series: the TE of the
+    bitpacked backend is computed from the words of each window (see get_words), and the other backends unpack the
+    windows they need.
+
+    Example
+    --------
+
+        $store = calculate_actor_bit_packed_timeseries(actor_id_list, data_manager, datetime_index, "12H", True)
+        $window_words = store.get_words("T", period_start_idx, period_end_idx)
+        $window_active = store.get_active_mask("T", period_start_idx, period_end_idx)
+
+    Attributes
+    ----------
+    class_to_words : Dict[str, np.ndarray]
+        Class to the uint64 words of shape (num_actors, ceil(num_time_steps / 64)), see pack_bits
+    num_time_steps : int
+        Length of the series
+    """
+
+    def __init__(self, in_class_to_words: Dict[str, np.ndarray], in_num_time_steps: int):
+        self.class_to_words = in_class_to_words
+        self.num_time_steps = in_num_time_steps
+
+    @classmethod
+    def from_class_to_matrix(cls, in_class_to_matrix: Dict[str, np.ndarray]) -> "BitPackedTimeseries":
+        num_time_steps = next(iter(in_class_to_matrix.values())).shape[1] if in_class_to_matrix else 0
+        return cls({this_class: pack_bits(matrix) for this_class, matrix in in_class_to_matrix.items()}, num_time_steps)
+
+    @classmethod
+    def from_class_tensor(cls, in_tensor: np.ndarray, in_classes: List[str]) -> "BitPackedTimeseries":
+        """
+        Packs a binary actor x class x time array, whose class axis holds in_classes.
+        """
+        words = pack_bits(in_tensor)
+        return cls({this_class: np.ascontiguousarray(words[:, class_idx])
+                    for class_idx, this_class in enumerate(in_classes)}, in_tensor.shape[2])
+
+    @classmethod
+    def from_actor_timeseries_dict_list(cls, in_actor_timeseries_dict_list: List[Dict[str, np.ndarray]],
+                                        in_classes: List[str]) -> "BitPackedTimeseries":
+        """
+        Packs the in_classes series of the actor timeseries dicts, one actor at a time.
+        """
+        num_time_steps = len(in_actor_timeseries_dict_list[0][in_classes[0]]) \
+            if in_actor_timeseries_dict_list and in_classes else 0
+        num_words = get_num_words(num_time_steps)
+        class_to_words = {}
+        for this_class in in_classes:
+            words = np.zeros((len(in_actor_timeseries_dict_list), num_words), dtype=np.uint64)
+            for actor_idx, actor_timeseries_dict in enumerate(in_actor_timeseries_dict_list):
+                words[actor_idx] = pack_bits(actor_timeseries_dict[this_class])
+            class_to_words[this_class] = words
+        return cls(class_to_words, num_time_steps)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(words.nbytes for words in self.class_to_words.values())
+
+    @property
+    def num_actors(self) -> int:
+        return next(iter(self.class_to_words.values())).shape[0] if self.class_to_words else 0
+
+    def select_classes(self, in_classes: List[str]) -> "BitPackedTimeseries":
+        """
+        Returns a store of the in_classes series only (the words are not copied).
+        """
+        return BitPackedTimeseries({this_class: self.class_to_words[this_class] for this_class in in_classes},
+                                   self.num_time_steps)
+
+    def coarsen(self, in_factor: int, in_num_bins: int) -> "BitPackedTimeseries":
+        """
+        Derives the series of a coarser frequency like coarsen_actor_timeseries_dict_list: bin i of the result is the
+        OR of the bins [i * in_factor, (i + 1) * in_factor), and missing bins at the end are 0. Each class is unpacked
+        once.
+        """
+        class_to_words = {}
+        for this_class, words in self.class_to_words.items():
+            num_fine_bins = min(self.num_time_steps, in_num_bins * in_factor)
+            is_set = np.zeros((words.shape[0], in_num_bins * in_factor), dtype=bool)
+            is_set[:, :num_fine_bins] = unpack_bits(words, num_fine_bins)
+            class_to_words[this_class] = pack_bits(is_set.reshape(words.shape[0], in_num_bins, in_factor).any(axis=2))
+        return BitPackedTimeseries(class_to_words, in_num_bins)
+
+    def add_superclasses(self, in_superclasses: List[str] = None):
+        """
+        Adds the superclasses in_superclasses (by default T, U, F and M) as word-wise ORs of their classes.
+        """
+        for superclass in (SUPERCLASS_TO_CLASSES if in_superclasses is None else in_superclasses):
+            class_a, class_b = SUPERCLASS_TO_CLASSES[superclass]
+            self.class_to_words[superclass] = self.class_to_words[class_a] | self.class_to_words[class_b]
+
+    def to_actor_timeseries_dict_list(self, in_classes: List[str] = None) -> List[Dict[str, np.ndarray]]:
+        """
+        Unpacks the in_classes series (by default all) into actor timeseries dicts, for the callers of the dict API.
+        The series have the dtypes of calculate_actor_timeseries_dict_list, int32 for the superclasses and int64 for
+        the other classes.
+        """
+        classes = list(self.class_to_words) if in_classes is None else in_classes
+        class_to_matrix = {this_class: self.get_matrix(this_class).astype(
+            np.int32 if this_class in SUPERCLASS_TO_CLASSES else np.int64) for this_class in classes}
+        return [{this_class: class_to_matrix[this_class][actor_idx] for this_class in classes}
+                for actor_idx in range(self.num_actors)]
+
+    def get_words(self, in_class: str, in_period_start_idx: int = 0, in_period_end_idx: int = None) -> np.ndarray:
+        """
+        Returns the words of the period [in_period_start_idx, in_period_end_idx) of the in_class series.
+        """
+        if in_period_end_idx is None:
+            in_period_end_idx = self.num_time_steps
+        return slice_bits(self.class_to_words[in_class], in_period_start_idx, in_period_end_idx - in_period_start_idx)
+
+    def get_active_mask(self, in_class: str, in_period_start_idx: int = 0, in_period_end_idx: int = None) -> np.ndarray:
+        """
+        Returns compute_active_mask of the period of the in_class series from the popcounts of its words: a series is
+        active if it has some but not all of its bits set.
+        """
+        if in_period_end_idx is None:
+            in_period_end_idx = self.num_time_steps
+        num_set_bits = popcount(self.get_words(in_class, in_period_start_idx, in_period_end_idx)).sum(axis=-1,
+                                                                                                      dtype=np.int64)
+        return (0 < num_set_bits) & (num_set_bits < in_period_end_idx - in_period_start_idx)
+
+    def get_matrix(self, in_class: str, in_period_start_idx: int = 0, in_period_end_idx: int = None) -> np.ndarray:
+        """
+        Returns the period [in_period_start_idx, in_period_end_idx) of the in_class series as a binary uint8 matrix of
+        shape (num_actors, in_period_end_idx - in_period_start_idx), like stack_class_timeseries.
+        """
+        if in_period_end_idx is None:
+            in_period_end_idx = self.num_time_steps
+        return unpack_bits(self.get_words(in_class, in_period_start_idx, in_period_end_idx),
+                           in_period_end_idx - in_period_start_idx)
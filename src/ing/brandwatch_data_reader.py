@@ -1,11 +1,15 @@
-from typing import List, Optional
+from typing import IO, Optional
 
 import pandas as pd
 
-from .interface_source_data_reader import IDataSourceReader
+from .interface_source_data_reader import IDataSourceReader, MessageFilter, \
+    join_string_columns, read_csv_filtered
+from .source_file_format import get_head_columns, read_file_head
 
 
 class BrandwatchDataReader(IDataSourceReader):
+    file_formats = ("bw_api", "bw_gui")
+
     bw_gui_column_dict = {'Date': 'datetime', 'Author': 'source_user_id', 'Full Text': 'content', 'Title': 'title',
                           'Thread Id': 'parent_source_msg_id', 'Thread Author': 'parent_source_user_id',
                           'Domain': 'platform', 'Url': 'source_msg_id'}
@@ -29,47 +33,56 @@ class BrandwatchDataReader(IDataSourceReader):
         self.required_bw_api_column_names = [api_col for api_col in self.bw_api_column_dict
                                              if self.bw_api_column_dict[api_col] in self.required_columns] + self.bw_api_url_columns
 
-    def read_bw_gui_file(self, in_file_path: str) -> pd.DataFrame:
-        df = pd.read_csv(in_file_path, skiprows=6,
-                         dtype={key: str for key in self.bw_gui_column_dict},
-                         usecols=self.required_bw_gui_column_names)
+    def read_bw_gui_file(self, in_file_path: str, in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        return read_csv_filtered(in_file_path, self.__normalize_bw_gui_df, in_message_filter, skiprows=6,
+                                 dtype={key: str for key in self.bw_gui_column_dict},
+                                 usecols=self.required_bw_gui_column_names)
+
+    def __normalize_bw_gui_df(self, df: pd.DataFrame) -> pd.DataFrame:
         df['Date'] = pd.to_datetime(df['Date'], format="%Y-%m-%d %H:%M:%S.%f", utc=True)
-        df['search_article_urls'] = df.apply(lambda row: ", ".join([row[col] for col in self.bw_gui_url_columns if type(row[col]) is str]), axis=1)
+        df['search_article_urls'] = join_string_columns(df, self.bw_gui_url_columns)
         df.rename(columns=self.bw_gui_column_dict, inplace=True)
         df.drop(columns=self.bw_gui_url_columns, errors='ignore', inplace=True)
         return df
 
-    def read_bw_api_file(self, in_file_path: str) -> pd.DataFrame:
-        df = pd.read_csv(in_file_path, parse_dates=['date'], date_format="%Y-%m-%dT%H:%M:%S.%f%z",
-                         dtype={key: str for key in self.bw_api_column_dict},
-                         usecols=self.required_bw_api_column_names)
-        df['search_article_urls'] = df.apply(lambda row: ", ".join([row[col] for col in self.bw_api_url_columns if type(row[col]) is str]), axis=1)
+    def read_bw_api_file(self, in_file_path: str, in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        return read_csv_filtered(in_file_path, self.__normalize_bw_api_df, in_message_filter,
+                                 parse_dates=['date'], date_format="%Y-%m-%dT%H:%M:%S.%f%z",
+                                 dtype={key: str for key in self.bw_api_column_dict},
+                                 usecols=self.required_bw_api_column_names)
+
+    def __normalize_bw_api_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        df['search_article_urls'] = join_string_columns(df, self.bw_api_url_columns)
         df.rename(columns=self.bw_api_column_dict, inplace=True)
         df.drop(columns=self.bw_api_url_columns, errors='ignore', inplace=True)
         return df
 
-    def read_data_file(self, in_file_path: str, in_supress_exception: bool = True) -> Optional[pd.DataFrame]:
-        df = pd.read_csv(in_file_path, nrows=1)
-        if all([key in df.columns for key in self.bw_api_column_dict]):
-            print(f"Brandwatch API data : {in_file_path}")
-            return self.read_bw_api_file(in_file_path)
+    def detect_file_format(self, in_file_head: str) -> Optional[str]:
+        if all([key in get_head_columns(in_file_head) for key in self.bw_api_column_dict]):
+            return "bw_api"
+        if all([key in get_head_columns(in_file_head, 6) for key in self.bw_gui_column_dict]):
+            return "bw_gui"
+        return None
 
-        df = pd.read_csv(in_file_path, skiprows=6, nrows=1)
-        if all([key in df.columns for key in self.bw_gui_column_dict]):
+    def read_file_of_format(self, in_file_path: str, in_file_format: str, in_file_buffer: IO = None,
+                            in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        if in_file_format == "bw_api":
+            print(f"Brandwatch API data : {in_file_path}")
+            return self.read_bw_api_file(in_file_path if in_file_buffer is None else in_file_buffer,
+                                         in_message_filter)
+        if in_file_format == "bw_gui":
             print(f"Brandwatch GUI data : {in_file_path}")
-            return self.read_bw_gui_file(in_file_path)
+            return self.read_bw_gui_file(in_file_path if in_file_buffer is None else in_file_buffer,
+                                         in_message_filter)
+        raise ValueError(f"Unknown Brandwatch file format : {in_file_format}")
+
+    def read_data_file(self, in_file_path: str, in_supress_exception: bool = True,
+                       in_message_filter: MessageFilter = None) -> Optional[pd.DataFrame]:
+        file_format = self.detect_file_format(read_file_head(in_file_path))
+        if file_format is not None:
+            return self.read_file_of_format(in_file_path, file_format, None, in_message_filter)
 
         if in_supress_exception:
             return None
         else:
             raise Exception("File do not contain Brandwatch GUI or API columns!")
-
-    def read_data_files_list(self, in_file_path_list: List[str]) -> pd.DataFrame:
-        """
-        Reads all files that have the from of Brandwatch mentions file structure.
-        Removes duplicates based on the source_msg_id ("URL") column.
-        """
-        result_df = pd.concat([self.read_data_file(data_file) for data_file in in_file_path_list])
-        result_df.drop_duplicates(subset='source_msg_id', keep="first", inplace=True)
-        result_df.reset_index(drop=True, inplace=True)
-        return result_df
@@ -0,0 +1,168 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class CommunityMembership:
+    """
+    User membership of the community actors in CSR form. The members of the community at position c are
+    user_ids[indices[indptr[c]:indptr[c + 1]]].
+
+    Attributes
+    ----------
+    actor_ids : pd.Index
+        actor_id of each community
+    user_ids : pd.Index
+        user_id of each user index
+    indptr : np.ndarray
+        int64 array of shape (num_communities + 1,), start of the member indices of each community
+    indices : np.ndarray
+        int32 user indices of the members of all communities
+    """
+
+    def __init__(self, in_actor_ids: List[str], in_user_ids: List[str], in_indptr: np.ndarray, in_indices: np.ndarray):
+        self.actor_ids = pd.Index(in_actor_ids)
+        self.user_ids = pd.Index(in_user_ids)
+        self.indptr = np.asarray(in_indptr, dtype=np.int64)
+        self.indices = np.asarray(in_indices, dtype=np.int32)
+
+    @classmethod
+    def from_user_lists(cls, in_actor_ids: List[str], in_user_id_lists: List[List[str]]) -> "CommunityMembership":
+        """
+        Creates the membership of the communities in_actor_ids with the members in_user_id_lists.
+        """
+        user_idx, user_ids = pd.factorize(np.concatenate([np.asarray(user_id_list, dtype=object)
+                                                          for user_id_list in in_user_id_lists])
+                                          if in_user_id_lists else np.zeros(0, dtype=object))
+        indptr = np.concatenate([[0], np.cumsum([len(user_id_list) for user_id_list in in_user_id_lists])])
+        return cls(in_actor_ids, user_ids, indptr, user_idx)
+
+    @property
+    def num_communities(self) -> int:
+        return len(self.actor_ids)
+
+    def get_members(self, in_actor_id: str) -> np.ndarray:
+        """
+        Returns the user_id values of the members of the community in_actor_id.
+        """
+        comm_idx = self.actor_ids.get_loc(in_actor_id)
+        return self.user_ids[self.indices[self.indptr[comm_idx]:self.indptr[comm_idx + 1]]].to_numpy()
+
+    def get_sub_membership(self, in_actor_ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the (indptr, indices) CSR arrays of the communities in_actor_ids in the given order.
+        """
+        comm_idx = self.actor_ids.get_indexer(in_actor_ids)
+        if (comm_idx < 0).any():
+            raise KeyError(f"Unknown community actors : {list(np.asarray(in_actor_ids)[comm_idx < 0])}")
+        starts, ends = self.indptr[comm_idx], self.indptr[comm_idx + 1]
+        indptr = np.concatenate([[0], np.cumsum(ends - starts)])
+        indices = np.concatenate([self.indices[start:end] for start, end in zip(starts, ends)]) \
+            if len(comm_idx) > 0 else np.zeros(0, dtype=np.int32)
+        return indptr, indices
+
+    def to_comm_actors_df(self) -> pd.DataFrame:
+        """
+        Returns the community actors dataframe with actor_id as index and one user_id row per member.
+        """
+        return pd.DataFrame({"actor_id": np.repeat(self.actor_ids.to_numpy(), np.diff(self.indptr)),
+                             "user_id": self.user_ids[self.indices].to_numpy()}).set_index("actor_id")
+
+    @staticmethod
+    def or_reduce(in_member_values: np.ndarray, in_indptr: np.ndarray) -> np.ndarray:
+        """
+        OR-reduces the rows of in_member_values (one row per member entry of a CSR membership) over the members of
+        each community. Communities without members are all False.
+        """
+        num_communities = len(in_indptr) - 1
+        reduced = np.zeros((num_communities,) + in_member_values.shape[1:], dtype=bool)
+        is_not_empty = in_indptr[1:] > in_indptr[:-1]
+        if is_not_empty.any():
+            reduced[is_not_empty] = np.logical_or.reduceat(in_member_values.astype(bool, copy=False),
+                                                           in_indptr[:-1][is_not_empty], axis=0)
+        return reduced
+
+
+def color_independent_sets(in_num_nodes: int, in_node_idx: np.ndarray, in_neighbour_idx: np.ndarray,
+                           in_seed: int = 0) -> np.ndarray:
+    """
+    Colours the nodes of an undirected graph so that adjacent nodes have different colours, i.e. each colour is an
+    independent set. At every round, the uncoloured nodes whose (pseudo random) priority is higher than the priorities
+    of all their uncoloured neighbours get the next colour.
+
+    Parameters
+    ----------
+    in_num_nodes :
+        Number of nodes
+    in_node_idx, in_neighbour_idx :
+        The edges (in_node_idx[i], in_neighbour_idx[i]) of the graph in both directions, without self loops
+
+    Returns
+    -------
+        int64 colour of each node, from 0 to the number of colours - 1
+    """
+    priorities = np.random.default_rng(in_seed).permutation(in_num_nodes)
+    colors = np.full(in_num_nodes, -1, dtype=np.int64)
+    color = 0
+    while (colors < 0).any():
+        is_uncolored = colors < 0
+        is_edge = is_uncolored[in_node_idx] & is_uncolored[in_neighbour_idx]
+        max_neighbour_priorities = np.full(in_num_nodes, -1, dtype=np.int64)
+        np.maximum.at(max_neighbour_priorities, in_node_idx[is_edge], priorities[in_neighbour_idx[is_edge]])
+        colors[is_uncolored & (priorities > max_neighbour_priorities)] = color
+        color += 1
+    return colors
+
+
+def detect_label_propagation_communities(in_src_user_ids: np.ndarray, in_tgt_user_ids: np.ndarray,
+                                         in_max_iterations: int = 30) -> pd.Series:
+    """
+    Detects communities of the undirected user graph with the edges (in_src_user_ids[i], in_tgt_user_ids[i]), e.g. the
+    user_id -> parent_user_id share graph, by semi-synchronous label propagation. Each user starts with its own label.
+    At every iteration, the users of each colour of color_independent_sets in turn take the label that is most
+    frequent among their neighbours and themselves (weighted by the number of edges, the smallest label on ties). As
+    neighbours are never updated in the same step, their labels do not flip back and forth as with synchronous updates
+    (e.g. on star or bipartite graphs). The iterations stop when an iteration changes no label, when the labels are the
+    ones of two iterations before (a remaining oscillation), or after in_max_iterations iterations.
+
+    Returns
+    -------
+        The community label of each user of the graph, with user_id as index.
+    """
+    num_edges = len(in_src_user_ids)
+    user_idx, user_ids = pd.factorize(np.concatenate([np.asarray(in_src_user_ids, dtype=object),
+                                                      np.asarray(in_tgt_user_ids, dtype=object)]))
+    num_users = len(user_ids)
+    src_idx, tgt_idx = user_idx[:num_edges], user_idx[num_edges:]
+    is_edge = (src_idx >= 0) & (tgt_idx >= 0) & (src_idx != tgt_idx)
+    user_range = np.arange(num_users)
+    colors = color_independent_sets(num_users, np.concatenate([src_idx[is_edge], tgt_idx[is_edge]]),
+                                    np.concatenate([tgt_idx[is_edge], src_idx[is_edge]]))
+    # both directions, and a self loop so that each user also votes for its own label
+    node_idx = np.concatenate([src_idx[is_edge], tgt_idx[is_edge], user_range]).astype(np.int64)
+    neighbour_idx = np.concatenate([tgt_idx[is_edge], src_idx[is_edge], user_range])
+    # the edges of the users of each colour
+    edge_order = np.argsort(colors[node_idx], kind="stable")
+    color_edge_starts = np.searchsorted(colors[node_idx][edge_order], np.arange(colors.max(initial=-1) + 2))
+    color_edges = [edge_order[start:end] for start, end in zip(color_edge_starts[:-1], color_edge_starts[1:])]
+    labels = user_range.copy()
+    previous_labels = None
+    for _ in range(in_max_iterations):
+        is_changed = False
+        iteration_start_labels = labels.copy()
+        for edges in color_edges:
+            node_labels, label_counts = np.unique(node_idx[edges] * num_users + labels[neighbour_idx[edges]],
+                                                  return_counts=True)
+            nodes, neighbour_labels = np.divmod(node_labels, num_users)
+            # per node: highest count first, then the smallest label
+            order = np.lexsort((neighbour_labels, -label_counts, nodes))
+            is_first = np.ones(len(order), dtype=bool)
+            is_first[1:] = nodes[order][1:] != nodes[order][:-1]
+            updated_nodes, new_labels = nodes[order][is_first], neighbour_labels[order][is_first]
+            is_changed |= bool((labels[updated_nodes] != new_labels).any())
+            labels[updated_nodes] = new_labels
+        if not is_changed or (previous_labels is not None and (labels == previous_labels).all()):
+            break
+        previous_labels = iteration_start_labels
+    return pd.Series(labels, index=pd.Index(user_ids, name="user_id"), name="community")
@@ -1,7 +1,9 @@
+import contextlib
 import multiprocessing
+import multiprocessing.pool
 import os.path
 import datetime
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -9,6 +11,11 @@ import pandas as pd
 from .news_domain_classifier import NewsDomainClassifier
 from .news_domain_identifier import NewsDomainIdentifier
 from .any_data_source_reader import AnyDataSourceReader
+from .ingest_cache import IngestCache
+from .interface_source_data_reader import MessageFilter
+from .community_membership import CommunityMembership, detect_label_propagation_communities
+from .message_store import MessageStore
+from .dataframe_file_formats import check_output_format, write_dataframe_file
 from .url_expander import URLExpander
 from .time_keeper import TimeKeeper
 
@@ -17,6 +24,25 @@ def ndi_find_all_matches(ndi, x):
     return ndi.find_all_matches(x) if type(x) is str else []
 
 
+def render_ids(in_codes: pd.Series, in_prefix: str) -> pd.Series:
+    """
+    Renders integer id codes as the string ids of the saved files, e.g. 12 -> "u12". Missing codes stay missing (None).
+    """
+    is_missing = in_codes.isna().to_numpy()
+    codes = in_codes.to_numpy(dtype=np.int64, na_value=0)
+    ids = np.char.add(in_prefix, codes.astype(str)).astype(object)
+    ids[is_missing] = None
+    return pd.Series(ids, index=in_codes.index, name=in_codes.name)
+
+
+def parse_ids(in_ids: List[str]) -> np.ndarray:
+    """
+    Returns the integer codes of string ids rendered by render_ids, e.g. ["u12", "u3"] -> [12, 3]. Integer codes are
+    returned as they are.
+    """
+    return np.array([int(x[1:]) if type(x) is str else int(x) for x in in_ids], dtype=np.int64)
+
+
 class DataManager:
     """
     Keeps track of all data in memory.
@@ -25,25 +51,48 @@ class DataManager:
     ----------
         output_dir_path : str
             The location of csv data files
+        output_format : Literal["csv.zip", "parquet"]
+            File format of the saved data files.
         state : Literal["NO_DATA", "RAW_DATA", "CLEAN_DATA", "TABLE_DATA"]
             A string that describes the current state of the DataManager.
         all_osn_msgs_df : pd.DataFrame
+            Sorted by datetime once the data tables are generated. platform and source_user_id are categorical, and
+            msg_id, user_id and parent_user_id (nullable) are integer codes, which are rendered as "m<code>" and
+            "u<code>" only in the saved files (see render_ids).
+        all_users_df : pd.DataFrame
+            Users with the integer user_id code as index.
         filtered_osn_msgs_view_df : pd.DataFrame
             Filtered values from all_osn_msgs_df to fit a given StartDate and EndDate criteria.
+        filtered_date_range : Tuple[datetime.datetime, datetime.datetime]
+            (StartDate, EndDate) of filtered_osn_msgs_view_df, None if it is not filtered.
+        message_store : MessageStore
+            Indexed messages of all_osn_msgs_df used for the date range and actor lookups, built by generate_data_tables.
         indv_actors_df : pd.DataFrame
             Individual actors dataframe. This DataFrame will contain user_id, actor_id relationship and other required columns.
+        comm_actors_df : pd.DataFrame
+            Community actors dataframe with actor_id as index and one user_id code row per member.
+        comm_membership : CommunityMembership
+            User membership (user_id codes) of the community actors in CSR form.
     """
+    # columns of the messages that are dropped by preprocess if they are missing
+    required_msg_columns = ['datetime', 'platform', 'source_user_id', 'source_msg_id']
 
-    def __init__(self, in_output_dir_path: str):
+    def __init__(self, in_output_dir_path: str, in_output_format: str = "csv.zip"):
+        check_output_format(in_output_format, ("csv.zip", "parquet"))
         self.output_dir_path = in_output_dir_path
+        self.output_format = in_output_format
         self.next_actor_idx = 0
         self.state = "NO_DATA"
         self.all_users_df = None
         self.actors_df = None
         self.plat_actors_df = None
         self.indv_actors_df = None
+        self.comm_actors_df = None
+        self.comm_membership = None
         self.all_osn_msgs_df = None
         self.filtered_osn_msgs_view_df = self.all_osn_msgs_df
+        self.filtered_date_range = None
+        self.message_store = None
         self.reset(in_output_dir_path)  # added for consistency
 
     def reset(self, in_output_dir_path: str = None):
@@ -54,16 +103,47 @@ class DataManager:
         self.actors_df = None
         self.plat_actors_df = None
         self.indv_actors_df = None
+        self.comm_actors_df = None
+        self.comm_membership = None
         self.all_osn_msgs_df = None
         self.filtered_osn_msgs_view_df = self.all_osn_msgs_df
+        self.filtered_date_range = None
+        self.message_store = None
 
-    def read_data_files(self, in_data_file_paths_list: List[str]):
-        adsr = AnyDataSourceReader()
+    def read_data_files(self, in_data_file_paths_list: List[str], inout_file_to_df: Dict[str, pd.DataFrame] = None,
+                        in_message_filter: MessageFilter = None, in_ingest_cache: IngestCache = None,
+                        in_num_parse_processes: int = 0):
+        """
+        Reads the messages of the data files, see AnyDataSourceReader.read_files_list.
+
+        Parameters
+        ----------
+        in_data_file_paths_list :
+            Paths of the data files
+        inout_file_to_df :
+            Cache of the dataframes of the files already read, keyed by file path, e.g. shared by the DataManagers of
+            several scenarios (see ScenarioBatchRunner).
+        in_message_filter :
+            Keeps only the messages that pass the filter while the files are parsed, e.g.
+            MessageFilter(start_date, end_date, DataManager.required_msg_columns) for the messages that preprocess
+            keeps, so that the memory scales with the selected messages rather than the data files.
+        in_ingest_cache :
+            On-disk cache of the dataframes of the data files, see IngestCache.
+        in_num_parse_processes :
+            Number of processes that fetch and parse the files, 0 (the default) to read them in threads. The
+            processes are started with forkserver, so the calling script needs an if __name__ == "__main__": guard.
+        """
+        adsr = AnyDataSourceReader(in_ingest_cache=in_ingest_cache)
         if self.state != "NO_DATA":
             print(f"ERROR: Some data already exists!\nDataManager state is {self.state}")
             return
         tk = TimeKeeper("Reading data")
-        self.all_osn_msgs_df = adsr.read_files_list(in_data_file_paths_list)
+        self.all_osn_msgs_df = adsr.read_files_list(in_data_file_paths_list, inout_file_to_df,
+                                                    in_num_parse_processes=in_num_parse_processes,
+                                                    in_message_filter=in_message_filter)
+        # few distinct values repeated over many messages
+        self.all_osn_msgs_df[['platform', 'source_user_id']] = \
+            self.all_osn_msgs_df[['platform', 'source_user_id']].astype('category')
         self.filtered_osn_msgs_view_df = self.all_osn_msgs_df
         self.state = "RAW_DATA"
         print(f"\t new shape: {self.all_osn_msgs_df.shape}")
@@ -78,7 +158,10 @@ class DataManager:
         self.all_osn_msgs_df["article_urls"] = self.all_osn_msgs_df["article_urls"].apply(lambda x: str(x))
 
     def preprocess(self, in_news_domain_classes_df: pd.DataFrame,
-                   in_start_date: datetime.datetime = None, in_end_date: datetime.datetime = None):
+                   in_start_date: datetime.datetime = None, in_end_date: datetime.datetime = None,
+                   in_pool: multiprocessing.pool.Pool = None,
+                   in_news_domain_identifier: NewsDomainIdentifier = None,
+                   in_news_domain_classifier: NewsDomainClassifier = None):
         """
         This method should be run before any other methods in this class.
         Preprocess all the Online Social Network Messages in the given dataframe.
@@ -98,6 +181,15 @@ class DataManager:
             Inclusive start date of the data set to select from
         in_end_date :
             Inclusive end date of the data set to select from
+        in_pool :
+            Worker pool used to identify the news domains, e.g. the pool of a TransferEntropyCalculator. If None, a
+            pool is created for this step.
+        in_news_domain_identifier :
+            Compiled identifier of the news domains of in_news_domain_classes_df, e.g. shared by the DataManagers of
+            several scenarios. If None, it is compiled from in_news_domain_classes_df.
+        in_news_domain_classifier :
+            Classifier of the news domains of in_news_domain_classes_df. If None, it is created from
+            in_news_domain_classes_df.
 
         Returns
         -------
@@ -120,11 +212,8 @@ class DataManager:
 
         #  1. Remove nan
         tk.next("Remove nan")
-        self.all_osn_msgs_df = self.all_osn_msgs_df[~(self.all_osn_msgs_df['datetime'].isna() |
-                                                      self.all_osn_msgs_df['platform'].isna() |
-                                                      self.all_osn_msgs_df['source_user_id'].isna() |
-                                                      self.all_osn_msgs_df['source_msg_id'].isna())].reset_index(
-            drop=True)
+        self.all_osn_msgs_df = self.all_osn_msgs_df[
+            self.all_osn_msgs_df[self.required_msg_columns].notna().all(axis=1)].reset_index(drop=True)
         
         print(f"\t new shape: {self.all_osn_msgs_df.shape}")
 
@@ -132,7 +221,6 @@ class DataManager:
         tk.next("add msg_id")
         self.all_osn_msgs_df.rename_axis("msg_id", inplace=True)
         self.all_osn_msgs_df.reset_index(inplace=True)
-        self.all_osn_msgs_df["msg_id"] = self.all_osn_msgs_df["msg_id"].apply(lambda x: f"m{x}")
         
         print(f"\t new shape: {self.all_osn_msgs_df.shape}")
 
@@ -147,16 +235,19 @@ class DataManager:
 
         # 4. identify news_domains
         tk.next("identify news_domains")
-        ndi = NewsDomainIdentifier(in_news_domain_classes_df['news_domain'].unique())
+        ndi = NewsDomainIdentifier(in_news_domain_classes_df['news_domain'].unique()) \
+            if in_news_domain_identifier is None else in_news_domain_identifier
         # self.all_osn_msgs_df['news_domains'] = self.all_osn_msgs_df['article_urls'].apply(lambda x: ndi.find_all_matches(x) if type(x) is str else [])
-        with multiprocessing.Pool(multiprocessing.cpu_count() - 1) as pool:
+        with multiprocessing.Pool(multiprocessing.cpu_count() - 1) if in_pool is None \
+                else contextlib.nullcontext(in_pool) as pool:
             self.all_osn_msgs_df['news_domains'] = pool.starmap(ndi_find_all_matches, [[ndi, v] for v in self.all_osn_msgs_df['article_urls']])
             
         print(f"\t new shape: {self.all_osn_msgs_df.shape}")
 
         # 5. identify class of each news_domain
         tk.next("identify class of each news_domain")
-        ndc = NewsDomainClassifier(in_news_domain_classes_df, {'TF', 'TM', 'UF', 'UM'})
+        ndc = NewsDomainClassifier(in_news_domain_classes_df, {'TF', 'TM', 'UF', 'UM'}) \
+            if in_news_domain_classifier is None else in_news_domain_classifier
         self.all_osn_msgs_df['classes'] = self.all_osn_msgs_df['news_domains'].apply(
             lambda x: [ndc.get_class(nd) for nd in x])
         
@@ -200,10 +291,90 @@ class DataManager:
         self.indv_actors_df.set_index("actor_id", inplace=True)
         # save files
         self.__save_data_files()
+        self.__build_message_store()
         self.state = "TABLE_DATA"
         tk.done()
 
+    def add_community_actors(self, in_user_id_lists: List[List[str]], in_labels: List[str] = None) -> List[str]:
+        """
+        Adds community actors, whose messages are the messages of their member users. Make sure this is run after
+        running generate_data_tables.
+
+        Parameters
+        ----------
+        in_user_id_lists :
+            user_id codes of the members of each community (or the rendered ids of the saved files, e.g. "u12")
+        in_labels :
+            actor_label of each community. Defaults to "comm_<actor_id>".
+
+        Returns
+        -------
+            actor_id values of the new community actors
+        """
+        if self.state != "TABLE_DATA":
+            print(f"ERROR: TABLE_DATA does not exist!\nDataManager state is {self.state}")
+            return []
+        if len(in_user_id_lists) == 0:
+            return []
+        new_comm_actors_df = pd.DataFrame({"actor_id": np.arange(len(in_user_id_lists))})
+        self.__create_actor_ids(new_comm_actors_df)
+        actor_ids = new_comm_actors_df["actor_id"].to_list()
+        if in_labels is None:
+            in_labels = [f"comm_{actor_id}" for actor_id in actor_ids]
+        num_users = [len(user_id_list) for user_id_list in in_user_id_lists]
+        comm_actors = pd.DataFrame({"actor_id": actor_ids, "actor_type": "comm", "actor_label": in_labels,
+                                    "actor_long_label": [f"{label}: {count} users" for label, count in
+                                                         zip(in_labels, num_users)],
+                                    "num_users": num_users}).set_index("actor_id")
+        self.actors_df = pd.concat([self.actors_df, comm_actors])
+        user_id_lists = [parse_ids(user_id_list) for user_id_list in in_user_id_lists]
+        if self.comm_membership is not None:
+            user_id_lists = [self.comm_membership.get_members(actor_id) for actor_id in self.comm_membership.actor_ids] + \
+                            user_id_lists
+            actor_ids = self.comm_membership.actor_ids.to_list() + actor_ids
+        self.comm_membership = CommunityMembership.from_user_lists(actor_ids, user_id_lists)
+        self.comm_actors_df = self.comm_membership.to_comm_actors_df()
+        # the saved actors_df also lists the community actors that comm_actors_df refers to
+        self.__save_data_file(self.actors_df, "actors_df")
+        self.__save_data_file(self.comm_actors_df, "comm_actors_df")
+        return comm_actors.index.to_list()
+
+    def generate_share_communities(self, in_min_size: int = 2, in_max_iterations: int = 30) -> List[str]:
+        """
+        Detects communities of users on the share graph (user_id -- parent_user_id of the messages) by label
+        propagation and adds them as community actors. Make sure this is run after running generate_data_tables.
+
+        Parameters
+        ----------
+        in_min_size :
+            Minimum number of users of a community
+        in_max_iterations :
+            Maximum number of label propagation iterations
+
+        Returns
+        -------
+            actor_id values of the new community actors
+        """
+        if self.state != "TABLE_DATA":
+            print(f"ERROR: TABLE_DATA does not exist!\nDataManager state is {self.state}")
+            return []
+        tk = TimeKeeper("generating share communities")
+        user_to_community = detect_label_propagation_communities(self.all_osn_msgs_df["user_id"].to_numpy(),
+                                                                 self.all_osn_msgs_df["parent_user_id"].to_numpy(),
+                                                                 in_max_iterations)
+        user_id_lists = [user_ids.to_list() for _, user_ids in
+                         user_to_community.index.to_series().groupby(user_to_community.to_numpy(), sort=True)
+                         if len(user_ids) >= in_min_size]
+        actor_ids = self.add_community_actors(user_id_lists)
+        print(f"{len(actor_ids)} communities of {sum(len(user_ids) for user_ids in user_id_lists)} users")
+        tk.done()
+        return actor_ids
+
     def filter_osn_msgs_view(self, in_start_date: datetime.datetime, in_end_date: datetime.datetime):
+        self.filtered_date_range = (in_start_date, in_end_date)
+        if self.message_store is not None:
+            self.filtered_osn_msgs_view_df = self.message_store.get_msgs(in_start_date, in_end_date)
+            return
         self.filtered_osn_msgs_view_df = self.all_osn_msgs_df[(in_start_date <= self.all_osn_msgs_df['datetime']) &
                                                               (self.all_osn_msgs_df['datetime'] <= in_end_date)]
 
@@ -211,6 +382,17 @@ class DataManager:
         if in_actor_id not in self.actors_df.index:
             return None
         actor_type = self.actors_df.loc[in_actor_id]["actor_type"]
+        if self.message_store is not None and actor_type in {"indv", "plat", "comm"}:
+            start_date, end_date = self.filtered_date_range if in_use_filtered_view and \
+                self.filtered_date_range is not None else (None, None)
+            if actor_type == "indv":
+                return self.message_store.get_key_msgs("user_id", self.indv_actors_df.loc[in_actor_id]["user_id"],
+                                                       start_date, end_date)
+            if actor_type == "comm":
+                return self.message_store.get_key_msgs("user_id", self.comm_membership.get_members(in_actor_id),
+                                                       start_date, end_date)
+            return self.message_store.get_key_msgs("platform", self.plat_actors_df.loc[in_actor_id]["platform"],
+                                                   start_date, end_date)
         if actor_type == "indv":
             user_id = self.indv_actors_df.loc[in_actor_id]["user_id"]
             # print(f"indv : {user_id}")
@@ -225,22 +407,59 @@ class DataManager:
                 return self.filtered_osn_msgs_view_df[self.filtered_osn_msgs_view_df["platform"] == platform]
             else:
                 return self.all_osn_msgs_df[self.all_osn_msgs_df["platform"] == platform]
+        if actor_type == "comm":
+            members = self.comm_membership.get_members(in_actor_id)
+            if in_use_filtered_view:
+                return self.filtered_osn_msgs_view_df[self.filtered_osn_msgs_view_df["user_id"].isin(members)]
+            else:
+                return self.all_osn_msgs_df[self.all_osn_msgs_df["user_id"].isin(members)]
         return None
 
+    def __build_message_store(self):
+        """
+        Builds the message store, and replaces all_osn_msgs_df with its datetime sorted messages so that they are
+        kept in memory once.
+        """
+        tk = TimeKeeper("building message store")
+        self.message_store = MessageStore(self.all_osn_msgs_df)
+        self.all_osn_msgs_df = self.message_store.msgs_df
+        self.filtered_osn_msgs_view_df = self.all_osn_msgs_df
+        self.filtered_date_range = None
+        tk.done()
+
     def __save_data_files(self):
         tk = TimeKeeper("saving data files to disk")
-        self.__save_csv_zip_file(self.all_users_df, "all_users_df")
-        self.__save_csv_zip_file(self.all_osn_msgs_df, 'all_osn_msgs_df')
-        self.__save_csv_zip_file(self.actors_df, "actors_df")
-        self.__save_csv_zip_file(self.indv_actors_df, "indv_actors_df")
-        self.__save_csv_zip_file(self.plat_actors_df, "plat_actors_df")
+        self.__save_data_file(self.all_users_df, "all_users_df")
+        self.__save_data_file(self.all_osn_msgs_df, 'all_osn_msgs_df')
+        self.__save_data_file(self.actors_df, "actors_df")
+        self.__save_data_file(self.indv_actors_df, "indv_actors_df")
+        self.__save_data_file(self.plat_actors_df, "plat_actors_df")
         tk.done()
 
-    def __save_csv_zip_file(self, in_dataframe: pd.DataFrame, in_file_name: str):
-        file_path = os.path.join(self.output_dir_path, f'{in_file_name}.csv.zip')
-        compression_options = dict(method='zip', archive_name=f'{in_file_name}.csv')
+    def __save_data_file(self, in_dataframe: pd.DataFrame, in_file_name: str):
+        in_dataframe = self.__render_data_file_ids(in_dataframe)
+        file_path = os.path.join(self.output_dir_path, f'{in_file_name}.{self.output_format}')
         print(f"Dataframe: {in_file_name} \t shape: {in_dataframe.shape}\nSaving to : {os.path.abspath(file_path)}")
-        in_dataframe.to_csv(file_path, compression=compression_options)
+        write_dataframe_file(in_dataframe, self.output_dir_path, in_file_name, self.output_format, in_index=True)
+
+    @staticmethod
+    def __render_data_file_ids(in_dataframe: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns a copy of the dataframe with its msg_id, user_id and parent_user_id codes (columns or index) rendered
+        as string ids.
+        """
+        id_prefixes = {"msg_id": "m", "user_id": "u", "parent_user_id": "u"}
+        id_columns = [column for column in id_prefixes if column in in_dataframe.columns]
+        if in_dataframe.index.name not in id_prefixes and not id_columns:
+            return in_dataframe
+        result_df = in_dataframe.copy(deep=False)
+        for column in id_columns:
+            if pd.api.types.infer_dtype(result_df[column], skipna=True) == "integer":
+                result_df[column] = render_ids(result_df[column], id_prefixes[column])
+        if in_dataframe.index.name in id_prefixes and pd.api.types.infer_dtype(result_df.index) == "integer":
+            result_df.index = pd.Index(render_ids(result_df.index.to_series(), id_prefixes[result_df.index.name]),
+                                       name=result_df.index.name)
+        return result_df
 
     def __generate_user_id(self, in_dump_temp: bool = False):
         """
@@ -253,32 +472,38 @@ class DataManager:
 
         tk = TimeKeeper("generating user_id values")
         # create user_id and all_users_df object
-        temp_users_1 = self.all_osn_msgs_df.groupby(["platform", "source_user_id"], dropna=True).size().reset_index()[
-            ["platform", "source_user_id"]]
+        temp_users_1 = self.all_osn_msgs_df.groupby(["platform", "source_user_id"], dropna=True,
+                                                    observed=True).size().reset_index()[["platform", "source_user_id"]]
         temp_users_2 = \
-            self.all_osn_msgs_df.groupby(["platform", "parent_source_user_id"], dropna=True).size().reset_index()[
+            self.all_osn_msgs_df.groupby(["platform", "parent_source_user_id"], dropna=True,
+                                         observed=True).size().reset_index()[
                 ["platform", "parent_source_user_id"]].rename(columns={"parent_source_user_id": "source_user_id"})
-        self.all_users_df = pd.concat([temp_users_1, temp_users_2])
+        # user tables keep plain string keys, the categorical codes are local to all_osn_msgs_df
+        self.all_users_df = pd.concat([temp_users_1, temp_users_2]).astype(object)
         self.all_users_df.drop_duplicates(subset=["platform", "source_user_id"], inplace=True, ignore_index=True)
         self.all_users_df = self.all_users_df.groupby(["platform", "source_user_id"], dropna=True).size().rename(
             'num_users').reset_index().drop(columns=["num_users"]).rename_axis("user_id").reset_index()
-        self.all_users_df["user_id"] = self.all_users_df["user_id"].apply(lambda x: f"u{x}")
-        user_num_msgs = self.all_osn_msgs_df.groupby(["platform", "source_user_id"], dropna=True).size().rename(
-            'msgs_count').reset_index()
+        user_num_msgs = self.all_osn_msgs_df.groupby(["platform", "source_user_id"], dropna=True,
+                                                     observed=True).size().rename('msgs_count').reset_index()
+        user_num_msgs = user_num_msgs.astype({"platform": object, "source_user_id": object})
         self.all_users_df = self.all_users_df.merge(user_num_msgs, how='left', on=["platform", "source_user_id"])
         self.all_users_df["msgs_count"].fillna(0, inplace=True)
         if in_dump_temp:
-            self.__save_csv_zip_file(self.all_users_df, "temp_users_df")
+            self.__save_data_file(self.all_users_df, "temp_users_df")
 
         tk.next("updating all_osn_msgs")
         # add user_id column to all_osn_msgs_df
-        src_user_to_user_id = self.all_users_df.set_index(["platform", "source_user_id"])["user_id"].to_dict()
-        self.all_osn_msgs_df[['user_id', 'parent_user_id']] = self.all_osn_msgs_df.apply(lambda row: pd.Series([
-            src_user_to_user_id[(row['platform'], row['source_user_id'])],
-            src_user_to_user_id[(row['platform'], row['parent_source_user_id'])] if not pd.isnull(row['parent_source_user_id']) else None
-        ]), axis=1)
+        # user_id is the row position of the (platform, source_user_id) pair in all_users_df
+        src_user_index = pd.MultiIndex.from_frame(self.all_users_df[["platform", "source_user_id"]])
+        platforms = self.all_osn_msgs_df['platform'].astype(object)
+        self.all_osn_msgs_df['user_id'] = src_user_index.get_indexer(
+            pd.MultiIndex.from_arrays([platforms, self.all_osn_msgs_df['source_user_id'].astype(object)]))
+        parent_user_idx = src_user_index.get_indexer(
+            pd.MultiIndex.from_arrays([platforms, self.all_osn_msgs_df['parent_source_user_id'].astype(object)]))
+        self.all_osn_msgs_df['parent_user_id'] = pd.array(np.where(parent_user_idx >= 0, parent_user_idx, None),
+                                                          dtype="Int64")
         if in_dump_temp:
-            self.__save_csv_zip_file(self.all_osn_msgs_df, 'temp_all_osn_msgs_df')
+            self.__save_data_file(self.all_osn_msgs_df, 'temp_all_osn_msgs_df')
 
         self.actors_df = pd.DataFrame([],
                                       columns=["actor_id", "actor_type", "actor_label", "actor_long_label",
@@ -322,8 +547,8 @@ class DataManager:
             columns={0: "actor_id", 1: "actor_type", 2: "actor_label", 3: "actor_long_label", 4: "num_users"})
         self.actors_df = pd.concat([self.actors_df, indv_actors])
         if in_dump_temp:
-            self.__save_csv_zip_file(self.indv_actors_df, "temp_indv_actors_df")
-            self.__save_csv_zip_file(self.actors_df, "temp_actors_df")
+            self.__save_data_file(self.indv_actors_df, "temp_indv_actors_df")
+            self.__save_data_file(self.actors_df, "temp_actors_df")
         tk.done()
 
     def __generate_platform_actor_id(self, in_min_size: int = None, in_dump_temp: bool = False):
@@ -339,7 +564,7 @@ class DataManager:
         """
         tk = TimeKeeper("generating actor_id values for platforms")
         # create actor_ids for platforms
-        self.plat_actors_df = self.all_osn_msgs_df["platform"].value_counts().rename(
+        self.plat_actors_df = self.all_osn_msgs_df["platform"].astype(object).value_counts().rename(
             "users_count").reset_index().rename_axis("actor_id").reset_index()
         self.__create_actor_ids(self.plat_actors_df)
         if in_min_size is not None:
@@ -350,6 +575,6 @@ class DataManager:
             columns={0: "actor_id", 1: "actor_type", 2: "actor_label", 3: "actor_long_label", 4: "num_users"})
         self.actors_df = pd.concat([self.actors_df, plat_actors])
         if in_dump_temp:
-            self.__save_csv_zip_file(self.plat_actors_df, "temp_plat_actors_df")
-            self.__save_csv_zip_file(self.actors_df, "temp_actors_df")
+            self.__save_data_file(self.plat_actors_df, "temp_plat_actors_df")
+            self.__save_data_file(self.actors_df, "temp_actors_df")
         tk.done()
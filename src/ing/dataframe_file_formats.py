@@ -0,0 +1,130 @@
+import os.path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# File formats of the saved DataFrames, which are also the file name extensions.
+#   "csv.zip" : deflate zipped CSV file
+#   "parquet" : Parquet file with zstd compression (requires pyarrow)
+#   "npz" : NumPy .npz file of actor_te_edges_df with the actor id dictionary, int32 source and target indices and one
+#           float32 array per value column (TE edges only)
+OUTPUT_FORMATS = ("csv.zip", "parquet", "npz")
+
+
+def check_output_format(in_output_format: str, in_allowed_formats: tuple = OUTPUT_FORMATS):
+    if in_output_format not in in_allowed_formats:
+        raise ValueError(f"Unknown output format : {in_output_format}")
+    if in_output_format == "parquet":
+        import_pyarrow()
+
+
+def import_pyarrow(in_feature: str = "The parquet format"):
+    """
+    Imports the optional pyarrow dependency of the parquet format (or of in_feature).
+
+    Returns
+    -------
+        The pyarrow module, with pyarrow.parquet imported
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(f"{in_feature} requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def get_output_format(in_file_path: str) -> str:
+    """
+    Returns the output format of a file from its extension.
+    """
+    for output_format in OUTPUT_FORMATS:
+        if in_file_path.endswith(f".{output_format}"):
+            return output_format
+    raise ValueError(f"Unknown output format of : {in_file_path}")
+
+
+def write_dataframe_file(in_dataframe: pd.DataFrame, in_dir_path: str, in_file_name: str,
+                         in_output_format: str = "csv.zip", in_index: bool = False) -> str:
+    """
+    Saves in_dataframe as <in_dir_path>/<in_file_name>.<in_output_format>.
+
+    Returns
+    -------
+        The path of the file
+    """
+    file_path = os.path.join(in_dir_path, f"{in_file_name}.{in_output_format}")
+    if in_output_format == "csv.zip":
+        compression_options = dict(method='zip', archive_name=f'{in_file_name}.csv')
+        in_dataframe.to_csv(file_path, index=in_index, compression=compression_options)
+    elif in_output_format == "parquet":
+        import_pyarrow()
+        in_dataframe.to_parquet(file_path, engine="pyarrow", compression="zstd", index=in_index)
+    elif in_output_format == "npz":
+        write_npz_te_edges(in_dataframe, file_path)
+    else:
+        raise ValueError(f"Unknown output format : {in_output_format}")
+    return file_path
+
+
+def write_npz_te_edges(in_te_edges_df: pd.DataFrame, in_file_path: str):
+    """
+    Saves actor_te_edges_df as an uncompressed .npz file. Every column is a separate array of the file, so a single
+    column can be loaded without reading the others.
+
+        columns : names of the columns of in_te_edges_df in order
+        actor_ids : actor id dictionary
+        src_idx, tgt_idx : int32 indices of Source and Target in actor_ids
+        column_<i> : values of the i-th column (float32 for float columns)
+    """
+    num_rows = in_te_edges_df.shape[0]
+    actor_idx, actor_ids = pd.factorize(np.concatenate([in_te_edges_df["Source"].to_numpy(),
+                                                        in_te_edges_df["Target"].to_numpy()]))
+    arrays = {"columns": np.array(in_te_edges_df.columns, dtype=str),
+              "actor_ids": np.array(actor_ids, dtype=str),
+              "src_idx": actor_idx[:num_rows].astype(np.int32),
+              "tgt_idx": actor_idx[num_rows:].astype(np.int32)}
+    for column_idx, column in enumerate(in_te_edges_df.columns):
+        if column in ("Source", "Target"):
+            continue
+        values = in_te_edges_df[column].to_numpy()
+        arrays[f"column_{column_idx}"] = values.astype(np.float32) if np.issubdtype(values.dtype, np.floating) else values
+    np.savez(in_file_path, **arrays)
+
+
+def read_te_edges(in_file_path: str, in_columns: List[str] = None) -> pd.DataFrame:
+    """
+    Reads an actor_te_edges_df file of any output format.
+
+    Parameters
+    ----------
+    in_file_path :
+        Path of the file, whose extension gives the format
+    in_columns :
+        If given, only these columns are read, e.g. ["Source", "Target", "TF_UF"]. The parquet and npz formats only
+        read (and decompress) the data of these columns.
+
+    Returns
+    -------
+        actor_te_edges_df
+    """
+    output_format = get_output_format(in_file_path)
+    if output_format == "csv.zip":
+        return pd.read_csv(in_file_path, usecols=in_columns)[in_columns] if in_columns is not None \
+            else pd.read_csv(in_file_path)
+    if output_format == "parquet":
+        import_pyarrow()
+        return pd.read_parquet(in_file_path, engine="pyarrow", columns=in_columns)
+    with np.load(in_file_path, allow_pickle=False) as npz_file:
+        columns = npz_file["columns"].tolist()
+        te_edges_dict = {}
+        for column in (columns if in_columns is None else in_columns):
+            if column not in columns:
+                raise ValueError(f"Unknown column : {column}")
+            if column in ("Source", "Target"):
+                actor_idx = npz_file["src_idx" if column == "Source" else "tgt_idx"]
+                te_edges_dict[column] = npz_file["actor_ids"].astype(object)[actor_idx]
+            else:
+                te_edges_dict[column] = npz_file[f"column_{columns.index(column)}"]
+        return pd.DataFrame(te_edges_dict)
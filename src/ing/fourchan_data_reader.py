@@ -1,11 +1,15 @@
-from typing import Optional, List
+from typing import IO, Optional
 
 import pandas as pd
 
-from .interface_source_data_reader import IDataSourceReader
+from .interface_source_data_reader import IDataSourceReader, MessageFilter, \
+    join_string_columns, read_csv_filtered
+from .source_file_format import get_head_columns, read_file_head
 
 
 class FourChanDataReader(IDataSourceReader):
+    file_formats = ("4chan",)
+
     fourchan_column_dict = {'archived': 'archived', 'archived_on': 'archived_on', 'bumplimit': 'bumplimit',
                             'capcode': 'capcode', 'closed': 'closed', 'com': 'content',
                             'country': 'country', 'country_name': 'country_name', 'ext': 'ext',
@@ -30,35 +34,41 @@ class FourChanDataReader(IDataSourceReader):
         self.missing_columns = list(set(self.required_columns).difference(
             [self.fourchan_column_dict[col] for col in self.required_4chan_column_names]))
 
-    def read_4chan_file(self, in_file_path: str) -> pd.DataFrame:
-        df = pd.read_csv(in_file_path, dtype={key: str for key in self.fourchan_column_dict},
-                         usecols=self.required_4chan_column_names)
+    def read_4chan_file(self, in_file_path: str, in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        return read_csv_filtered(in_file_path, self.__normalize_4chan_df, in_message_filter,
+                                 dtype={key: str for key in self.fourchan_column_dict},
+                                 usecols=self.required_4chan_column_names)
+
+    def __normalize_4chan_df(self, df: pd.DataFrame) -> pd.DataFrame:
         df['datetime'] = pd.to_datetime(df['datetime'], format="%Y-%m-%d %H:%M:%S.%f", utc=True)
         df = df.rename(columns=self.fourchan_column_dict)
-        df['search_article_urls'] = df.apply(lambda row: ", ".join([row[col] for col in df.columns if type(row[col]) is str]), axis=1)
+        df['search_article_urls'] = join_string_columns(df, df.columns)
         df['title'] = df['content']
         df['parent_source_msg_id'] = ""
         df['parent_source_user_id'] = ""
         df['platform'] = "4chan.org"
         return df
 
-    def read_data_file(self, in_file_path: str, in_supress_exception: bool = True) -> Optional[pd.DataFrame]:
-        df = pd.read_csv(in_file_path, nrows=1)
-        if all([key in df.columns for key in self.fourchan_column_dict]):
+    def detect_file_format(self, in_file_head: str) -> Optional[str]:
+        if all([key in get_head_columns(in_file_head) for key in self.fourchan_column_dict]):
+            return "4chan"
+        return None
+
+    def read_file_of_format(self, in_file_path: str, in_file_format: str, in_file_buffer: IO = None,
+                            in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        if in_file_format == "4chan":
             print(f"4Chan data : {in_file_path}")
-            return self.read_4chan_file(in_file_path)
+            return self.read_4chan_file(in_file_path if in_file_buffer is None else in_file_buffer,
+                                        in_message_filter)
+        raise ValueError(f"Unknown 4Chan file format : {in_file_format}")
+
+    def read_data_file(self, in_file_path: str, in_supress_exception: bool = True,
+                       in_message_filter: MessageFilter = None) -> Optional[pd.DataFrame]:
+        file_format = self.detect_file_format(read_file_head(in_file_path))
+        if file_format is not None:
+            return self.read_file_of_format(in_file_path, file_format, None, in_message_filter)
 
         if in_supress_exception:
             return None
         else:
             raise Exception("File do not contain 4Chan columns!")
-
-    def read_data_files_list(self, in_file_path_list: List[str]) -> pd.DataFrame:
-        """
-        Reads all files that have the from of 4Chan mentions file structure.
-        Removes duplicates based on the source_msg_id column.
-        """
-        result_df = pd.concat([self.read_data_file(data_file) for data_file in in_file_path_list])
-        result_df.drop_duplicates(subset='source_msg_id', keep="first", inplace=True)
-        result_df.reset_index(drop=True, inplace=True)
-        return result_df
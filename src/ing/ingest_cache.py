@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import os.path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .dataframe_file_formats import import_pyarrow
+from .interface_source_data_reader import MessageFilter
+from .source_file_format import get_file_fingerprint
+
+# Version of the normalized dataframes of the readers. Increase it when a reader changes its output, so that the
+# cached dataframes of the previous version are not used.
+READER_VERSION = 1
+
+
+class IngestCache:
+    """
+    On-disk cache of the normalized dataframe of each data file (the output of AnyDataSourceReader.read_data_file) in
+    the Arrow IPC (Feather) format, so that warm runs load the data files without parsing them again. Requires
+    pyarrow.
+
+    An entry is keyed by the file path, the file fingerprint (ETag on S3, size and modification time of local files,
+    see get_file_fingerprint), READER_VERSION and the message filter of the read. Once the entries take more than
+    max_bytes, the least recently used ones are removed.
+
+    Example
+    --------
+
+        $ingest_cache = IngestCache("./INGEST_CACHE", in_max_bytes=20 * 2 ** 30)
+        $data_manager.read_data_files(data_file_paths, in_ingest_cache=ingest_cache)
+
+    Attributes
+    ----------
+    dir_path : str
+        Folder of the cached files
+    max_bytes : int
+        Size limit of the cached files, None for no limit
+    """
+
+    def __init__(self, in_dir_path: str, in_max_bytes: int = None):
+        import_pyarrow("The ingest cache")
+        self.dir_path = in_dir_path
+        self.max_bytes = in_max_bytes
+        os.makedirs(in_dir_path, exist_ok=True)
+
+    def get_entry_path(self, in_file_path: str, in_message_filter: MessageFilter = None) -> Optional[str]:
+        """
+        Returns the path of the cached file of a data file, None if the data file has no fingerprint.
+        """
+        fingerprint = get_file_fingerprint(in_file_path)
+        if fingerprint is None:
+            return None
+        key = {"file_path": in_file_path, "fingerprint": fingerprint, "reader_version": READER_VERSION,
+               "message_filter": None if in_message_filter is None else
+               [str(in_message_filter.start_date), str(in_message_filter.end_date),
+                in_message_filter.required_columns]}
+        key_sha256 = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.dir_path, f"{key_sha256}.arrow")
+
+    def load(self, in_entry_path: Optional[str]) -> Optional[pd.DataFrame]:
+        """
+        Returns the cached dataframe of the entry, None if it is not cached.
+        """
+        if in_entry_path is None or not os.path.isfile(in_entry_path):
+            return None
+        try:
+            df = pd.read_feather(in_entry_path)
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable ingest cache file : {in_entry_path}")
+            return None
+        # marks the entry as recently used
+        os.utime(in_entry_path)
+        # missing strings are read as None, the readers give NaN
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+        return df
+
+    def store(self, in_entry_path: Optional[str], in_df: Optional[pd.DataFrame]):
+        """
+        Caches the dataframe of the entry and removes the least recently used entries above max_bytes.
+        """
+        if in_entry_path is None or in_df is None:
+            return
+        temp_file_path = f"{in_entry_path}.tmp"
+        try:
+            in_df.reset_index(drop=True).to_feather(temp_file_path, compression="lz4")
+        except (TypeError, ValueError) as e:
+            # e.g. columns with mixed types that have no Arrow type
+            print(f"Not caching the dataframe of {in_entry_path} : {e}")
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+            return
+        os.replace(temp_file_path, in_entry_path)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cached files take at most max_bytes.
+        """
+        if self.max_bytes is None:
+            return
+        entries = []
+        for file_name in os.listdir(self.dir_path):
+            if file_name.endswith(".arrow"):
+                file_stat = os.stat(os.path.join(self.dir_path, file_name))
+                entries.append((file_stat.st_mtime, file_stat.st_size, file_name))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, file_name in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.dir_path, file_name))
+            total_bytes -= size
@@ -0,0 +1,111 @@
+import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class MessageStore:
+    """
+    Datetime sorted OSN messages with a row range index for each key column (user_id, platform), so that the messages
+    of a date range, or of a key value in a date range, are found with np.searchsorted in O(log n + k) instead of a
+    boolean scan of all messages.
+
+    The rows of a key value are a contiguous range of key_to_order[key_column], which lists the row positions of the
+    store sorted by (key value, datetime).
+
+    Example
+    --------
+
+        $store = MessageStore(all_osn_msgs_df)
+        $window_df = store.get_msgs(start_date, end_date)
+        $user_window_df = store.get_key_msgs("user_id", "u12", start_date, end_date)
+
+    Attributes
+    ----------
+    msgs_df : pd.DataFrame
+        The messages sorted by datetime (stable, so messages with the same datetime keep their order).
+    datetimes : pd.DatetimeIndex
+        Datetime of each row of msgs_df.
+    key_to_values : Dict[str, pd.Index]
+        Key column to its distinct values. The position of a value is its key code.
+    key_to_ranges : Dict[str, Tuple[np.ndarray, np.ndarray]]
+        Key column to (start, end) arrays of the range of each key code in key_to_order[key_column].
+    key_to_order : Dict[str, np.ndarray]
+        Key column to the row positions of msgs_df sorted by (key code, datetime).
+    key_to_datetimes : Dict[str, pd.DatetimeIndex]
+        Key column to the datetimes of the rows of key_to_order[key_column].
+    """
+
+    KEY_COLUMNS = ("user_id", "platform")
+
+    def __init__(self, in_msgs_df: pd.DataFrame, in_key_columns: Tuple[str, ...] = KEY_COLUMNS):
+        # NaT datetimes are sorted first, so they are never inside a date range
+        self.msgs_df = in_msgs_df.sort_values("datetime", kind="stable", na_position="first")
+        self.datetimes = pd.DatetimeIndex(self.msgs_df["datetime"])
+        self.key_to_values: Dict[str, pd.Index] = {}
+        self.key_to_ranges: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.key_to_order: Dict[str, np.ndarray] = {}
+        self.key_to_datetimes: Dict[str, pd.DatetimeIndex] = {}
+        for key_column in in_key_columns:
+            key_codes, key_values = pd.factorize(self.msgs_df[key_column])
+            order = np.argsort(key_codes, kind="stable")
+            sorted_key_codes = key_codes[order]
+            code_range = np.arange(len(key_values))
+            self.key_to_values[key_column] = pd.Index(key_values)
+            self.key_to_ranges[key_column] = (np.searchsorted(sorted_key_codes, code_range, side="left"),
+                                              np.searchsorted(sorted_key_codes, code_range, side="right"))
+            self.key_to_order[key_column] = order
+            self.key_to_datetimes[key_column] = self.datetimes[order]
+
+    def get_range(self, in_start_date: datetime.datetime = None,
+                  in_end_date: datetime.datetime = None) -> Tuple[int, int]:
+        """
+        Returns the [start, end) row range of msgs_df of the messages with in_start_date <= datetime <= in_end_date.
+        None dates are unbounded.
+        """
+        return self.__search_range(self.datetimes, in_start_date, in_end_date)
+
+    def get_msgs(self, in_start_date: datetime.datetime = None, in_end_date: datetime.datetime = None) -> pd.DataFrame:
+        """
+        Returns the messages with in_start_date <= datetime <= in_end_date as a slice of msgs_df.
+        """
+        start_idx, end_idx = self.get_range(in_start_date, in_end_date)
+        return self.msgs_df.iloc[start_idx:end_idx]
+
+    def get_key_rows(self, in_key_column: str, in_key_values: List, in_start_date: datetime.datetime = None,
+                     in_end_date: datetime.datetime = None) -> np.ndarray:
+        """
+        Returns the row positions of msgs_df (in datetime order) of the messages whose in_key_column value is one of
+        in_key_values, with in_start_date <= datetime <= in_end_date.
+        """
+        key_codes = self.key_to_values[in_key_column].get_indexer(in_key_values)
+        starts, ends = self.key_to_ranges[in_key_column]
+        order = self.key_to_order[in_key_column]
+        key_datetimes = self.key_to_datetimes[in_key_column]
+        rows_list = []
+        for key_code in key_codes[key_codes >= 0]:
+            start_idx, end_idx = self.__search_range(key_datetimes[starts[key_code]:ends[key_code]],
+                                                     in_start_date, in_end_date)
+            rows_list.append(order[starts[key_code] + start_idx:starts[key_code] + end_idx])
+        if not rows_list:
+            return np.zeros(0, dtype=np.int64)
+        if len(rows_list) == 1:
+            return rows_list[0]
+        return np.sort(np.concatenate(rows_list))
+
+    def get_key_msgs(self, in_key_column: str, in_key_value, in_start_date: datetime.datetime = None,
+                     in_end_date: datetime.datetime = None) -> pd.DataFrame:
+        """
+        Returns the messages whose in_key_column value is in_key_value (or one of the values of a list), with
+        in_start_date <= datetime <= in_end_date.
+        """
+        key_values = in_key_value if isinstance(in_key_value, (list, tuple, np.ndarray, pd.Series)) else [in_key_value]
+        return self.msgs_df.iloc[self.get_key_rows(in_key_column, key_values, in_start_date, in_end_date)]
+
+    @staticmethod
+    def __search_range(in_datetimes: pd.DatetimeIndex, in_start_date: datetime.datetime,
+                       in_end_date: datetime.datetime) -> Tuple[int, int]:
+        start_idx = 0 if in_start_date is None else int(in_datetimes.searchsorted(in_start_date, side="left"))
+        end_idx = len(in_datetimes) if in_end_date is None else int(in_datetimes.searchsorted(in_end_date, side="right"))
+        return start_idx, max(start_idx, end_idx)
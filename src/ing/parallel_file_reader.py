@@ -0,0 +1,115 @@
+import concurrent.futures
+import io
+import multiprocessing
+import multiprocessing.context
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import fsspec
+import pandas as pd
+
+from .source_file_format import decode_file_head, detect_head_file_format, get_file_format_reader
+
+if TYPE_CHECKING:
+    from .interface_source_data_reader import MessageFilter
+
+
+def fetch_file_bytes(in_file_path: str) -> bytes:
+    """
+    Returns the decompressed bytes of a (possibly compressed or remote) data file.
+    """
+    with fsspec.open(in_file_path, "rb", compression="infer") as f:
+        return f.read()
+
+
+def parse_file_bytes(in_reader, in_file_format: str, in_file_path: str, in_file_bytes: bytes,
+                     in_message_filter: "MessageFilter" = None) -> pd.DataFrame:
+    return in_reader.read_file_of_format(in_file_path, in_file_format, io.BytesIO(in_file_bytes), in_message_filter)
+
+
+def fetch_and_parse_file(in_readers: list, in_file_format: Optional[str], in_file_path: str,
+                         in_message_filter: "MessageFilter" = None) -> Tuple[Optional[str], Optional[pd.DataFrame]]:
+    """
+    Fetches and parses a file, in a fetching thread or in a parse process, so that each worker holds at most one raw
+    file and the raw files are never sent between processes. If in_file_format is None, the format is detected from
+    the head of the fetched bytes.
+
+    Returns
+    -------
+        (file format, dataframe), (None, None) if no reader of in_readers matches the file.
+    """
+    file_bytes = fetch_file_bytes(in_file_path)
+    if in_file_format is None:
+        in_file_format = detect_head_file_format(in_readers, decode_file_head(file_bytes))
+        if in_file_format is None:
+            return None, None
+    return in_file_format, parse_file_bytes(get_file_format_reader(in_readers, in_file_format), in_file_format,
+                                            in_file_path, file_bytes, in_message_filter)
+
+
+def get_parse_context() -> multiprocessing.context.BaseContext:
+    """
+    Returns the start method context of the parse processes. The processes are not forked from the reading process,
+    whose fetching threads (and the event loop thread of fsspec) could hold locks that a forked child would never see
+    released.
+    """
+    return multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                                       else "spawn")
+
+
+def read_files_parallel(in_file_path_list: List[str], in_readers: list, in_num_io_threads: int = 4,
+                        in_num_parse_processes: int = 0, in_max_files_in_flight: int = None,
+                        in_message_filter: "MessageFilter" = None,
+                        inout_file_formats: List[Optional[str]] = None) -> List[Optional[pd.DataFrame]]:
+    """
+    Reads data files concurrently, each file with a single fetch (see fetch_and_parse_file): the worker that fetches
+    a file detects its format from the head of the fetched bytes (unless it is known) and parses it. The workers are
+    threads, or parse processes if in_num_parse_processes > 0, so that the raw files are neither held by the reading
+    process nor sent between processes. Either way at most one raw file per worker is held in memory.
+    The parse processes are started with forkserver (spawn where it is not available), not forked, so a script that
+    uses parse processes needs an if __name__ == "__main__": guard.
+
+    Parameters
+    ----------
+    in_file_path_list :
+        Paths of the data files
+    in_readers :
+        Readers of the data files (IDataSourceReader), the format of a file is the one of the first reader whose
+        signature matches its head (see detect_head_file_format). The readers must be picklable.
+    in_num_io_threads :
+        Number of threads that fetch and parse the files when there are no parse processes
+    in_num_parse_processes :
+        Number of processes that fetch and parse the files, 0 (the default) to read them in threads only.
+    in_max_files_in_flight :
+        Maximum number of submitted files that are not read yet. Defaults to twice the number of workers.
+    in_message_filter :
+        The files are parsed in chunks and only the messages that pass the filter are kept, see read_csv_filtered.
+    inout_file_formats :
+        Known format of each file of in_file_path_list, None for the files whose format is detected (e.g. the formats
+        of a FileFormatCache). The detected formats are written into the list.
+
+    Returns
+    -------
+        The dataframe of each file in the order of in_file_path_list, None for the files that no reader matches.
+    """
+    num_files = len(in_file_path_list)
+    if in_max_files_in_flight is None:
+        in_max_files_in_flight = 2 * (in_num_parse_processes if in_num_parse_processes > 0 else in_num_io_threads)
+    file_formats = [None] * num_files if inout_file_formats is None else inout_file_formats
+    results: List[Optional[pd.DataFrame]] = [None] * num_files
+    with (concurrent.futures.ProcessPoolExecutor(in_num_parse_processes, mp_context=get_parse_context())
+          if in_num_parse_processes > 0 else concurrent.futures.ThreadPoolExecutor(max(1, in_num_io_threads))) \
+            as executor:
+        future_to_file_idx = {}
+        next_file_idx = 0
+        while next_file_idx < num_files or future_to_file_idx:
+            while next_file_idx < num_files and len(future_to_file_idx) < in_max_files_in_flight:
+                future_to_file_idx[executor.submit(fetch_and_parse_file, in_readers, file_formats[next_file_idx],
+                                                   in_file_path_list[next_file_idx], in_message_filter)] = \
+                    next_file_idx
+                next_file_idx += 1
+            done_futures, _ = concurrent.futures.wait(future_to_file_idx,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done_futures:
+                file_idx = future_to_file_idx.pop(future)
+                file_formats[file_idx], results[file_idx] = future.result()
+    return results
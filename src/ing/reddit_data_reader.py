@@ -1,11 +1,15 @@
-from typing import List, Optional
+from typing import IO, Optional
 
 import pandas as pd
 
-from .interface_source_data_reader import IDataSourceReader
+from .interface_source_data_reader import IDataSourceReader, MessageFilter, \
+    join_string_columns, read_csv_filtered
+from .source_file_format import get_head_columns, read_file_head
 
 
 class RedditDataReader(IDataSourceReader):
+    file_formats = ("reddit_submissions", "reddit_comments")
+
     reddit_submissions_column_dict = {'archived': 'archived', 'author': 'source_user_id',
                                       'call_to_action': 'call_to_action', 'can_gild': 'can_gild',
                                       'contest_mode': 'contest_mode',
@@ -41,50 +45,61 @@ class RedditDataReader(IDataSourceReader):
         self.required_reddit_comments_column_names = [com_col for com_col in self.reddit_comments_column_dict if
                                                       self.reddit_comments_column_dict[com_col] in self.required_columns]
 
-    def read_reddit_submissions_file(self, in_file_path: str) -> pd.DataFrame:
-        df = pd.read_csv(in_file_path, dtype={key: str for key in self.reddit_submissions_column_dict},
-                         usecols=self.required_reddit_submissions_column_names)
+    def read_reddit_submissions_file(self, in_file_path: str, in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        return read_csv_filtered(in_file_path, self.__normalize_reddit_submissions_df, in_message_filter,
+                                 dtype={key: str for key in self.reddit_submissions_column_dict},
+                                 usecols=self.required_reddit_submissions_column_names)
+
+    def __normalize_reddit_submissions_df(self, df: pd.DataFrame) -> pd.DataFrame:
         df['datetime'] = pd.to_datetime(df['datetime'], format="%Y-%m-%d %H:%M:%S.%f", utc=True)
         df = df.rename(columns=self.reddit_submissions_column_dict)
-        df['search_article_urls'] = df.apply(lambda row: ", ".join([row[col] for col in df.columns if type(row[col]) is str]), axis=1)
+        df['search_article_urls'] = join_string_columns(df, df.columns)
         df['parent_source_msg_id'] = ""
         df['platform'] = "reddit.com"
         df['parent_source_user_id'] = ""
         return df
 
-    def read_reddit_comments_file(self, in_file_path: str) -> pd.DataFrame:
-        df = pd.read_csv(in_file_path, dtype={key: str for key in self.reddit_comments_column_dict},
-                         usecols=self.required_reddit_comments_column_names)
+    def read_reddit_comments_file(self, in_file_path: str, in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        return read_csv_filtered(in_file_path, self.__normalize_reddit_comments_df, in_message_filter,
+                                 dtype={key: str for key in self.reddit_comments_column_dict},
+                                 usecols=self.required_reddit_comments_column_names)
+
+    def __normalize_reddit_comments_df(self, df: pd.DataFrame) -> pd.DataFrame:
         df['datetime'] = pd.to_datetime(df['datetime'], format="%Y-%m-%d %H:%M:%S.%f", utc=True)
         df = df.rename(columns=self.reddit_comments_column_dict)
-        df['search_article_urls'] = df.apply(lambda row: ", ".join([row[col] for col in df.columns if type(row[col]) is str]), axis=1)
+        df['search_article_urls'] = join_string_columns(df, df.columns)
         df['title'] = df['content']
         df['platform'] = "reddit.com"
         df['parent_source_user_id'] = ""
         return df
 
-    def read_data_file(self, in_file_path: str, in_supress_exception: bool = True) -> Optional[pd.DataFrame]:
-        df = pd.read_csv(in_file_path, nrows=1)
+    def detect_file_format(self, in_file_head: str) -> Optional[str]:
+        head_columns = get_head_columns(in_file_head)
+        if all([key in head_columns for key in self.reddit_submissions_column_dict]):
+            return "reddit_submissions"
+        if all([key in head_columns for key in self.reddit_comments_column_dict]):
+            return "reddit_comments"
+        return None
 
-        if all([key in df.columns for key in self.reddit_submissions_column_dict]):
+    def read_file_of_format(self, in_file_path: str, in_file_format: str, in_file_buffer: IO = None,
+                            in_message_filter: MessageFilter = None) -> pd.DataFrame:
+        if in_file_format == "reddit_submissions":
             print(f"Reddit Submissions data: {in_file_path}")
-            return self.read_reddit_submissions_file(in_file_path)
-
-        if all([key in df.columns for key in self.reddit_comments_column_dict]):
+            return self.read_reddit_submissions_file(in_file_path if in_file_buffer is None else in_file_buffer,
+                                                     in_message_filter)
+        if in_file_format == "reddit_comments":
             print(f"Reddit Comments data: {in_file_path}")
-            return self.read_reddit_comments_file(in_file_path)
+            return self.read_reddit_comments_file(in_file_path if in_file_buffer is None else in_file_buffer,
+                                                  in_message_filter)
+        raise ValueError(f"Unknown Reddit file format : {in_file_format}")
+
+    def read_data_file(self, in_file_path: str, in_supress_exception: bool = True,
+                       in_message_filter: MessageFilter = None) -> Optional[pd.DataFrame]:
+        file_format = self.detect_file_format(read_file_head(in_file_path))
+        if file_format is not None:
+            return self.read_file_of_format(in_file_path, file_format, None, in_message_filter)
 
         if in_supress_exception:
             return None
         else:
             raise Exception("File do not contain Reddit submissions or comments columns!")
-
-    def read_data_files_list(self, in_file_path_list: List[str]) -> pd.DataFrame:
-        """
-        Reads all files that have the from of reddit data file structure.
-        Removes duplicates based on the source_msg_id column.
-        """
-        result_df = pd.concat([self.read_data_file(data_file) for data_file in in_file_path_list])
-        result_df.drop_duplicates(subset='source_msg_id', keep="first", inplace=True)
-        result_df.reset_index(drop=True, inplace=True)
-        return result_df
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os.path
+from typing import Dict, List
+
+import numpy as np
+
+
+def hash_file(in_file_path: str, in_chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the sha256 hex digest of a file.
+    """
+    file_hash = hashlib.sha256()
+    with open(in_file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(in_chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def hash_actor_list(in_actor_id_list: List[str]) -> str:
+    """
+    Returns the sha256 hex digest of an actor id list (order sensitive).
+    """
+    return hashlib.sha256("\n".join(map(str, in_actor_id_list)).encode("utf-8")).hexdigest()
+
+
+def hash_arrays(in_arrays: List[np.ndarray]) -> str:
+    """
+    Returns the sha256 hex digest of the shapes, dtypes and contents of a list of arrays.
+    """
+    arrays_hash = hashlib.sha256()
+    for array in in_arrays:
+        arrays_hash.update(f"{array.shape}{array.dtype}".encode("utf-8"))
+        arrays_hash.update(np.ascontiguousarray(array).tobytes())
+    return arrays_hash.hexdigest()
+
+
+class RunManifest:
+    """
+    JSON manifest of a run that writes one output file per window, e.g. calculate_te_network_series. The manifest
+    records the parameters of the run, the hash of the actor list and the size and sha256 of each completed window
+    file, so that a restarted run with identical inputs can skip the windows that are already complete.
+
+    Example
+    --------
+
+        $manifest = RunManifest("out/manifest.json", {"frequency": "12H"}, actor_id_list)
+        $if not manifest.is_window_complete("window_1", "out/window_1.csv.zip"):
+        $    save_window("out/window_1.csv.zip")
+        $    manifest.add_window("window_1", "out/window_1.csv.zip")
+
+    Attributes
+    ----------
+    file_path : str
+        Path of the manifest file
+    params : dict
+        JSON serializable parameters of the run
+    actor_list_sha256 : str
+        Hash of the actor id list
+    windows : Dict[str, dict]
+        Window name to {"file_name", "size", "sha256"} of the completed windows
+    """
+
+    VERSION = 1
+
+    def __init__(self, in_file_path: str, in_params: dict, in_actor_id_list: List[str], in_resume: bool = True):
+        """
+        Loads the completed windows of the manifest in_file_path if in_resume is True and it was written by a run with
+        the same parameters and actors. Otherwise, the run starts with no completed windows.
+        """
+        self.file_path = in_file_path
+        # round trip so that the parameters compare equal to the loaded ones
+        self.params = json.loads(json.dumps(in_params, default=str))
+        self.actor_list_sha256 = hash_actor_list(in_actor_id_list)
+        self.windows: Dict[str, dict] = {}
+        if in_resume and os.path.exists(in_file_path):
+            self.__load()
+
+    def __load(self):
+        try:
+            with open(self.file_path, "r") as f:
+                manifest_dict = json.load(f)
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable manifest : {self.file_path}")
+            return
+        if manifest_dict.get("version") != self.VERSION or manifest_dict.get("params") != self.params or \
+                manifest_dict.get("actor_list_sha256") != self.actor_list_sha256:
+            print(f"Ignoring manifest of a run with different inputs : {self.file_path}")
+            return
+        self.windows = manifest_dict.get("windows", {})
+        print(f"Resuming run with {len(self.windows)} completed windows : {self.file_path}")
+
+    def is_window_complete(self, in_window_name: str, in_window_file_path: str) -> bool:
+        """
+        True if the window is recorded as complete and its file still has the recorded size and sha256.
+        """
+        window_dict = self.windows.get(in_window_name)
+        if window_dict is None or window_dict["file_name"] != os.path.basename(in_window_file_path) or \
+                not os.path.isfile(in_window_file_path) or os.path.getsize(in_window_file_path) != window_dict["size"]:
+            return False
+        return hash_file(in_window_file_path) == window_dict["sha256"]
+
+    def add_window(self, in_window_name: str, in_window_file_path: str):
+        """
+        Records a completed window file and saves the manifest.
+        """
+        self.windows[in_window_name] = {"file_name": os.path.basename(in_window_file_path),
+                                        "size": os.path.getsize(in_window_file_path),
+                                        "sha256": hash_file(in_window_file_path)}
+        self.save()
+
+    def save(self):
+        """
+        Writes the manifest. The file is replaced atomically, so a run that dies while saving keeps the previous one.
+        """
+        temp_file_path = f"{self.file_path}.tmp"
+        with open(temp_file_path, "w") as f:
+            json.dump({"version": self.VERSION,
+                       "params": self.params,
+                       "actor_list_sha256": self.actor_list_sha256,
+                       "windows": self.windows}, f, indent=2)
+        os.replace(temp_file_path, self.file_path)
@@ -0,0 +1,227 @@
+import concurrent.futures
+import datetime
+import multiprocessing
+import multiprocessing.pool
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+from .any_data_source_reader import AnyDataSourceReader
+from .data_manager import DataManager
+from .ingest_cache import IngestCache
+from .news_domain_classifier import NewsDomainClassifier
+from .news_domain_identifier import NewsDomainIdentifier
+from .time_keeper import TimeKeeper
+
+# state of the running batch, inherited by the forked scenario processes (see run_batch_scenario)
+batch_runner = None
+
+
+class ScenarioSpec:
+    """
+    A scenario of a ScenarioBatchRunner.
+
+    Attributes
+    ----------
+    name : str
+        Name of the scenario
+    data_file_paths : List[str]
+        Raw data files of the scenario
+    output_dir_path : str
+        Output folder of the DataManager of the scenario
+    start_date : datetime.datetime
+        Inclusive start date of the messages, see DataManager.preprocess
+    end_date : datetime.datetime
+        Inclusive end date of the messages
+    require_date_range : bool
+        Skip the scenario if the raw messages do not cover [start_date, end_date].
+    params : dict
+        Scenario specific parameters of the scenario function, e.g. the frequency of the TE network series
+    """
+
+    def __init__(self, in_name: str, in_data_file_paths: List[str], in_output_dir_path: str,
+                 in_start_date: datetime.datetime = None, in_end_date: datetime.datetime = None,
+                 in_require_date_range: bool = False, in_params: dict = None):
+        self.name = in_name
+        self.data_file_paths = list(in_data_file_paths)
+        self.output_dir_path = in_output_dir_path
+        self.start_date = in_start_date
+        self.end_date = in_end_date
+        self.require_date_range = in_require_date_range
+        self.params = {} if in_params is None else in_params
+
+
+def run_batch_scenario(in_spec_idx: int) -> Any:
+    return batch_runner.run_scenario(batch_runner.scenario_specs[in_spec_idx])
+
+
+class ScenarioBatchRunner:
+    """
+    Runs several scenarios concurrently. The raw data files are read once for all scenarios, the news domain
+    identifier and classifier are compiled once, and each scenario runs in its own forked process (which shares the
+    read data with the parent) with a DataManager in in_spec.output_dir_path, so it writes the same files as a
+    scenario that is run alone.
+
+    Example
+    --------
+
+        $def calculate_te(in_data_manager, in_spec, in_pool):
+        $    in_data_manager.generate_data_tables(200, None)
+        $    with ing.TransferEntropyCalculator(in_data_manager, in_pool=in_pool) as te_calculator:
+        $        te_calculator.calculate_te_network_series(...)
+        $
+        $runner = ScenarioBatchRunner(news_domain_classes_df, calculate_te, in_max_memory_bytes=64 * 2 ** 30)
+        $scenario_to_result = runner.run([ScenarioSpec("scenario_a", files_a, "./OUTPUTS/scenario_a", start, end),
+        $                                 ScenarioSpec("scenario_b", files_b, "./OUTPUTS/scenario_b", start, end)])
+
+    Attributes
+    ----------
+    scenario_function : Callable[[DataManager, ScenarioSpec, multiprocessing.pool.Pool], Any]
+        Called with the preprocessed DataManager of each scenario, the scenario spec and the worker pool of the
+        scenario. Its return value must be picklable.
+    max_cpus : int
+        CPU budget of the batch, shared by the worker pools of the running scenarios
+    max_concurrent_scenarios : int
+        Maximum number of scenarios that run at the same time
+    max_memory_bytes : int
+        Memory budget of the running scenarios, None for no limit. A scenario is started only if the estimated memory
+        of the running scenarios stays within the budget (a scenario always starts if no other scenario runs).
+    memory_per_input_byte : float
+        Estimated memory of a scenario per byte of its raw messages
+    file_to_df : Dict[str, pd.DataFrame]
+        Dataframe of each raw data file that was read
+    """
+
+    def __init__(self, in_news_domain_classes_df: pd.DataFrame,
+                 in_scenario_function: Callable[[DataManager, ScenarioSpec, multiprocessing.pool.Pool], Any],
+                 in_max_cpus: int = None, in_max_concurrent_scenarios: int = None, in_max_memory_bytes: int = None,
+                 in_memory_per_input_byte: float = 8.0, in_output_format: str = "csv.zip",
+                 in_ingest_cache: IngestCache = None):
+        """
+        Parameters
+        ----------
+        in_news_domain_classes_df :
+            The classification of news domains into classes, see DataManager.preprocess.
+        in_scenario_function :
+            See scenario_function.
+        in_max_cpus :
+            CPU budget of the batch. Defaults to the number of CPUs.
+        in_max_concurrent_scenarios :
+            Defaults to half of the CPU budget, so that the pool of each scenario has at least 2 workers.
+        in_max_memory_bytes :
+            Memory budget of the running scenarios, None for no limit.
+        in_memory_per_input_byte :
+            Estimated memory of a scenario per byte of its raw messages (the preprocessed messages, the tables and the
+            timeseries).
+        in_output_format :
+            Output format of the DataManagers.
+        in_ingest_cache :
+            On-disk cache of the dataframes of the data files, see IngestCache.
+        """
+        self.news_domain_classes_df = in_news_domain_classes_df
+        self.scenario_function = in_scenario_function
+        self.max_cpus = multiprocessing.cpu_count() if in_max_cpus is None else in_max_cpus
+        self.max_concurrent_scenarios = max(1, self.max_cpus // 2) if in_max_concurrent_scenarios is None \
+            else in_max_concurrent_scenarios
+        self.max_memory_bytes = in_max_memory_bytes
+        self.memory_per_input_byte = in_memory_per_input_byte
+        self.output_format = in_output_format
+        self.ingest_cache = in_ingest_cache
+        self.file_to_df = {}
+        self.scenario_specs = []
+        self.num_pool_workers = 1
+        self.news_domain_identifier = None
+        self.news_domain_classifier = None
+
+    def read_data_files(self, in_data_file_paths: List[str]):
+        """
+        Reads the data files that were not read yet into file_to_df, concurrently (see
+        AnyDataSourceReader.read_data_files).
+        """
+        tk = TimeKeeper("Reading data files of all scenarios")
+        missing_file_paths = [data_file for data_file in dict.fromkeys(in_data_file_paths)
+                              if data_file not in self.file_to_df]
+        self.file_to_df.update(zip(missing_file_paths, AnyDataSourceReader(in_ingest_cache=self.ingest_cache)
+                                   .read_data_files(missing_file_paths)))
+        tk.done()
+
+    def get_scenario_memory_bytes(self, in_spec: ScenarioSpec) -> int:
+        """
+        Returns the estimated memory of the scenario in_spec, see memory_per_input_byte.
+        """
+        input_bytes = sum(int(self.file_to_df[data_file].memory_usage(deep=True).sum())
+                          for data_file in dict.fromkeys(in_spec.data_file_paths)
+                          if self.file_to_df[data_file] is not None)
+        return int(input_bytes * self.memory_per_input_byte)
+
+    def run_scenario(self, in_spec: ScenarioSpec) -> Any:
+        """
+        Reads, preprocesses and runs the scenario in_spec in the current process.
+        """
+        print(in_spec.name)
+        data_manager = DataManager(in_spec.output_dir_path, self.output_format)
+        data_manager.read_data_files(in_spec.data_file_paths, self.file_to_df)
+        min_date = data_manager.all_osn_msgs_df.datetime.min()
+        max_date = data_manager.all_osn_msgs_df.datetime.max()
+        if in_spec.require_date_range and not ((in_spec.start_date is None or min_date <= in_spec.start_date) and
+                                               (in_spec.end_date is None or in_spec.end_date <= max_date)):
+            print(f"ERROR: {in_spec.name} : START_DATE and END_DATE are not within the data set.")
+            return None
+        with multiprocessing.Pool(self.num_pool_workers) as pool:
+            data_manager.preprocess(self.news_domain_classes_df, in_spec.start_date, in_spec.end_date, pool,
+                                    self.news_domain_identifier, self.news_domain_classifier)
+            return self.scenario_function(data_manager, in_spec, pool)
+
+    def run(self, in_scenario_specs: List[ScenarioSpec]) -> Dict[str, Any]:
+        """
+        Runs the scenarios in_scenario_specs, in the given order as the CPU and memory budgets allow.
+
+        Returns
+        -------
+            Scenario name to the return value of scenario_function, or to the exception raised by the scenario.
+        """
+        global batch_runner
+        self.scenario_specs = list(in_scenario_specs)
+        self.read_data_files([data_file for spec in self.scenario_specs for data_file in spec.data_file_paths])
+        tk = TimeKeeper("Compiling news domain identifier and classifier")
+        self.news_domain_identifier = NewsDomainIdentifier(self.news_domain_classes_df['news_domain'].unique())
+        self.news_domain_classifier = NewsDomainClassifier(self.news_domain_classes_df, {'TF', 'TM', 'UF', 'UM'})
+        tk.done()
+
+        num_concurrent = max(1, min(len(self.scenario_specs), self.max_concurrent_scenarios))
+        self.num_pool_workers = max(1, self.max_cpus // num_concurrent)
+        spec_memory_bytes = [self.get_scenario_memory_bytes(spec) for spec in self.scenario_specs]
+        print(f"Running {len(self.scenario_specs)} scenarios, at most {num_concurrent} at a time with "
+              f"{self.num_pool_workers} pool workers each")
+
+        scenario_to_result = {}
+        batch_runner = self
+        # the scenario processes are forked so that they share file_to_df and the compiled domain index
+        with concurrent.futures.ProcessPoolExecutor(num_concurrent, multiprocessing.get_context("fork")) as executor:
+            future_to_spec_idx = {}
+            running_memory_bytes = 0
+            next_spec_idx = 0
+            while next_spec_idx < len(self.scenario_specs) or future_to_spec_idx:
+                while next_spec_idx < len(self.scenario_specs) and len(future_to_spec_idx) < num_concurrent and \
+                        (not future_to_spec_idx or self.max_memory_bytes is None or
+                         running_memory_bytes + spec_memory_bytes[next_spec_idx] <= self.max_memory_bytes):
+                    if self.max_memory_bytes is not None and spec_memory_bytes[next_spec_idx] > self.max_memory_bytes:
+                        print(f"WARNING: {self.scenario_specs[next_spec_idx].name} needs about "
+                              f"{spec_memory_bytes[next_spec_idx]} bytes, more than the memory budget")
+                    future_to_spec_idx[executor.submit(run_batch_scenario, next_spec_idx)] = next_spec_idx
+                    running_memory_bytes += spec_memory_bytes[next_spec_idx]
+                    next_spec_idx += 1
+                done_futures, _ = concurrent.futures.wait(future_to_spec_idx,
+                                                          return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done_futures:
+                    spec_idx = future_to_spec_idx.pop(future)
+                    running_memory_bytes -= spec_memory_bytes[spec_idx]
+                    spec = self.scenario_specs[spec_idx]
+                    try:
+                        scenario_to_result[spec.name] = future.result()
+                        print(f"Scenario {spec.name} done.")
+                    except Exception as e:
+                        print(f"ERROR: Scenario {spec.name} failed : {e!r}")
+                        scenario_to_result[spec.name] = e
+        batch_runner = None
+        return {spec.name: scenario_to_result[spec.name] for spec in self.scenario_specs}
@@ -0,0 +1,128 @@
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .bit_packed_timeseries import BitPackedTimeseries
+
+# attach_shared_memory swaps resource_tracker.register of the process while it attaches
+attach_lock = threading.Lock()
+
+
+def attach_shared_memory(in_name: str) -> shared_memory.SharedMemory:
+    """
+    Attaches to the existing shared memory block in_name without registering it with the resource tracker, since the
+    creating process unlinks it (SharedMemory(track=False) from Python 3.13). Before 3.13, SharedMemory(name=...)
+    always registers the block, so the registration is skipped while attaching: unregistering it afterwards would
+    remove the single entry of the block from a tracker shared with the creating process (a worker forked after the
+    tracker started), and concurrent attaches would unregister it twice, while a worker with its own tracker would
+    warn about "leaked shared_memory objects" (and unlink them) when it exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=in_name, track=False)
+    register = resource_tracker.register
+
+    def register_except_shared_memory(in_resource_name: str, in_resource_type: str):
+        if in_resource_type != "shared_memory":
+            register(in_resource_name, in_resource_type)
+
+    with attach_lock:
+        resource_tracker.register = register_except_shared_memory
+        try:
+            return shared_memory.SharedMemory(name=in_name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedTimeseriesTensor:
+    """
+    A contiguous actor x class x time array of binary timeseries stored in shared memory, so that worker processes can
+    attach to it once instead of receiving the timeseries with every task.
+
+    Attributes
+    ----------
+    shm : shared_memory.SharedMemory
+        The shared memory block that holds the array.
+    shape : Tuple[int, int, int]
+        (num_actors, num_classes, num_time_steps)
+    classes : List[str]
+        Class of each index of the second axis.
+    array : np.ndarray
+        uint8 array view of the shared memory block.
+    is_owner : bool
+        True if this object created the shared memory block (and has to unlink it).
+    """
+
+    def __init__(self, in_shape: Tuple[int, int, int], in_classes: List[str], in_name: str = None):
+        """
+        Creates a new shared tensor if in_name is None, otherwise attaches to the existing shared memory block in_name.
+        """
+        self.shape = tuple(in_shape)
+        self.classes = list(in_classes)
+        self.is_owner = in_name is None
+        if self.is_owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(self.shape))))
+        else:
+            self.shm = attach_shared_memory(in_name)
+        self.array = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @classmethod
+    def from_actor_timeseries_dict_list(cls, in_actor_timeseries_dict_list: List[Dict[str, np.ndarray]],
+                                        in_classes: List[str], in_period_start_idx: int = 0,
+                                        in_period_end_idx: int = None) -> "SharedTimeseriesTensor":
+        """
+        Copies the [in_period_start_idx, in_period_end_idx) slice of the "actor timeseries dicts" into a new shared
+        tensor.
+        """
+        if in_period_end_idx is None:
+            in_period_end_idx = len(in_actor_timeseries_dict_list[0][in_classes[0]]) if in_actor_timeseries_dict_list else 0
+        tensor = cls((len(in_actor_timeseries_dict_list), len(in_classes), in_period_end_idx - in_period_start_idx),
+                     in_classes)
+        for actor_idx, actor_timeseries_dict in enumerate(in_actor_timeseries_dict_list):
+            for class_idx, this_class in enumerate(in_classes):
+                tensor.array[actor_idx, class_idx] = actor_timeseries_dict[this_class][in_period_start_idx:in_period_end_idx]
+        return tensor
+
+    @classmethod
+    def from_bit_packed_timeseries(cls, in_timeseries_store: BitPackedTimeseries, in_classes: List[str],
+                                   in_period_start_idx: int = 0,
+                                   in_period_end_idx: int = None) -> "SharedTimeseriesTensor":
+        """
+        Unpacks the [in_period_start_idx, in_period_end_idx) slice of the in_classes series of in_timeseries_store
+        into a new shared tensor, one class at a time.
+        """
+        if in_period_end_idx is None:
+            in_period_end_idx = in_timeseries_store.num_time_steps
+        tensor = cls((in_timeseries_store.num_actors, len(in_classes), in_period_end_idx - in_period_start_idx),
+                     in_classes)
+        for class_idx, this_class in enumerate(in_classes):
+            tensor.array[:, class_idx] = in_timeseries_store.get_matrix(this_class, in_period_start_idx,
+                                                                        in_period_end_idx)
+        return tensor
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def get_attach_args(self) -> Tuple[Tuple[int, int, int], List[str], str]:
+        """
+        Returns the constructor arguments that attach another process to this tensor.
+        """
+        return self.shape, self.classes, self.name
+
+    def close(self):
+        """
+        Detaches from the shared memory block, and frees it if this object created it.
+        """
+        self.array = None
+        self.shm.close()
+        if self.is_owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
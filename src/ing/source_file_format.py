@@ -0,0 +1,135 @@
+import io
+import json
+import os.path
+from typing import Dict, List, Optional
+
+import fsspec
+import pandas as pd
+
+
+def get_file_fingerprint(in_file_path: str) -> Optional[str]:
+    """
+    Returns the ETag of a remote file (e.g. on S3), or the size and modification time of a local file, so that a
+    changed file gets a different fingerprint. None if the file system does not provide them.
+    """
+    try:
+        fs, path = fsspec.core.url_to_fs(in_file_path)
+        info = fs.info(path)
+    except (OSError, ValueError):
+        return None
+    etag = info.get("ETag", info.get("etag"))
+    if etag is not None:
+        return f"etag:{etag}"
+    mtime = info.get("mtime", info.get("LastModified"))
+    if mtime is None:
+        return None
+    return f"size:{info.get('size')},mtime:{mtime}"
+
+
+def read_file_head(in_file_path: str, in_num_bytes: int = 1 << 16) -> str:
+    """
+    Reads the first complete lines in the first in_num_bytes bytes of a (possibly compressed or remote) text file, with
+    one partial fetch and decompression.
+    """
+    with fsspec.open(in_file_path, "rb", compression="infer") as f:
+        return decode_file_head(f.read(in_num_bytes), in_num_bytes)
+
+
+def decode_file_head(in_file_bytes: bytes, in_num_bytes: int = 1 << 16) -> str:
+    """
+    Decodes the complete lines in the first in_num_bytes bytes of the (decompressed) bytes of a text file.
+    """
+    head = in_file_bytes[:in_num_bytes]
+    if len(head) == in_num_bytes and b"\n" in head:
+        head = head[:head.rindex(b"\n") + 1]
+    return head.decode("utf-8-sig", errors="replace")
+
+
+def detect_head_file_format(in_readers: list, in_file_head: str) -> Optional[str]:
+    """
+    Returns the format of the first reader of in_readers whose signature matches the head of a file (see
+    IDataSourceReader.detect_file_format), None if no reader matches.
+    """
+    for reader in in_readers:
+        file_format = reader.detect_file_format(in_file_head)
+        if file_format is not None:
+            return file_format
+    return None
+
+
+def get_file_format_reader(in_readers: list, in_file_format: str):
+    """
+    Returns the reader of in_readers that reads the in_file_format files.
+    """
+    return next(reader for reader in in_readers if in_file_format in reader.file_formats)
+
+
+def get_head_columns(in_file_head: str, in_skiprows: int = 0) -> List[str]:
+    """
+    Returns the column names of a csv file head after skipping in_skiprows lines, or [] if it has no such header.
+    """
+    try:
+        return pd.read_csv(io.StringIO(in_file_head), skiprows=in_skiprows, nrows=0).columns.to_list()
+    except (pd.errors.EmptyDataError, pd.errors.ParserError):
+        return []
+
+
+class FileFormatCache:
+    """
+    Detected file format of each data file, keyed by file path and valid while the file fingerprint (see
+    get_file_fingerprint) is unchanged. The cache is saved as JSON if a file path is given, so that repeat runs do not
+    read the file heads again.
+
+    Attributes
+    ----------
+    file_path : str
+        Path of the JSON file of the cache, None to keep it in memory only
+    path_to_entry : Dict[str, dict]
+        Data file path to {"fingerprint", "format"}
+    """
+
+    VERSION = 1
+
+    def __init__(self, in_file_path: str = None):
+        self.file_path = in_file_path
+        self.path_to_entry: Dict[str, dict] = {}
+        if in_file_path is not None and os.path.exists(in_file_path):
+            self.__load()
+
+    def __load(self):
+        try:
+            with open(self.file_path, "r") as f:
+                cache_dict = json.load(f)
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable file format cache : {self.file_path}")
+            return
+        if cache_dict.get("version") == self.VERSION:
+            self.path_to_entry = cache_dict.get("files", {})
+
+    def get(self, in_data_file_path: str, in_fingerprint: Optional[str]) -> Optional[str]:
+        """
+        Returns the cached format of the data file, None if it is unknown or the file changed.
+        """
+        entry = self.path_to_entry.get(in_data_file_path)
+        if in_fingerprint is None or entry is None or entry["fingerprint"] != in_fingerprint:
+            return None
+        return entry["format"]
+
+    def set(self, in_data_file_path: str, in_fingerprint: Optional[str], in_format: str, in_save: bool = True):
+        """
+        Records the format of the data file and saves the cache, unless in_save is False (e.g. to save the formats of
+        several files at once).
+        """
+        if in_fingerprint is None:
+            return
+        self.path_to_entry[in_data_file_path] = {"fingerprint": in_fingerprint, "format": in_format}
+        if in_save:
+            self.save()
+
+    def save(self):
+        if self.file_path is None:
+            return
+        temp_file_path = f"{self.file_path}.tmp"
+        with open(temp_file_path, "w") as f:
+            json.dump({"version": self.VERSION, "files": self.path_to_entry}, f, indent=2)
+        os.replace(temp_file_path, self.file_path)
@@ -0,0 +1,262 @@
+import abc
+import time
+from typing import Dict, List, Tuple, Type
+
+import numpy as np
+import pyinform
+
+from .bit_packed_timeseries import calculate_bit_packed_te_matrix, pack_bits, unpack_bits
+from .transfer_entropy_matrix import calculate_te_matrix
+
+# numba is an optional dependency of the "numba" backend
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+
+class ITeBackend(metaclass=abc.ABCMeta):
+    """
+    Transfer entropy backend of the TransferEntropyCalculator. A backend computes the TE (history length 1, lag 1)
+    from every source series to every target series, with the values of pyinform.transfer_entropy(src, tgt, 1).
+
+    Attributes
+    ----------
+    name : str
+        Name of the backend in TE_BACKENDS
+    uses_worker_pool : bool
+        True if the calculator runs the backend on source blocks in a worker pool (one process per CPU) instead of
+        calling calculate_te_matrix in the main process.
+    supports_joint_count_updates : bool
+        True if the joint counts of a window series can be updated with the bins that each window adds or drops
+        (JointCountsAccumulator) instead of calling calculate_te_matrix for every window.
+    uses_bit_packed_series : bool
+        True if calculate_te_matrix_from_words works on the words directly, so the calculator does not unpack the
+        bit packed series of the windows for this backend.
+    """
+    name = None
+    uses_worker_pool = False
+    supports_joint_count_updates = False
+    uses_bit_packed_series = False
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """True if the dependencies of the backend are installed."""
+        return True
+
+    @abc.abstractmethod
+    def calculate_te_matrix(self, in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray) -> np.ndarray:
+        """
+        Calculates the transfer entropy from every row of in_src_matrix (num_sources, T) to every row of the binary
+        in_tgt_matrix (num_targets, T) as a (num_sources, num_targets) matrix.
+        """
+        raise NotImplementedError
+
+    def calculate_te_matrix_from_words(self, in_src_words: np.ndarray, in_tgt_words: np.ndarray,
+                                       in_num_time_steps: int) -> np.ndarray:
+        """
+        calculate_te_matrix of bit packed series (see pack_bits) of length in_num_time_steps. Unpacks them by default.
+        """
+        return self.calculate_te_matrix(unpack_bits(in_src_words, in_num_time_steps),
+                                        unpack_bits(in_tgt_words, in_num_time_steps))
+
+
+class PyinformTeBackend(ITeBackend):
+    """
+    Reference backend, one pyinform.transfer_entropy call per (source, target) pair.
+    """
+    name = "pyinform"
+    uses_worker_pool = True
+
+    def calculate_te_matrix(self, in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray) -> np.ndarray:
+        te_matrix = np.zeros((in_src_matrix.shape[0], in_tgt_matrix.shape[0]))
+        for src_idx in range(in_src_matrix.shape[0]):
+            for tgt_idx in range(in_tgt_matrix.shape[0]):
+                te_matrix[src_idx, tgt_idx] = pyinform.transfer_entropy(in_src_matrix[src_idx],
+                                                                        in_tgt_matrix[tgt_idx], 1)
+        return te_matrix
+
+
+class NumpyTeBackend(ITeBackend):
+    """
+    Batched backend, the joint counts of all pairs are computed with matrix products (see calculate_te_matrix).
+    """
+    name = "numpy"
+    supports_joint_count_updates = True
+
+    def calculate_te_matrix(self, in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray) -> np.ndarray:
+        return calculate_te_matrix(in_src_matrix, in_tgt_matrix)
+
+
+class BitPackedTeBackend(ITeBackend):
+    """
+    Bit packed backend, the joint counts of each pair are popcounts of ANDs of uint64 words
+    (see calculate_bit_packed_te_matrix). Fastest on long windows.
+    """
+    name = "bitpacked"
+    uses_bit_packed_series = True
+
+    def calculate_te_matrix(self, in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray) -> np.ndarray:
+        return calculate_bit_packed_te_matrix(pack_bits(in_src_matrix), pack_bits(in_tgt_matrix),
+                                              in_src_matrix.shape[1])
+
+    def calculate_te_matrix_from_words(self, in_src_words: np.ndarray, in_tgt_words: np.ndarray,
+                                       in_num_time_steps: int) -> np.ndarray:
+        return calculate_bit_packed_te_matrix(in_src_words, in_tgt_words, in_num_time_steps)
+
+
+def count_te_matrix(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray) -> np.ndarray:
+    """
+    Loop kernel of the numba backend. The 8 joint counts of (target history, source, target future) are counted for
+    each pair, and the source rows are processed in parallel when the kernel is compiled.
+
+    Parameters
+    ----------
+    in_src_matrix :
+        A uint8 matrix of 0s and 1s of shape (num_sources, T)
+    in_tgt_matrix :
+        A uint8 matrix of 0s and 1s of shape (num_targets, T)
+    """
+    num_sources, num_time_steps = in_src_matrix.shape
+    num_targets = in_tgt_matrix.shape[0]
+    num_observations = num_time_steps - 1
+    te_matrix = np.zeros((num_sources, num_targets))
+    for src_idx in prange(num_sources):
+        counts = np.zeros(8, dtype=np.int64)
+        for tgt_idx in range(num_targets):
+            counts[:] = 0
+            for t in range(num_observations):
+                state = 4 * in_tgt_matrix[tgt_idx, t] + 2 * in_src_matrix[src_idx, t] + in_tgt_matrix[tgt_idx, t + 1]
+                counts[state] += 1
+            te_value = 0.0
+            for history in range(2):
+                history_count = counts[4 * history] + counts[4 * history + 1] + counts[4 * history + 2] + \
+                                counts[4 * history + 3]
+                for src_value in range(2):
+                    history_src_count = counts[4 * history + 2 * src_value] + counts[4 * history + 2 * src_value + 1]
+                    for future in range(2):
+                        count = counts[4 * history + 2 * src_value + future]
+                        if count > 0:
+                            history_future_count = counts[4 * history + future] + counts[4 * history + 2 + future]
+                            te_value += count * np.log2(count * history_count /
+                                                        (history_src_count * history_future_count))
+            te_matrix[src_idx, tgt_idx] = te_value / num_observations
+    return te_matrix
+
+
+class NumbaTeBackend(ITeBackend):
+    """
+    JIT compiled backend (requires numba). count_te_matrix is compiled on first use, in parallel over the sources.
+    """
+    name = "numba"
+    kernel = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return njit is not None
+
+    def calculate_te_matrix(self, in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray) -> np.ndarray:
+        if not self.is_available():
+            raise ImportError("The numba TE backend requires numba (pip install numba)")
+        if NumbaTeBackend.kernel is None:
+            NumbaTeBackend.kernel = njit(parallel=True, cache=True)(count_te_matrix)
+        if in_src_matrix.shape[1] < 2:
+            return np.zeros((in_src_matrix.shape[0], in_tgt_matrix.shape[0]))
+        return NumbaTeBackend.kernel(np.ascontiguousarray(in_src_matrix > 0, dtype=np.uint8),
+                                     np.ascontiguousarray(in_tgt_matrix > 0, dtype=np.uint8))
+
+
+TE_BACKENDS: Dict[str, Type[ITeBackend]] = {backend_class.name: backend_class
+                                            for backend_class in [PyinformTeBackend, NumpyTeBackend, BitPackedTeBackend,
+                                                                  NumbaTeBackend]}
+
+
+def register_te_backend(in_backend_class: Type[ITeBackend]) -> Type[ITeBackend]:
+    """
+    Adds a backend class to TE_BACKENDS, so that it can be selected by name. Can be used as a class decorator.
+    """
+    TE_BACKENDS[in_backend_class.name] = in_backend_class
+    return in_backend_class
+
+
+def get_available_te_backend_names() -> List[str]:
+    return [name for name, backend_class in TE_BACKENDS.items() if backend_class.is_available()]
+
+
+def create_te_backend(in_name: str) -> ITeBackend:
+    """
+    Creates the backend in_name of TE_BACKENDS.
+    """
+    if in_name not in TE_BACKENDS:
+        raise ValueError(f"Unknown TE backend : {in_name}")
+    backend_class = TE_BACKENDS[in_name]
+    if not backend_class.is_available():
+        raise ImportError(f"The dependencies of the TE backend {in_name} are not installed")
+    return backend_class()
+
+
+def check_te_backend(in_backend: ITeBackend, in_num_actors: int = 8, in_num_time_steps: int = 97, in_seed: int = 0,
+                     in_tolerance: float = 1e-9):
+    """
+    Checks that the TE matrix of in_backend equals the one of pyinform on random series of different densities,
+    including constant series. This also compiles the JIT backends.
+
+    Raises
+    ------
+    ValueError
+        If a TE value differs from pyinform by more than in_tolerance
+    """
+    rng = np.random.default_rng(in_seed)
+    densities = np.linspace(0.0, 1.0, in_num_actors)[:, None]
+    matrix = (rng.random((in_num_actors, in_num_time_steps)) < densities).astype(np.uint8)
+    max_difference = np.abs(in_backend.calculate_te_matrix(matrix, matrix) -
+                            PyinformTeBackend().calculate_te_matrix(matrix, matrix)).max()
+    if max_difference > in_tolerance:
+        raise ValueError(f"TE backend {in_backend.name} differs from pyinform by {max_difference}")
+
+
+def select_fastest_te_backend(in_matrix: np.ndarray, in_num_workers: int = 1, in_max_sample_actors: int = 64,
+                              in_names: List[str] = None) -> Tuple[ITeBackend, Dict[str, float]]:
+    """
+    Micro-benchmarks the available backends that pass check_te_backend on a sample of the rows of in_matrix (the
+    actual series length), and returns the fastest one.
+
+    Parameters
+    ----------
+    in_matrix :
+        A binary matrix of shape (num_actors, T), e.g. the "*" class matrix of the calculation
+    in_num_workers :
+        Number of pool workers of the backends with uses_worker_pool, whose time is divided by this number
+    in_max_sample_actors :
+        Number of sources and targets of the sample
+    in_names :
+        Names of the candidate backends. Defaults to all available backends.
+
+    Returns
+    -------
+        (fastest backend, backend name to the estimated seconds per TE value)
+    """
+    sample_matrix = in_matrix[:in_max_sample_actors]
+    num_values = max(1, sample_matrix.shape[0] ** 2)
+    name_to_seconds = {}
+    name_to_backend = {}
+    for name in (get_available_te_backend_names() if in_names is None else in_names):
+        backend = create_te_backend(name)
+        try:
+            check_te_backend(backend)
+        except ValueError as e:
+            print(f"Skipping TE backend : {e}")
+            continue
+        start_time = time.perf_counter()
+        backend.calculate_te_matrix(sample_matrix, sample_matrix)
+        seconds = (time.perf_counter() - start_time) / num_values
+        name_to_seconds[name] = seconds / max(1, in_num_workers) if backend.uses_worker_pool else seconds
+        name_to_backend[name] = backend
+    if not name_to_backend:
+        raise ValueError("No TE backend passed the equivalence check against pyinform")
+    fastest_name = min(name_to_seconds, key=name_to_seconds.get)
+    print("TE backend timings (seconds per TE value) : {}".format(
+        ", ".join(f"{name}={seconds:.3g}" for name, seconds in name_to_seconds.items())))
+    print(f"Selected TE backend : {fastest_name}")
+    return name_to_backend[fastest_name], name_to_seconds
@@ -0,0 +1,148 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from .transfer_entropy_matrix import get_pair_indices
+
+
+def compute_top_k_mask(in_scores: np.ndarray, in_top_k: int, in_axis: int) -> np.ndarray:
+    """
+    Marks the in_top_k largest scores along in_axis with a partial selection (np.argpartition). Scores of -inf are
+    never marked.
+    """
+    num_values = in_scores.shape[in_axis]
+    if in_top_k >= num_values:
+        top_k_mask = np.ones(in_scores.shape, dtype=bool)
+    else:
+        top_k_idx = np.take(np.argpartition(in_scores, num_values - in_top_k, axis=in_axis),
+                            np.arange(num_values - in_top_k, num_values), axis=in_axis)
+        top_k_mask = np.zeros(in_scores.shape, dtype=bool)
+        np.put_along_axis(top_k_mask, top_k_idx, True, axis=in_axis)
+    return top_k_mask & (in_scores > -np.inf)
+
+
+class TeEdgeSelector:
+    """
+    Selects the rows (actor pairs) of actor_te_edges_df that are kept in the output. The score of a row is the largest
+    value of its score columns. Rows are kept if their score is above the threshold and, if top_k is given, among the
+    top_k scores of their source actor, of their target actor or of the whole network.
+
+    Rows are selected block by block where the TE values are calculated. Top-k per source is exact within a block of
+    source actors, while top-k per target and global top-k only keep the candidates of each block, which are merged by
+    merge_blocks.
+
+    Attributes
+    ----------
+    score_column_idx_list : List[int]
+        Indices of the TE value columns that make up the score.
+    threshold : float
+        Rows with a score <= threshold are dropped. None keeps every score.
+    top_k : int
+        Number of rows kept per group. None keeps every row above the threshold.
+    top_k_by : str
+        Group of the top-k selection, "source", "target" or "global".
+    """
+
+    TOP_K_BY_OPTIONS = ("source", "target", "global")
+
+    def __init__(self, in_score_column_idx_list: List[int], in_threshold: float = None, in_top_k: int = None,
+                 in_top_k_by: str = "source"):
+        if in_top_k_by not in self.TOP_K_BY_OPTIONS:
+            raise ValueError(f"Unknown top-k grouping : {in_top_k_by}")
+        if in_top_k is not None and in_top_k < 1:
+            raise ValueError("top-k must be at least 1!")
+        self.score_column_idx_list = list(in_score_column_idx_list)
+        self.threshold = in_threshold
+        self.top_k = in_top_k
+        self.top_k_by = in_top_k_by
+
+    @property
+    def is_selecting(self) -> bool:
+        return self.threshold is not None or self.top_k is not None
+
+    @property
+    def needs_merge(self) -> bool:
+        """
+        True if the selected rows of different source blocks have to be merged by merge_blocks.
+        """
+        return self.top_k is not None and self.top_k_by != "source"
+
+    def get_scores(self, in_te_values: np.ndarray) -> np.ndarray:
+        """
+        Returns the score of each row, -inf if the row is below the threshold.
+        """
+        scores = in_te_values[:, self.score_column_idx_list].max(axis=1, initial=-np.inf)
+        if self.threshold is not None:
+            scores[scores <= self.threshold] = -np.inf
+        return scores
+
+    def select_block(self, in_num_actors: int, in_src_idx_start: int, in_src_idx_end: int,
+                     in_te_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Selects the rows of a block of TE values of the sources [in_src_idx_start, in_src_idx_end).
+
+        Parameters
+        ----------
+        in_te_values :
+            One row per (source, target) pair of the block in the row order of actor_te_edges_df.
+
+        Returns
+        -------
+            (src_idx, tgt_idx, te_values) of the selected rows, in the row order of actor_te_edges_df.
+        """
+        src_idx, tgt_idx = get_pair_indices(in_num_actors, in_src_idx_start, in_src_idx_end)
+        if not self.is_selecting:
+            return src_idx, tgt_idx, in_te_values
+        scores = self.get_scores(in_te_values)
+        if self.top_k is None:
+            is_selected = scores > -np.inf
+        elif self.top_k_by == "source":
+            # the rows of each source are contiguous
+            is_selected = compute_top_k_mask(scores.reshape(in_src_idx_end - in_src_idx_start, in_num_actors - 1),
+                                             self.top_k, 1).ravel()
+        elif self.top_k_by == "target":
+            score_matrix = np.full((in_src_idx_end - in_src_idx_start, in_num_actors), -np.inf)
+            score_matrix[src_idx - in_src_idx_start, tgt_idx] = scores
+            is_selected = compute_top_k_mask(score_matrix, self.top_k, 0)[src_idx - in_src_idx_start, tgt_idx]
+        else:
+            is_selected = compute_top_k_mask(scores, self.top_k, 0)
+        return src_idx[is_selected], tgt_idx[is_selected], in_te_values[is_selected]
+
+    def merge(self, in_src_idx: np.ndarray, in_tgt_idx: np.ndarray,
+              in_te_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Selects the top-k rows per target or globally from the candidate rows of several blocks.
+
+        Returns
+        -------
+            (src_idx, tgt_idx, te_values) of the selected rows, in the row order of actor_te_edges_df.
+        """
+        scores = self.get_scores(in_te_values)
+        if self.top_k_by == "target":
+            sorted_idx = np.lexsort((-scores, in_tgt_idx))
+            sorted_tgt_idx = in_tgt_idx[sorted_idx]
+            group_start = np.searchsorted(sorted_tgt_idx, sorted_tgt_idx, side='left')
+            rank = np.arange(len(sorted_idx)) - group_start
+            selected_idx = sorted_idx[(rank < self.top_k) & (scores[sorted_idx] > -np.inf)]
+        else:
+            selected_idx = np.flatnonzero(compute_top_k_mask(scores, self.top_k, 0))
+        selected_idx = selected_idx[np.lexsort((in_tgt_idx[selected_idx], in_src_idx[selected_idx]))]
+        return in_src_idx[selected_idx], in_tgt_idx[selected_idx], in_te_values[selected_idx]
+
+    def merge_blocks(self, in_te_blocks: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+                     ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Passes the blocks through, or merges them into a single block if needs_merge. The merge keeps only the
+        selected rows so far, so its memory is bounded by the number of selected rows.
+        """
+        if not self.needs_merge:
+            yield from in_te_blocks
+            return
+        merged_block = None
+        for te_block in in_te_blocks:
+            if merged_block is None:
+                merged_block = te_block
+            else:
+                merged_block = self.merge(*[np.concatenate(arrays) for arrays in zip(merged_block, te_block)])
+        if merged_block is not None:
+            yield merged_block
@@ -0,0 +1,122 @@
+import io
+import os.path
+import zipfile
+
+import pandas as pd
+
+from .dataframe_file_formats import import_pyarrow
+
+
+class CsvZipEdgesWriter:
+    """
+    Appends chunks of actor_te_edges_df rows to a single zipped CSV file, so that a TE network can be saved without
+    keeping all of its rows in memory. The file has the same layout as
+    DataFrame.to_csv(path, index=False, compression=dict(method='zip', archive_name=...)).
+
+    Example
+    --------
+
+        $with CsvZipEdgesWriter("actor_te_edges_df.csv.zip", "actor_te_edges_df.csv") as writer:
+        $    for chunk_df in chunks:
+        $        writer.write(chunk_df)
+
+    Attributes
+    ----------
+    file_path : str
+        Path of the zip file
+    num_rows : int
+        Number of rows written so far
+    has_header : bool
+        True once the header line is written
+    """
+
+    def __init__(self, in_file_path: str, in_archive_name: str):
+        self.file_path = in_file_path
+        self.num_rows = 0
+        self.has_header = False
+        self.zip_file = zipfile.ZipFile(in_file_path, mode='w', compression=zipfile.ZIP_DEFLATED)
+        self.text_stream = io.TextIOWrapper(self.zip_file.open(in_archive_name, mode='w', force_zip64=True),
+                                            encoding='utf-8', newline='')
+
+    def write(self, in_edges_df: pd.DataFrame):
+        """
+        Appends the rows of in_edges_df. The header is written with the first chunk.
+        """
+        in_edges_df.to_csv(self.text_stream, index=False, header=not self.has_header)
+        self.has_header = True
+        self.num_rows += in_edges_df.shape[0]
+
+    def close(self):
+        self.text_stream.close()
+        self.zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ParquetEdgesWriter:
+    """
+    Parquet (zstd) version of CsvZipEdgesWriter. Each written chunk becomes a row group of the file, so single columns
+    can still be read without the others.
+
+    Attributes
+    ----------
+    file_path : str
+        Path of the parquet file
+    num_rows : int
+        Number of rows written so far
+    """
+
+    def __init__(self, in_file_path: str):
+        self.pa = import_pyarrow()
+        self.file_path = in_file_path
+        self.num_rows = 0
+        self.parquet_writer = None
+        self.schema = None
+        self.empty_df = None
+
+    def write(self, in_edges_df: pd.DataFrame):
+        """
+        Appends the rows of in_edges_df. The schema of the file is taken from the first non-empty chunk.
+        """
+        if in_edges_df.shape[0] == 0:
+            # the column types of empty chunks are unknown
+            self.empty_df = in_edges_df
+            return
+        table = self.pa.Table.from_pandas(in_edges_df, preserve_index=False)
+        if self.parquet_writer is None:
+            self.schema = table.schema
+            self.parquet_writer = self.pa.parquet.ParquetWriter(self.file_path, self.schema, compression='zstd')
+        self.parquet_writer.write_table(table.cast(self.schema))
+        self.num_rows += in_edges_df.shape[0]
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+        elif self.empty_df is not None:
+            self.empty_df.to_parquet(self.file_path, engine="pyarrow", compression="zstd", index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def create_te_edges_writer(in_file_path: str, in_archive_name: str = None):
+    """
+    Returns the streaming writer of in_file_path: a ParquetEdgesWriter for .parquet files and a CsvZipEdgesWriter
+    otherwise. The npz format can not be streamed.
+    """
+    if in_file_path.endswith(".parquet"):
+        return ParquetEdgesWriter(in_file_path)
+    if in_file_path.endswith(".npz"):
+        raise ValueError("The npz format can not be streamed!")
+    if in_archive_name is None:
+        in_archive_name = os.path.basename(in_file_path)
+        if in_archive_name.endswith(".zip"):
+            in_archive_name = in_archive_name[:-len(".zip")]
+    return CsvZipEdgesWriter(in_file_path, in_archive_name)
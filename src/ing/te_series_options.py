@@ -0,0 +1,72 @@
+from typing import List
+
+from .dataframe_file_formats import check_output_format
+
+
+class TeSeriesOptions:
+    """
+    Options of TransferEntropyCalculator.calculate_te_network_series: how the TE network of each window is computed
+    (streamed or swept), which edges are kept and how the window files are written.
+
+    Example
+    --------
+
+        $options = TeSeriesOptions(in_edge_top_k=10, in_output_format="parquet")
+        $calculator.calculate_te_network_series(actor_id_list, start_date, end_date, "12H", 7, 14, False, output_folder,
+        $                                       options)
+
+    Attributes
+    ----------
+    stream_block_size : int
+        If given, the TE network of each window is computed in blocks of this many source actors and each finished
+        block is appended to the output file (in completion order), so that the full pair list of a window is never
+        kept in memory.
+    sweep_lags : List[int]
+        If given, each window is computed with calculate_te_sweep for these lags and the output files get the Lag and
+        History columns.
+    sweep_history_lengths : List[int]
+        History lengths of the sweep. None for [1].
+    edge_threshold, edge_top_k, edge_top_k_by, edge_score_column :
+        Sparse output options, see calculate_te_network.
+    output_format : str
+        "csv.zip", "parquet" (zstd, requires pyarrow) or "npz" (actor id dictionary with float32 value columns, can not
+        be streamed). The files can be read back, also column by column, with read_te_edges.
+    resume : bool
+        If False, the manifest of a previous run is ignored and every window is calculated.
+    """
+
+    def __init__(self, in_stream_block_size: int = None, in_sweep_lags: List[int] = None,
+                 in_sweep_history_lengths: List[int] = None, in_edge_threshold: float = None,
+                 in_edge_top_k: int = None, in_edge_top_k_by: str = "source", in_edge_score_column: str = None,
+                 in_output_format: str = "csv.zip", in_resume: bool = True):
+        if in_sweep_lags is not None and in_stream_block_size is not None:
+            raise ValueError("TE sweeps can not be streamed!")
+        check_output_format(in_output_format)
+        if in_output_format == "npz" and in_stream_block_size is not None:
+            raise ValueError("The npz format can not be streamed!")
+        self.stream_block_size = in_stream_block_size
+        self.sweep_lags = in_sweep_lags
+        self.sweep_history_lengths = in_sweep_history_lengths
+        self.edge_threshold = in_edge_threshold
+        self.edge_top_k = in_edge_top_k
+        self.edge_top_k_by = in_edge_top_k_by
+        self.edge_score_column = in_edge_score_column
+        self.output_format = in_output_format
+        self.resume = in_resume
+
+    @property
+    def is_streamed(self) -> bool:
+        return self.stream_block_size is not None
+
+    @property
+    def is_swept(self) -> bool:
+        return self.sweep_lags is not None
+
+    def get_manifest_params(self) -> dict:
+        """
+        Returns the options that change the output files, recorded in the manifest of the run (see RunManifest).
+        """
+        return {"stream_block_size": self.stream_block_size, "sweep_lags": self.sweep_lags,
+                "sweep_history_lengths": self.sweep_history_lengths, "edge_threshold": self.edge_threshold,
+                "edge_top_k": self.edge_top_k, "edge_top_k_by": self.edge_top_k_by,
+                "edge_score_column": self.edge_score_column, "output_format": self.output_format}
@@ -1,13 +1,35 @@
+import collections
+import concurrent.futures
+import contextlib
 import datetime
+import functools
+import math
 import multiprocessing
-from typing import Dict, List, Tuple, Union
+import multiprocessing.pool
+import multiprocessing.resource_tracker
+import multiprocessing.util
+from typing import Dict, Iterator, List, Tuple, Union
 import pyinform
 import pandas as pd
 import numpy as np
 import os.path
 
+from .bit_packed_timeseries import SUPERCLASS_TO_CLASSES, BitPackedTimeseries, slice_bits, unpack_bits
 from .data_manager import DataManager
+from .dataframe_file_formats import write_dataframe_file
+from .run_manifest import RunManifest, hash_arrays
+from .shared_timeseries_tensor import SharedTimeseriesTensor
+from .te_backends import ITeBackend, check_te_backend, create_te_backend, select_fastest_te_backend
+from .te_edge_selector import TeEdgeSelector
+from .te_edges_writer import create_te_edges_writer
+from .te_series_options import TeSeriesOptions
 from .time_keeper import TimeKeeper
+from .transfer_entropy_matrix import JointCountsAccumulator, calculate_active_surrogate_statistics, \
+    calculate_active_te_matrix, calculate_te_sweep_matrices, count_zero_te_values, get_surrogate_rngs, \
+    te_block_to_rows
+
+# The shared timeseries tensor that each worker process of the TE pool attaches to once.
+worker_timeseries_tensor = None
 
 
 def compute_super_class_timeseries(in_class_to_timeseries):
@@ -58,11 +80,193 @@ def get_actor_time_series(in_actor_id: str, in_data_manager: DataManager, in_dat
     return class_to_timeseries
 
 
+def is_frequency_grid_aligned(in_datetime_index: pd.DatetimeIndex, in_frequency: str) -> bool:
+    """
+    Checks whether the bins of get_actor_time_series (resample(in_frequency) reindexed to in_datetime_index) are
+    (datetime - in_datetime_index[0]) // in_frequency. That is the case if in_frequency is a fixed frequency that
+    divides a day, and in_datetime_index (naive or UTC) starts at one of its bin edges within the day.
+    """
+    if len(in_datetime_index) == 0:
+        return False
+    try:
+        frequency = pd.Timedelta(pd.tseries.frequencies.to_offset(in_frequency))
+    except ValueError:
+        return False
+    if frequency <= pd.Timedelta(0) or pd.Timedelta(days=1) % frequency != pd.Timedelta(0):
+        return False
+    start = in_datetime_index[0]
+    if start.tz is not None and str(start.tz) != "UTC":
+        return False
+    return (start - start.normalize()) % frequency == pd.Timedelta(0)
+
+
+def get_finest_common_frequency(in_frequencies: List[str]) -> Union[str, None]:
+    """
+    Returns the longest fixed frequency that divides all of in_frequencies, e.g. "6h" for ["6H", "12H", "D"], or None
+    if one of them is not a fixed frequency.
+    """
+    try:
+        nanoseconds = [pd.Timedelta(pd.tseries.frequencies.to_offset(frequency)).value for frequency in in_frequencies]
+    except ValueError:
+        return None
+    if not nanoseconds or min(nanoseconds) <= 0:
+        return None
+    return pd.tseries.frequencies.to_offset(pd.Timedelta(math.gcd(*nanoseconds))).freqstr
+
+
+def coarsen_actor_timeseries_dict_list(in_actor_timeseries_dict_list: List[Dict[str, np.ndarray]], in_factor: int,
+                                       in_num_bins: int) -> List[Dict[str, np.ndarray]]:
+    """
+    Derives the timeseries dicts of a coarser frequency by OR-reducing each in_factor adjacent bins into one bin. Bin i
+    of the result covers the bins [i * in_factor, (i + 1) * in_factor) of the input, and missing bins at the end are 0.
+    The dtypes of the series are kept.
+
+    Parameters
+    ----------
+    in_actor_timeseries_dict_list :
+        A list which contains "actor timeseries dicts"
+    in_factor :
+        Number of bins of the input per bin of the result, e.g. 4 from "6H" to "D"
+    in_num_bins :
+        Number of bins of the result
+
+    Returns
+    -------
+        A list containing the coarser timeseries dicts of each actor
+    """
+    coarse_dict_list = [{} for _ in in_actor_timeseries_dict_list]
+    if not in_actor_timeseries_dict_list:
+        return coarse_dict_list
+    num_actors = len(in_actor_timeseries_dict_list)
+    for this_class in in_actor_timeseries_dict_list[0]:
+        matrix = np.stack([actor_timeseries_dict[this_class] for actor_timeseries_dict in in_actor_timeseries_dict_list])
+        num_fine_bins = min(matrix.shape[1], in_num_bins * in_factor)
+        is_set = np.zeros((num_actors, in_num_bins * in_factor), dtype=bool)
+        is_set[:, :num_fine_bins] = matrix[:, :num_fine_bins] > 0
+        coarse_matrix = is_set.reshape(num_actors, in_num_bins, in_factor).any(axis=2).astype(matrix.dtype)
+        for coarse_dict, coarse_timeseries in zip(coarse_dict_list, coarse_matrix):
+            coarse_dict[this_class] = coarse_timeseries
+    return coarse_dict_list
+
+
+def compute_key_class_timeseries(in_msg_keys: pd.Series, in_keys: np.ndarray, in_msg_is_class: np.ndarray,
+                                 in_bin_idx: np.ndarray, in_num_bins: int) -> np.ndarray:
+    """
+    Scatters the messages into a key x class x bin boolean array.
+
+    Parameters
+    ----------
+    in_msg_keys :
+        Key (user_id or platform) of each message
+    in_keys :
+        Keys of the rows of the result
+    in_msg_is_class :
+        Boolean array of shape (num_msgs, num_classes)
+    in_bin_idx :
+        Bin of each message, outside of [0, in_num_bins) for the messages that are not in any bin
+
+    Returns
+    -------
+        Boolean array of shape (len(in_keys), num_classes, in_num_bins)
+    """
+    key_index = pd.Index(pd.unique(in_keys))
+    msg_key_idx = key_index.get_indexer(in_msg_keys)
+    is_msg_used = (msg_key_idx >= 0) & (0 <= in_bin_idx) & (in_bin_idx < in_num_bins)
+    msg_idx, class_idx = np.nonzero(in_msg_is_class & is_msg_used[:, np.newaxis])
+    key_tensor = np.zeros((len(key_index), in_msg_is_class.shape[1], in_num_bins), dtype=bool)
+    key_tensor[msg_key_idx[msg_idx], class_idx, in_bin_idx[msg_idx]] = True
+    return key_tensor[key_index.get_indexer(in_keys)]
+
+
+def compute_actor_class_tensor(in_actor_id_list: List[str], in_data_manager: DataManager,
+                               in_datetime_index: pd.DatetimeIndex, in_frequency: str) -> np.ndarray:
+    """
+    Computes the binary series of the classes TF, TM, UF, UM and "*" of all actors of in_actor_id_list at once. The
+    bin of each message of the filtered view and the actor key (user_id or platform) of each actor are computed once,
+    and the messages are scattered into an actor x class x bin array. The series of a community actor is the
+    OR-reduction of the series of its members over the CSR membership. Requires
+    is_frequency_grid_aligned(in_datetime_index, in_frequency).
+
+    Returns
+    -------
+        Boolean array of shape (num_actors, 5, num_bins)
+    """
+    base_classes = ["TF", "TM", "UF", "UM"]
+    num_bins = len(in_datetime_index)
+    msgs_df = in_data_manager.filtered_osn_msgs_view_df
+    frequency = pd.Timedelta(pd.tseries.frequencies.to_offset(in_frequency))
+    bin_idx = ((msgs_df["datetime"] - in_datetime_index[0]) // frequency).to_numpy(dtype=float, na_value=-1)
+    bin_idx = np.where((0 <= bin_idx) & (bin_idx < num_bins), bin_idx, -1).astype(np.int64)
+    # class_TF, class_TM, class_UF, class_UM and "*" (every message) of each message
+    msg_is_class = np.concatenate([msgs_df[[f"class_{this_class}" for this_class in base_classes]].to_numpy() > 0,
+                                   np.ones((msgs_df.shape[0], 1), dtype=bool)], axis=1)
+    actor_types = in_data_manager.actors_df.loc[in_actor_id_list, "actor_type"].to_numpy()
+    actor_id_array = np.asarray(in_actor_id_list, dtype=object)
+    tensor = np.zeros((len(in_actor_id_list), len(base_classes) + 1, num_bins), dtype=bool)
+    for actor_type, actors_df, key_column in [("indv", in_data_manager.indv_actors_df, "user_id"),
+                                              ("plat", in_data_manager.plat_actors_df, "platform")]:
+        actor_idx = np.flatnonzero(actor_types == actor_type)
+        if len(actor_idx) > 0:
+            tensor[actor_idx] = compute_key_class_timeseries(
+                msgs_df[key_column], actors_df.loc[actor_id_array[actor_idx], key_column].to_numpy(), msg_is_class,
+                bin_idx, num_bins)
+    actor_idx = np.flatnonzero(actor_types == "comm")
+    if len(actor_idx) > 0:
+        comm_membership = in_data_manager.comm_membership
+        indptr, indices = comm_membership.get_sub_membership(actor_id_array[actor_idx])
+        member_tensor = compute_key_class_timeseries(msgs_df["user_id"], comm_membership.user_ids[indices].to_numpy(),
+                                                     msg_is_class, bin_idx, num_bins)
+        tensor[actor_idx] = comm_membership.or_reduce(member_tensor, indptr)
+    return tensor
+
+
+def calculate_actor_bit_packed_timeseries(in_actor_id_list: List[str], in_data_manager: DataManager,
+                                          in_datetime_index: pd.DatetimeIndex, in_frequency: str,
+                                          in_add_superclasses: bool) -> BitPackedTimeseries:
+    """
+    Vectorized version of get_actor_time_series for all actors of in_actor_id_list at once, bit packed. The series
+    of compute_actor_class_tensor are packed directly, and the superclasses are word-wise ORs of the packed classes.
+    Requires is_frequency_grid_aligned(in_datetime_index, in_frequency).
+    """
+    timeseries_store = BitPackedTimeseries.from_class_tensor(
+        compute_actor_class_tensor(in_actor_id_list, in_data_manager, in_datetime_index, in_frequency),
+        ["TF", "TM", "UF", "UM", "*"])
+    if in_add_superclasses:
+        timeseries_store.add_superclasses()
+    return timeseries_store
+
+
+def calculate_actor_timeseries_dict_list(in_actor_id_list: List[str], in_data_manager: DataManager,
+                                         in_datetime_index: pd.DatetimeIndex, in_frequency: str,
+                                         in_add_superclasses: bool) -> List[Dict[str, np.ndarray]]:
+    """
+    Actor timeseries dicts of compute_actor_class_tensor, for the callers of the dict API. The returned dicts are
+    equal to the ones of get_actor_time_series (values and dtypes). Requires
+    is_frequency_grid_aligned(in_datetime_index, in_frequency).
+
+    Returns
+    -------
+        A list containing the timeseries dicts of each actor
+    """
+    base_classes = ["TF", "TM", "UF", "UM"]
+    tensor = compute_actor_class_tensor(in_actor_id_list, in_data_manager, in_datetime_index, in_frequency)
+    actor_timeseries_dict_list = []
+    for actor_tensor in tensor:
+        class_to_timeseries = {this_class: actor_tensor[class_idx].astype(np.int64)
+                               for class_idx, this_class in enumerate(base_classes)}
+        if in_add_superclasses:
+            class_to_timeseries.update(compute_super_class_timeseries(class_to_timeseries))
+        class_to_timeseries["*"] = actor_tensor[len(base_classes)].astype(np.int64)
+        actor_timeseries_dict_list.append(class_to_timeseries)
+    return actor_timeseries_dict_list
+
+
 def calculate_transfer_entropy_data(in_src_idx: int, in_src_actor_id: str,
                                     in_tgt_idx: int, in_tgt_actor_id: str,
                                     in_period_start_idx: int, in_period_end_idx: int,
                                     in_comparison_pairs_list: List[Tuple[str]],
-                                    in_actor_timeseries_dict_list: List[Dict[str, np.ndarray]]) -> List[Union[str, float]]:
+                                    in_actor_timeseries_dict_list: List[Dict[str, np.ndarray]],
+                                    in_is_zero_list: List[bool] = None) -> List[Union[str, float]]:
     """
     Calculates the comparison pair values using transfer entorpy and prepares it for directly using as a row on
     actor_te_edges_df dataframe.
@@ -85,6 +289,8 @@ def calculate_transfer_entropy_data(in_src_idx: int, in_src_actor_id: str,
         comparison pairs list of classes
     in_actor_timeseries_dict_list :
         A list which contains "actor timeseries dicts"
+    in_is_zero_list :
+        If given, the comparison pairs marked True are known to be 0 (one of the series is constant) and are not computed.
 
     Returns
     -------
@@ -93,19 +299,197 @@ def calculate_transfer_entropy_data(in_src_idx: int, in_src_actor_id: str,
          te_valN is the corresponding TE value for the given comparison pair at Nth index in in_comparison_pairs_list.
     """
     # print(f" {in_src_idx}->{in_tgt_idx} ", end=" ")
-    te_values_list = [pyinform.transfer_entropy(
+    if in_is_zero_list is None:
+        in_is_zero_list = [False] * len(in_comparison_pairs_list)
+    te_values_list = [0.0 if is_zero else pyinform.transfer_entropy(
         in_actor_timeseries_dict_list[in_src_idx][src_class][in_period_start_idx:in_period_end_idx],
         in_actor_timeseries_dict_list[in_tgt_idx][tgt_class][in_period_start_idx:in_period_end_idx], 1)
-        for src_class, tgt_class in in_comparison_pairs_list]
+        for (src_class, tgt_class), is_zero in zip(in_comparison_pairs_list, in_is_zero_list)]
     data_row = [in_src_actor_id, in_tgt_actor_id]
     data_row.extend(te_values_list)
     return data_row
 
 
+def init_transfer_entropy_worker(in_shape: Tuple[int, int, int], in_classes: List[str], in_shm_name: str):
+    """
+    Attaches the worker process to the shared timeseries tensor in_shm_name, unless it is already attached to it. The
+    workers of a persistent pool detach from the previous tensor when a task of a new tensor arrives.
+    """
+    global worker_timeseries_tensor
+    if worker_timeseries_tensor is not None:
+        if worker_timeseries_tensor.name == in_shm_name:
+            return
+        worker_timeseries_tensor.close()
+    else:
+        # detach when the worker exits, i.e. when the pool is closed
+        multiprocessing.util.Finalize(None, close_worker_timeseries_tensor, exitpriority=10)
+    worker_timeseries_tensor = SharedTimeseriesTensor(in_shape, in_classes, in_shm_name)
+
+
+def close_worker_timeseries_tensor():
+    """
+    Detaches the worker process from its shared timeseries tensor.
+    """
+    global worker_timeseries_tensor
+    if worker_timeseries_tensor is not None:
+        worker_timeseries_tensor.close()
+        worker_timeseries_tensor = None
+
+
+def calculate_transfer_entropy_block(in_src_idx_start: int, in_src_idx_end: int,
+                                     in_period_start_idx: int, in_period_end_idx: int,
+                                     in_comparison_class_idx_pairs: List[Tuple[int, int]],
+                                     in_active: np.ndarray, in_num_surrogates: int = 0,
+                                     in_surrogate_seed: int = None) -> np.ndarray:
+    """
+    Calculates the comparison pair values of a block of source actors against all target actors using
+    pyinform.transfer_entropy on the shared timeseries tensor of the worker.
+
+    Parameters
+    ----------
+    in_src_idx_start :
+        inclusive index of the first source actor of the block
+    in_src_idx_end :
+        exclusive index of the last source actor of the block
+    in_period_start_idx :
+        inclusive Start index of the timeseries slice
+    in_period_end_idx :
+        exclusive End index of the timeseries slice
+    in_comparison_class_idx_pairs :
+        comparison pairs list as (src_class_idx, tgt_class_idx) indices of the class axis of the tensor
+    in_active :
+        Boolean array of shape (num_actors, num_classes). False if the series is constant in the period.
+    in_num_surrogates :
+        If > 0, the p-value and z-score of each TE value against this many source shuffled surrogates are added.
+    in_surrogate_seed :
+        Seed of the surrogates
+
+    Returns
+    -------
+        An array with one row per (source, target) pair in source major order, self pairs excluded. The columns are
+        the TE values of the comparison pairs, followed by their p-values and z-scores when in_num_surrogates > 0.
+    """
+    tensor = worker_timeseries_tensor.array[:, :, in_period_start_idx:in_period_end_idx]
+    num_actors = tensor.shape[0]
+    num_pairs = len(in_comparison_class_idx_pairs)
+    num_rows = (in_src_idx_end - in_src_idx_start) * (num_actors - 1)
+    te_values = np.zeros((num_rows, num_pairs * 3 if in_num_surrogates > 0 else num_pairs))
+    tgt_idx_list = np.arange(num_actors)
+    for pair_idx, (src_class_idx, tgt_class_idx) in enumerate(in_comparison_class_idx_pairs):
+        te_block = np.zeros((in_src_idx_end - in_src_idx_start, num_actors))
+        for block_idx, src_idx in enumerate(range(in_src_idx_start, in_src_idx_end)):
+            if not in_active[src_idx, src_class_idx]:
+                continue
+            for tgt_idx in tgt_idx_list[in_active[:, tgt_class_idx]]:
+                if tgt_idx != src_idx:
+                    te_block[block_idx, tgt_idx] = pyinform.transfer_entropy(tensor[src_idx, src_class_idx],
+                                                                             tensor[tgt_idx, tgt_class_idx], 1)
+        te_values[:, pair_idx] = te_block_to_rows(te_block, in_src_idx_start)
+        if in_num_surrogates > 0:
+            p_block, z_block = calculate_active_surrogate_statistics(
+                tensor[in_src_idx_start:in_src_idx_end, src_class_idx], tensor[:, tgt_class_idx],
+                in_active[in_src_idx_start:in_src_idx_end, src_class_idx], in_active[:, tgt_class_idx], te_block,
+                in_num_surrogates, get_surrogate_rngs(in_surrogate_seed, in_src_idx_start, in_src_idx_end, pair_idx))
+            te_values[:, num_pairs + pair_idx] = te_block_to_rows(p_block, in_src_idx_start)
+            te_values[:, 2 * num_pairs + pair_idx] = te_block_to_rows(z_block, in_src_idx_start)
+    return te_values
+
+
+def calculate_transfer_entropy_block_task(in_params: Tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Single argument version of calculate_transfer_entropy_block for Pool.imap and Pool.imap_unordered. The first
+    parameter is the attach arguments of the shared timeseries tensor (see init_transfer_entropy_worker), and the last
+    parameter is the TeEdgeSelector that selects the rows of the block before they are sent back to the parent.
+
+    Returns
+    -------
+        (src_idx, tgt_idx, te_values) of the selected rows
+    """
+    tensor_attach_args, *block_params, edge_selector = in_params
+    init_transfer_entropy_worker(*tensor_attach_args)
+    te_values = calculate_transfer_entropy_block(*block_params)
+    return edge_selector.select_block(worker_timeseries_tensor.shape[0], block_params[0], block_params[1], te_values)
+
+
+def get_pool_block_size(in_num_actors: int, in_num_workers: int, in_min_block_pairs: int = 2048) -> int:
+    """
+    Returns the number of source actors per pool task. Large networks are split into about 4 tasks per worker, and
+    each task gets at least in_min_block_pairs actor pairs, so a small network is a single task (and the pool is kept
+    busy with several windows at a time instead).
+    """
+    return max(1, -(-in_num_actors // (in_num_workers * 4)), -(-in_min_block_pairs // max(1, in_num_actors - 1)))
+
+
+def with_pool_scope(in_method):
+    """
+    Decorator of the TransferEntropyCalculator methods that use the worker pool, so that the pool is kept for the
+    whole call (see TransferEntropyCalculator.__enter__).
+    """
+    @functools.wraps(in_method)
+    def wrapper(self, *args, **kwargs):
+        with self:
+            return in_method(self, *args, **kwargs)
+    return wrapper
+
+
 class TransferEntropyCalculator:
+    """
+    Calculates the TE networks of actors.
+
+    The worker pool of the calculator is reused by all of its stages (timeseries and TE) and windows. Without a with
+    statement, a pool lives for one public method call. To keep it for all calls, or to share it with
+    DataManager.preprocess, use the calculator as a context manager or pass in_pool.
+
+    Example
+    --------
+
+        $with TransferEntropyCalculator(data_manager) as calculator:
+        $    calculator.calculate_te_network_series(...)
+        $    calculator.calculate_te_network_series(...)
+    """
 
     def __init__(self, in_data_manager: DataManager, in_sub_classes: List[str] = None,
-                 in_add_superclasses: bool = True):
+                 in_add_superclasses: bool = True, in_backend: str = "pyinform", in_num_surrogates: int = 0,
+                 in_surrogate_seed: int = None, in_pool: multiprocessing.pool.Pool = None,
+                 in_max_joint_counts_bytes: int = 1 << 31):
+        """
+        Parameters
+        ----------
+        in_data_manager :
+            The DataManager object that provides all required data.
+        in_sub_classes :
+            Classes of the timeseries used for the comparison pairs.
+        in_add_superclasses :
+            Calculate the superclasses T, U, F, M as well.
+        in_backend :
+            Transfer entropy backend, a name of te_backends.TE_BACKENDS or "auto".
+                "pyinform" : calls pyinform.transfer_entropy once for each actor pair and comparison pair.
+                "numpy" : computes the full N x N TE matrix of each comparison pair from joint count matrices.
+                    calculate_te_network_series keeps these counts across windows and only updates them with the
+                    bins that each window adds or drops.
+                "bitpacked" : joint counts as popcounts of ANDs of the bit packed (uint64 word) series.
+                "numba" : JIT compiled loop kernel, in parallel over the sources (requires numba).
+                "auto" : micro-benchmarks the available backends on the series of the first calculation and uses the
+                    fastest one.
+            Every backend except pyinform is checked against pyinform (te_backends.check_te_backend) before it is used.
+        in_num_surrogates :
+            If > 0, each TE value is tested against this many source shuffled surrogates, which are evaluated in
+            batches by the numpy kernel (for every backend). actor_te_edges_df then gets a <pair>_p (p-value) and a
+            <pair>_z (z-score) column for each comparison pair.
+        in_surrogate_seed :
+            Seed of the surrogates. Results are reproducible for the same seed, whatever the block size.
+        in_pool :
+            Worker pool to use for all stages. It is not closed by the calculator.
+        in_max_joint_counts_bytes :
+            Memory budget of the joint counts that the "numpy" backend keeps across the windows of
+            calculate_te_network_series (4 counts of 4 bytes per actor pair and comparison pair). Above it, and when
+            the series is streamed or swept, each block is counted from scratch instead.
+        """
+        te_backend = None
+        if in_backend != "auto":
+            te_backend = create_te_backend(in_backend)
+            if in_backend != "pyinform":
+                check_te_backend(te_backend)
         if in_sub_classes is None:
             if in_add_superclasses:
                 in_sub_classes = ["TF", "TM", "UF", "UM", "T", "U", "F", "M", "*"]
@@ -113,12 +497,59 @@ class TransferEntropyCalculator:
                 in_sub_classes = ["TF", "TM", "UF", "UM", "*"]
         self.data_manager = in_data_manager
         self.add_superclasses = in_add_superclasses
+        self.backend = in_backend
+        # resolved on the first calculation when in_backend is "auto"
+        self.te_backend: ITeBackend = te_backend
+        self.num_surrogates = in_num_surrogates
+        self.surrogate_seed = in_surrogate_seed
+        self.max_joint_counts_bytes = in_max_joint_counts_bytes
+        self.skip_counts = None
         self.start_date = None
         self.end_date = None
         self.frequency = None
         self.datetime_index = None
+        self.pool = in_pool
+        self.num_workers = max(1, multiprocessing.cpu_count() - 1)
+        self.__owns_pool = False
+        self.__pool_scope_depth = 0
         self.__init_comparison_pairs_list(in_sub_classes)
 
+    def __enter__(self):
+        self.__pool_scope_depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.__pool_scope_depth -= 1
+        if self.__pool_scope_depth == 0:
+            self.close(exc_type is not None)
+
+    def close(self, in_terminate: bool = False):
+        """
+        Closes the worker pool of the calculator, if it created it. The workers finish their tasks and exit normally,
+        detaching from the shared timeseries tensor, unless in_terminate is True (e.g. after an error), in which case
+        they are killed.
+        """
+        if self.__owns_pool:
+            if in_terminate:
+                self.pool.terminate()
+            else:
+                self.pool.close()
+            self.pool.join()
+            self.pool = None
+            self.__owns_pool = False
+
+    def __get_pool(self) -> multiprocessing.pool.Pool:
+        """
+        Returns the worker pool, which is created on first use and kept until the outermost with statement (or
+        public method call) of the calculator ends.
+        """
+        if self.pool is None:
+            # the workers share the resource tracker of this process, which unlinks the shared tensors on a crash
+            multiprocessing.resource_tracker.ensure_running()
+            self.pool = multiprocessing.Pool(self.num_workers)
+            self.__owns_pool = True
+        return self.pool
+
     @staticmethod
     def calculate_date_series(in_start_date: datetime.datetime, in_end_date: datetime.datetime,
                                 in_shift_days: int, in_init_window_days: int, in_as_growing: bool):
@@ -141,41 +572,172 @@ class TransferEntropyCalculator:
         dwindows_df.drop(drop_index, inplace=True)
         return dwindows_df
 
+    @with_pool_scope
     def calculate_te_network_series(self, in_actor_id_list: List[str],
                                     in_start_date: datetime.datetime,
                                     in_end_date: datetime.datetime,
-                                    in_frequency: str,
+                                    in_frequency: Union[str, List[str]],
                                     in_window_shift_by_days: int,
                                     in_init_window_days: int,
                                     in_as_growing: bool,
-                                    in_output_folder: str):
+                                    in_output_folder: str,
+                                    in_options: TeSeriesOptions = None):
+        """
+        Calculates the TE network of each moving/growing window and saves each one as
+        actor_te_edges_df_<start>_<end>.<output_format> in in_output_folder. A window file is written by a
+        background thread while the TE network of the next window is calculated.
+
+        The run is recorded in actor_te_edges_manifest.json in in_output_folder, with the parameters, the hashes of the
+        actor list and of the timeseries, and the size and sha256 of each completed window file. A restarted run with
+        the same inputs skips the windows whose files are complete.
+
+        Parameters
+        ----------
+        in_frequency :
+            Frequency of the timeseries bins, e.g. "12H". If a list of frequencies is given, e.g. ["6H", "12H", "D"],
+            the timeseries are built once at their finest common frequency and the series of each frequency are
+            derived from them (see calculate_multi_frequency_bit_packed_timeseries). The windows of each frequency are
+            then saved in the <in_output_folder>/<frequency> folder.
+        in_options :
+            Streaming, sweep, sparse output and output file options, see TeSeriesOptions. Defaults to
+            TeSeriesOptions().
+        """
+        if in_options is None:
+            in_options = TeSeriesOptions()
+        edge_selector = self.__create_edge_selector(in_options.edge_threshold, in_options.edge_top_k,
+                                                    in_options.edge_top_k_by, in_options.edge_score_column)
         tk = TimeKeeper("Calculate all timeseries data")
         datetime_windows_df = self.calculate_date_series(in_start_date, in_end_date, in_window_shift_by_days, in_init_window_days, in_as_growing)
         window_fixed_start_date = datetime_windows_df.iloc[0]["start_date"]
         window_fixed_end_date = datetime_windows_df.iloc[-1]["end_date"]
-        actor_timeseries_dict_list = self.calculate_actor_to_timeseries_dict_list(in_actor_id_list,
-                                                                                  window_fixed_start_date,
-                                                                                  window_fixed_end_date,
-                                                                                  in_frequency)
+        if isinstance(in_frequency, str):
+            frequency_to_timeseries_store = {in_frequency: self.calculate_actor_bit_packed_timeseries(
+                in_actor_id_list, window_fixed_start_date, window_fixed_end_date, in_frequency)}
+        else:
+            frequency_to_timeseries_store = self.calculate_multi_frequency_bit_packed_timeseries(
+                in_actor_id_list, window_fixed_start_date, window_fixed_end_date, in_frequency)
+        for frequency, timeseries_store in frequency_to_timeseries_store.items():
+            output_folder = in_output_folder
+            if not isinstance(in_frequency, str):
+                print(f"Frequency : {frequency}")
+                output_folder = os.path.join(in_output_folder, frequency)
+                os.makedirs(output_folder, exist_ok=True)
+            self.frequency = frequency
+            self.datetime_index = pd.date_range(start=window_fixed_start_date, end=window_fixed_end_date,
+                                                freq=frequency)
+            manifest_params = {"start_date": in_start_date, "end_date": in_end_date, "frequency": frequency,
+                               "window_shift_by_days": in_window_shift_by_days,
+                               "init_window_days": in_init_window_days, "as_growing": in_as_growing,
+                               **in_options.get_manifest_params(), "backend": self.backend,
+                               "comparison_pairs": self.comparison_pairs_list,
+                               "num_surrogates": self.num_surrogates, "surrogate_seed": self.surrogate_seed}
+            self.__calculate_te_window_series(in_actor_id_list, datetime_windows_df, timeseries_store,
+                                              output_folder, manifest_params, tk, edge_selector, in_options)
+        tk.done()
+
+    def __calculate_te_window_series(self, in_actor_id_list: List[str], in_datetime_windows_df: pd.DataFrame,
+                                     in_timeseries_store: BitPackedTimeseries,
+                                     in_output_folder: str, in_manifest_params: dict, in_time_keeper: TimeKeeper,
+                                     in_edge_selector: TeEdgeSelector, in_options: TeSeriesOptions):
+        """
+        Calculates and saves the TE networks of the windows of calculate_te_network_series for the timeseries of
+        self.frequency (self.datetime_index).
+        """
         # feed only required timeseries data to each period
         datetime_series = pd.Series(self.datetime_index)
-        print("Looping over time windows...")
-        for current_start_date, current_end_date in datetime_windows_df.values:
-            tk.next("Calculating TE")
-            print(f"{current_start_date} to {current_end_date}")
+        # the whole timeseries is kept bit packed, the windows are sliced from the words
+        timeseries_store = self.__pack_timeseries(in_timeseries_store)
+        print(f"bit packed timeseries : {timeseries_store.nbytes} bytes")
+        manifest = RunManifest(os.path.join(in_output_folder, "actor_te_edges_manifest.json"),
+                               dict(in_manifest_params, timeseries_sha256=hash_arrays(
+                                   [timeseries_store.class_to_words[this_class]
+                                    for this_class in sorted(timeseries_store.class_to_words)])),
+                               in_actor_id_list, in_options.resume)
+        manifest.save()
+        self.__select_backend(timeseries_store, 0, timeseries_store.num_time_steps)
+        pair_to_accumulator = self.__create_joint_counts_accumulators(len(in_actor_id_list),
+                                                                      timeseries_store.num_time_steps,
+                                                                      in_options)
+        window_list = []
+        for current_start_date, current_end_date in in_datetime_windows_df.values:
             current_datetime_index = self.datetime_index[(current_start_date <= self.datetime_index) & (self.datetime_index <= current_end_date)]
             period_start_index = datetime_series[datetime_series == current_datetime_index[0]].index[0]
             period_end_index = datetime_series[datetime_series == current_datetime_index[-1]].index[0] + 1
             # print("{} ==> {} to {}".format(current_datetime_index, period_start_index, period_end_index))
-            te_df = self.calculate_te_network(in_actor_id_list, period_start_index, period_end_index, actor_timeseries_dict_list)
-            tk.next("Saving to file")
             file_name = "actor_te_edges_df_{}_{}".format(current_start_date.strftime('%Y_%m_%d'), current_end_date.strftime('%Y_%m_%d'))
-            folder_type = "growing" if in_as_growing else "moving"
-            compression_options = dict(method='zip', archive_name=f'{file_name}.csv')
-            te_df.to_csv(os.path.join(in_output_folder, f"{file_name}.csv.zip"), index=False, compression=compression_options)
-            print(f"Saved: {file_name}")
-        tk.done()
+            file_path = os.path.join(in_output_folder, f"{file_name}.{in_options.output_format}")
+            if manifest.is_window_complete(file_name, file_path):
+                print(f"Skipping completed window: {file_name}")
+                continue
+            window_list.append((current_start_date, current_end_date, period_start_index, period_end_index, file_name,
+                                file_path))
+        if self.te_backend.uses_worker_pool and not in_options.is_streamed and not in_options.is_swept:
+            # the pool calculates the next windows while the current one is merged and saved
+            window_te_blocks = self.__multpool_iterate_window_te_blocks(
+                in_actor_id_list, [(window[2], window[3]) for window in window_list], timeseries_store,
+                in_edge_selector)
+        else:
+            window_te_blocks = (self.__iterate_te_blocks(in_actor_id_list, period_start_index, period_end_index,
+                                                         timeseries_store, in_options.stream_block_size,
+                                                         not in_options.is_streamed, in_edge_selector,
+                                                         pair_to_accumulator)
+                                for _, _, period_start_index, period_end_index, _, _ in window_list)
+        print("Looping over time windows...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as write_executor, \
+                contextlib.closing(window_te_blocks):
+            write_future = None
+            write_file_name = None
+            for (current_start_date, current_end_date, period_start_index, period_end_index, file_name,
+                 file_path), te_blocks in zip(window_list, window_te_blocks):
+                in_time_keeper.next("Calculating TE")
+                print(f"{current_start_date} to {current_end_date}")
+                if not in_options.is_streamed:
+                    if not in_options.is_swept:
+                        te_df = self.__te_blocks_to_df(in_actor_id_list, te_blocks)
+                    else:
+                        te_df = self.calculate_te_sweep(in_actor_id_list, period_start_index, period_end_index,
+                                                        timeseries_store, in_options.sweep_lags,
+                                                        in_options.sweep_history_lengths, in_options.edge_threshold,
+                                                        in_options.edge_top_k, in_options.edge_top_k_by,
+                                                        in_options.edge_score_column)
+                    in_time_keeper.next("Saving to file")
+                    # only one window is kept in memory for writing
+                    if write_future is not None:
+                        manifest.add_window(write_file_name, write_future.result())
+                    write_future = write_executor.submit(write_dataframe_file, te_df, in_output_folder, file_name,
+                                                         in_options.output_format)
+                    write_file_name = file_name
+                    print(f"Saving: {file_name}")
+                else:
+                    self.__write_te_blocks(in_actor_id_list, te_blocks, file_path)
+                    manifest.add_window(file_name, file_path)
+                    print(f"Saved: {file_name}")
+            if write_future is not None:
+                manifest.add_window(write_file_name, write_future.result())
+
+    @with_pool_scope
+    def calculate_actor_bit_packed_timeseries(self, in_actor_id_list: List[str], in_start_date: datetime.datetime,
+                                              in_end_date: datetime.datetime,
+                                              in_frequency: str) -> BitPackedTimeseries:
+        """
+        Calculates the bit packed timeseries of the actors, the store that calculate_te_network_series keeps (see
+        calculate_actor_bit_packed_timeseries). Its classes are the ones of the actor timeseries dicts.
+        """
+        self.start_date = in_start_date
+        self.end_date = in_end_date
+        self.frequency = in_frequency
+        self.datetime_index = pd.date_range(start=self.start_date, end=self.end_date, freq=self.frequency)
+        self.data_manager.filter_osn_msgs_view(self.start_date, self.end_date)
+        print("calculating bit packed actor timeseries...")
+        if is_frequency_grid_aligned(self.datetime_index, self.frequency):
+            return calculate_actor_bit_packed_timeseries(in_actor_id_list, self.data_manager, self.datetime_index,
+                                                         self.frequency, self.add_superclasses)
+        # resample bins that are not on the grid of the datetime index are handled per actor
+        actor_timeseries_dict_list = self.__multpool_calculate_actor_to_timeseries_dict_list(in_actor_id_list)
+        return BitPackedTimeseries.from_actor_timeseries_dict_list(actor_timeseries_dict_list,
+                                                                   self.__get_timeseries_classes())
 
+    @with_pool_scope
     def calculate_actor_to_timeseries_dict_list(self, in_actor_id_list: List[str], in_start_date: datetime.datetime, in_end_date: datetime.datetime, in_frequency: str):
         self.start_date = in_start_date
         self.end_date = in_end_date
@@ -183,14 +745,433 @@ class TransferEntropyCalculator:
         self.datetime_index = pd.date_range(start=self.start_date, end=self.end_date, freq=self.frequency)
         self.data_manager.filter_osn_msgs_view(self.start_date, self.end_date)
         print("calculating actor timeseries dictionaries...")
+        if is_frequency_grid_aligned(self.datetime_index, self.frequency):
+            return calculate_actor_timeseries_dict_list(in_actor_id_list, self.data_manager, self.datetime_index,
+                                                        self.frequency, self.add_superclasses)
+        # resample bins that are not on the grid of the datetime index are handled per actor
         actor_timeseries_dict_list = self.__multpool_calculate_actor_to_timeseries_dict_list(in_actor_id_list)
         return actor_timeseries_dict_list
 
-    def calculate_te_network(self, in_actor_id_list: List[str], in_period_start_index: int, in_period_end_index: int, actor_timeseries_dict_list: List[Dict[str, np.ndarray]]):
+    @with_pool_scope
+    def calculate_multi_frequency_bit_packed_timeseries(self, in_actor_id_list: List[str],
+                                                        in_start_date: datetime.datetime,
+                                                        in_end_date: datetime.datetime,
+                                                        in_frequencies: List[str]) -> Dict[str, BitPackedTimeseries]:
+        """
+        Calculates the bit packed timeseries of several frequencies from one build of the timeseries at their finest
+        common frequency (see get_finest_common_frequency). The series of a coarser frequency are OR-reductions of
+        adjacent bins of the finest ones (BitPackedTimeseries.coarsen), which equals building them directly as long
+        as both frequencies are grid aligned (is_frequency_grid_aligned). Frequencies that are not are built
+        separately.
+
+        The calculator is left at the last frequency that was built (self.frequency and self.datetime_index).
+
+        Returns
+        -------
+            Dictionary of frequency (in the order of in_frequencies) to its BitPackedTimeseries
+        """
+        finest_frequency = get_finest_common_frequency(in_frequencies)
+        finest_timeseries_store = None
+        if finest_frequency is not None:
+            finest_datetime_index = pd.date_range(start=in_start_date, end=in_end_date, freq=finest_frequency)
+            if is_frequency_grid_aligned(finest_datetime_index, finest_frequency):
+                print(f"calculating actor timeseries at the finest frequency {finest_frequency}...")
+                finest_timeseries_store = self.calculate_actor_bit_packed_timeseries(
+                    in_actor_id_list, in_start_date, in_end_date, finest_frequency)
+        frequency_to_timeseries_store = {}
+        for frequency in in_frequencies:
+            datetime_index = pd.date_range(start=in_start_date, end=in_end_date, freq=frequency)
+            if finest_timeseries_store is not None and is_frequency_grid_aligned(datetime_index, frequency):
+                factor = pd.Timedelta(pd.tseries.frequencies.to_offset(frequency)) // \
+                         pd.Timedelta(pd.tseries.frequencies.to_offset(finest_frequency))
+                print(f"deriving {frequency} timeseries from {finest_frequency} (x{factor})...")
+                frequency_to_timeseries_store[frequency] = finest_timeseries_store.coarsen(factor, len(datetime_index))
+            else:
+                frequency_to_timeseries_store[frequency] = self.calculate_actor_bit_packed_timeseries(
+                    in_actor_id_list, in_start_date, in_end_date, frequency)
+        return frequency_to_timeseries_store
+
+    @with_pool_scope
+    def calculate_multi_frequency_timeseries_dict_lists(self, in_actor_id_list: List[str],
+                                                        in_start_date: datetime.datetime,
+                                                        in_end_date: datetime.datetime,
+                                                        in_frequencies: List[str]
+                                                        ) -> Dict[str, List[Dict[str, np.ndarray]]]:
+        """
+        Actor timeseries dicts version of calculate_multi_frequency_bit_packed_timeseries.
+
+        Returns
+        -------
+            Dictionary of frequency (in the order of in_frequencies) to the list of actor timeseries dicts
+        """
+        return {frequency: timeseries_store.to_actor_timeseries_dict_list(self.__get_timeseries_classes())
+                for frequency, timeseries_store in self.calculate_multi_frequency_bit_packed_timeseries(
+                    in_actor_id_list, in_start_date, in_end_date, in_frequencies).items()}
+
+    @with_pool_scope
+    def calculate_te_network(self, in_actor_id_list: List[str], in_period_start_index: int, in_period_end_index: int,
+                             actor_timeseries_dict_list: Union[List[Dict[str, np.ndarray]], BitPackedTimeseries],
+                             in_edge_threshold: float = None, in_edge_top_k: int = None,
+                             in_edge_top_k_by: str = "source", in_edge_score_column: str = None) -> pd.DataFrame:
+        """
+        Calculates the TE network of the period as actor_te_edges_df. The timeseries are the actor timeseries dicts or
+        their BitPackedTimeseries (see calculate_actor_bit_packed_timeseries).
+
+        The edges (rows) can be made sparse. Rows are then selected where the TE values are computed (in the pool
+        workers), so the full pair list is never built. The score of a row is its largest TE value, or its
+        in_edge_score_column value.
+
+        Parameters
+        ----------
+        in_edge_threshold :
+            If given, only rows with a score above this value are kept.
+        in_edge_top_k :
+            If given, only the in_edge_top_k rows with the highest scores of each group are kept.
+        in_edge_top_k_by :
+            Group of in_edge_top_k, "source" (per source actor), "target" (per target actor) or "global".
+        in_edge_score_column :
+            Comparison pair column used as the score, e.g. "TF_UM". Defaults to the largest TE value of the row.
+        """
         print("calculating te sets...")
-        all_te_data = self.__multpool_calculate_transfer_entropy_sets(in_actor_id_list, in_period_start_index, in_period_end_index, actor_timeseries_dict_list)
+        edge_selector = self.__create_edge_selector(in_edge_threshold, in_edge_top_k, in_edge_top_k_by,
+                                                    in_edge_score_column)
+        te_blocks = self.__iterate_te_blocks(in_actor_id_list, in_period_start_index, in_period_end_index,
+                                             self.__pack_timeseries(actor_timeseries_dict_list), None, True,
+                                             edge_selector)
+        return self.__te_blocks_to_df(in_actor_id_list, te_blocks)
+
+    @with_pool_scope
+    def calculate_te_network_to_file(self, in_actor_id_list: List[str], in_period_start_index: int,
+                                     in_period_end_index: int,
+                                     actor_timeseries_dict_list: Union[List[Dict[str, np.ndarray]],
+                                                                       BitPackedTimeseries],
+                                     in_file_path: str, in_block_size: int, in_edge_threshold: float = None,
+                                     in_edge_top_k: int = None, in_edge_top_k_by: str = "source",
+                                     in_edge_score_column: str = None) -> int:
+        """
+        Streaming version of calculate_te_network. The TE network is computed in blocks of in_block_size source actors
+        and each block is appended to in_file_path (a zipped CSV file, or a parquet file if in_file_path ends with
+        .parquet) as soon as it is finished, so the peak memory is
+        bounded by the block size instead of N^2. Rows of different blocks are written in completion order.
+        With top-k per target or global top-k (see calculate_te_network), the selected rows are merged across blocks
+        and written once all blocks are finished.
+
+        Returns
+        -------
+            Number of rows written.
+        """
+        print("calculating te sets...")
+        edge_selector = self.__create_edge_selector(in_edge_threshold, in_edge_top_k, in_edge_top_k_by,
+                                                    in_edge_score_column)
+        te_blocks = self.__iterate_te_blocks(in_actor_id_list, in_period_start_index, in_period_end_index,
+                                             self.__pack_timeseries(actor_timeseries_dict_list), in_block_size, False,
+                                             edge_selector)
+        return self.__write_te_blocks(in_actor_id_list, te_blocks, in_file_path)
+
+    def calculate_te_sweep(self, in_actor_id_list: List[str], in_period_start_index: int, in_period_end_index: int,
+                           actor_timeseries_dict_list: Union[List[Dict[str, np.ndarray]], BitPackedTimeseries],
+                           in_lags: List[int],
+                           in_history_lengths: List[int] = None, in_edge_threshold: float = None,
+                           in_edge_top_k: int = None, in_edge_top_k_by: str = "source",
+                           in_edge_score_column: str = None) -> pd.DataFrame:
+        """
+        Calculates the TE network for several lags and target history lengths in one pass. The class matrices, active
+        masks and target joint states are built once and shared by all lags, and the joint counts of all lags are
+        computed together by the numpy kernel (for every backend).
+
+        TE at lag L with history length k pairs the source value at t - L with the target future at t and the target
+        history (t - k, ..., t - 1). It equals pyinform.transfer_entropy(src[:T - L + 1], tgt[L - 1:], k), so lag 1
+        with history length 1 is the value of calculate_te_network.
+
+        Parameters
+        ----------
+        in_lags :
+            Lags in number of time steps (frequency bins), e.g. [1, 2, 3, 4, 5, 6]
+        in_history_lengths :
+            History lengths of the target. Defaults to [1].
+        in_edge_threshold, in_edge_top_k, in_edge_top_k_by, in_edge_score_column :
+            Sparse output options, see calculate_te_network. The rows of each (lag, history length) are selected
+            separately.
+
+        Returns
+        -------
+            actor_te_edges_df with the additional Lag and History columns after Source and Target, one block of rows
+            per (lag, history length) combination.
+            Surrogate p-value and z-score columns are not computed by the sweep.
+        """
+        if in_history_lengths is None:
+            in_history_lengths = [1]
+        edge_selector = self.__create_edge_selector(in_edge_threshold, in_edge_top_k, in_edge_top_k_by,
+                                                    in_edge_score_column)
+        print("calculating te sweep...")
+        num_actors = len(in_actor_id_list)
+        timeseries_store = self.__pack_timeseries(actor_timeseries_dict_list)
+        class_to_matrix = {this_class: timeseries_store.get_matrix(this_class, in_period_start_index,
+                                                                   in_period_end_index)
+                           for this_class in self.__get_comparison_classes()}
+        class_to_active = {this_class: timeseries_store.get_active_mask(this_class, in_period_start_index,
+                                                                        in_period_end_index)
+                           for this_class in self.__get_comparison_classes()}
+        self.__update_skip_counts(num_actors, class_to_active)
+        lag_history_list = [(lag, history_length) for lag in in_lags for history_length in in_history_lengths]
+        te_values = np.zeros((len(lag_history_list), num_actors * (num_actors - 1), len(self.comparison_pairs_list)))
+        for pair_idx, (src_class, tgt_class) in enumerate(self.comparison_pairs_list):
+            src_active, tgt_active = class_to_active[src_class], class_to_active[tgt_class]
+            if not (src_active.any() and tgt_active.any()):
+                continue
+            lag_history_to_te_matrix = calculate_te_sweep_matrices(class_to_matrix[src_class][src_active],
+                                                                   class_to_matrix[tgt_class][tgt_active],
+                                                                   in_lags, in_history_lengths)
+            for lag_history_idx, lag_history in enumerate(lag_history_list):
+                te_matrix = np.zeros((num_actors, num_actors))
+                te_matrix[np.ix_(src_active, tgt_active)] = lag_history_to_te_matrix[lag_history]
+                te_values[lag_history_idx, :, pair_idx] = te_block_to_rows(te_matrix, 0)
         print("creating dataframe...")
-        return pd.DataFrame(all_te_data, columns=["Source", "Target"] + [f"{src}_{tgt}" for src, tgt in self.comparison_pairs_list])
+        te_df_list = []
+        for lag_history_idx, (lag, history_length) in enumerate(lag_history_list):
+            te_df = self.__te_block_to_df(in_actor_id_list,
+                                          *edge_selector.select_block(num_actors, 0, num_actors,
+                                                                      te_values[lag_history_idx]))
+            te_df.insert(2, "History", history_length)
+            te_df.insert(2, "Lag", lag)
+            te_df_list.append(te_df)
+        return pd.concat(te_df_list, ignore_index=True)
+
+    def __create_edge_selector(self, in_threshold: float, in_top_k: int, in_top_k_by: str,
+                               in_score_column: str) -> TeEdgeSelector:
+        pair_columns = [f"{src}_{tgt}" for src, tgt in self.comparison_pairs_list]
+        if in_score_column is None:
+            score_column_idx_list = list(range(len(pair_columns)))
+        elif in_score_column in pair_columns:
+            score_column_idx_list = [pair_columns.index(in_score_column)]
+        else:
+            raise ValueError(f"Unknown score column : {in_score_column}")
+        return TeEdgeSelector(score_column_idx_list, in_threshold, in_top_k, in_top_k_by)
+
+    def __te_columns(self) -> List[str]:
+        te_columns = [f"{src}_{tgt}" for src, tgt in self.comparison_pairs_list]
+        if self.num_surrogates > 0:
+            te_columns += [f"{column}_p" for column in te_columns] + [f"{column}_z" for column in te_columns]
+        return te_columns
+
+    def __te_block_to_df(self, in_actor_id_list: List[str], in_src_idx: np.ndarray, in_tgt_idx: np.ndarray,
+                         in_te_values: np.ndarray) -> pd.DataFrame:
+        actor_ids = np.asarray(in_actor_id_list, dtype=object)
+        # sweep blocks only hold the TE columns
+        te_df = pd.DataFrame(in_te_values, columns=self.__te_columns()[:in_te_values.shape[1]])
+        te_df.insert(0, "Target", actor_ids[in_tgt_idx])
+        te_df.insert(0, "Source", actor_ids[in_src_idx])
+        return te_df
+
+    def __te_blocks_to_df(self, in_actor_id_list: List[str],
+                          in_te_blocks: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> pd.DataFrame:
+        te_block_list = list(in_te_blocks)
+        print("creating dataframe...")
+        if not te_block_list:
+            return self.__te_block_to_df(in_actor_id_list, np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                                         np.zeros((0, len(self.__te_columns()))))
+        return self.__te_block_to_df(in_actor_id_list, *[np.concatenate(arrays) for arrays in zip(*te_block_list)])
+
+    def __write_te_blocks(self, in_actor_id_list: List[str],
+                          in_te_blocks: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                          in_file_path: str) -> int:
+        with create_te_edges_writer(in_file_path) as writer:
+            writer.write(pd.DataFrame(columns=["Source", "Target"] + self.__te_columns()))
+            for src_idx, tgt_idx, te_values in in_te_blocks:
+                writer.write(self.__te_block_to_df(in_actor_id_list, src_idx, tgt_idx, te_values))
+        return writer.num_rows
+
+    def __iterate_te_blocks(self, in_actor_id_list: List[str], in_period_start_index: int, in_period_end_index: int,
+                            in_timeseries_store: BitPackedTimeseries, in_block_size: int, in_ordered: bool,
+                            in_edge_selector: TeEdgeSelector,
+                            in_pair_to_accumulator: Dict[Tuple[str, str], JointCountsAccumulator] = None
+                            ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Calculates the TE values of the period in blocks of source actors and selects the rows of each block with
+        in_edge_selector.
+
+        Parameters
+        ----------
+        in_timeseries_store :
+            Bit packed series of the comparison classes (see __pack_timeseries)
+        in_block_size :
+            Number of source actors per block. If None, the backend picks the block size.
+        in_ordered :
+            If True, blocks are yielded in source order, otherwise in completion order.
+        in_edge_selector :
+            Selects the rows that are kept. The blocks are merged into one if in_edge_selector.needs_merge.
+        in_pair_to_accumulator :
+            If given (see __create_joint_counts_accumulators), the joint counts are updated to the period instead of
+            being counted from scratch.
+
+        Returns
+        -------
+            An iterator of (src_idx, tgt_idx, te_values) where te_values has one row per selected (source, target)
+            pair in the row order of actor_te_edges_df.
+        """
+        num_actors = len(in_actor_id_list)
+        class_to_active = {this_class: in_timeseries_store.get_active_mask(this_class, in_period_start_index,
+                                                                           in_period_end_index)
+                           for this_class in self.__get_comparison_classes()}
+        self.__update_skip_counts(num_actors, class_to_active)
+        self.__select_backend(in_timeseries_store, in_period_start_index, in_period_end_index)
+        if in_pair_to_accumulator is not None:
+            print("updating joint counts...")
+            # each class is unpacked once for the bins that the accumulators of its pairs add or drop
+            get_class_matrix = functools.lru_cache(maxsize=None)(in_timeseries_store.get_matrix)
+            for accumulator in in_pair_to_accumulator.values():
+                accumulator.move_to(in_period_start_index, in_period_end_index, get_class_matrix)
+            del get_class_matrix
+        if self.te_backend.uses_worker_pool:
+            te_blocks = self.__multpool_iterate_transfer_entropy_blocks(in_actor_id_list, in_period_start_index,
+                                                                        in_period_end_index, in_timeseries_store,
+                                                                        class_to_active, in_block_size, in_ordered,
+                                                                        in_edge_selector)
+        else:
+            te_blocks = self.__iterate_matrix_te_blocks(num_actors, in_period_start_index, in_period_end_index,
+                                                        in_timeseries_store, class_to_active, in_block_size,
+                                                        in_edge_selector, in_pair_to_accumulator)
+        yield from in_edge_selector.merge_blocks(te_blocks)
+
+    def __iterate_matrix_te_blocks(self, in_num_actors: int, in_period_start_index: int, in_period_end_index: int,
+                                   in_timeseries_store: BitPackedTimeseries, in_class_to_active: Dict[str, np.ndarray],
+                                   in_block_size: int, in_edge_selector: TeEdgeSelector,
+                                   in_pair_to_accumulator: Dict[Tuple[str, str], JointCountsAccumulator] = None
+                                   ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        __iterate_te_blocks of the backends that compute TE matrices in the main process, on the series and active
+        masks of the period. The backends with uses_bit_packed_series get the words of the period, the other ones (and
+        the surrogates) get the unpacked class matrices.
+        """
+        block_size = in_num_actors if in_block_size is None else in_block_size
+        num_pairs = len(self.comparison_pairs_list)
+        num_time_steps = in_period_end_index - in_period_start_index
+        comparison_classes = self.__get_comparison_classes()
+        uses_words = in_pair_to_accumulator is None and self.te_backend.uses_bit_packed_series
+        class_to_matrix = {}
+        if self.num_surrogates > 0 or (in_pair_to_accumulator is None and not uses_words):
+            class_to_matrix = {this_class: in_timeseries_store.get_matrix(this_class, in_period_start_index,
+                                                                          in_period_end_index)
+                               for this_class in comparison_classes}
+        if uses_words:
+            class_to_series = {this_class: in_timeseries_store.get_words(this_class, in_period_start_index,
+                                                                         in_period_end_index)
+                               for this_class in comparison_classes}
+            te_matrix_function = functools.partial(self.te_backend.calculate_te_matrix_from_words,
+                                                   in_num_time_steps=num_time_steps)
+        else:
+            class_to_series = class_to_matrix
+            te_matrix_function = self.te_backend.calculate_te_matrix
+        for src_idx_start in range(0, in_num_actors, max(1, block_size)):
+            src_idx_end = min(src_idx_start + block_size, in_num_actors)
+            te_values = np.zeros(((src_idx_end - src_idx_start) * (in_num_actors - 1), len(self.__te_columns())))
+            for pair_idx, (src_class, tgt_class) in enumerate(self.comparison_pairs_list):
+                src_block_active = in_class_to_active[src_class][src_idx_start:src_idx_end]
+                if in_pair_to_accumulator is None:
+                    te_block = calculate_active_te_matrix(class_to_series[src_class][src_idx_start:src_idx_end],
+                                                          class_to_series[tgt_class], src_block_active,
+                                                          in_class_to_active[tgt_class], te_matrix_function)
+                else:
+                    te_block = in_pair_to_accumulator[(src_class, tgt_class)].get_te_matrix(
+                        in_class_to_active[src_class], in_class_to_active[tgt_class], src_idx_start, src_idx_end)
+                te_values[:, pair_idx] = te_block_to_rows(te_block, src_idx_start)
+                if self.num_surrogates > 0:
+                    p_block, z_block = calculate_active_surrogate_statistics(
+                        class_to_matrix[src_class][src_idx_start:src_idx_end], class_to_matrix[tgt_class],
+                        src_block_active, in_class_to_active[tgt_class], te_block, self.num_surrogates,
+                        get_surrogate_rngs(self.surrogate_seed, src_idx_start, src_idx_end, pair_idx))
+                    te_values[:, num_pairs + pair_idx] = te_block_to_rows(p_block, src_idx_start)
+                    te_values[:, 2 * num_pairs + pair_idx] = te_block_to_rows(z_block, src_idx_start)
+            yield in_edge_selector.select_block(in_num_actors, src_idx_start, src_idx_end, te_values)
+
+    def __pack_timeseries(self, in_timeseries: Union[List[Dict[str, np.ndarray]], BitPackedTimeseries]
+                          ) -> BitPackedTimeseries:
+        """
+        Returns the bit packed series of the comparison classes, and of the classes of their superclasses, from the
+        actor timeseries dicts or from a BitPackedTimeseries (whose words are not copied). The missing superclasses are
+        computed from the packed classes as word-wise ORs.
+        """
+        comparison_classes = self.__get_comparison_classes()
+        superclasses = [this_class for this_class in comparison_classes if this_class in SUPERCLASS_TO_CLASSES]
+        packed_classes = sorted({this_class for this_class in comparison_classes if this_class not in superclasses} |
+                                {this_class for superclass in superclasses
+                                 for this_class in SUPERCLASS_TO_CLASSES[superclass]})
+        if isinstance(in_timeseries, BitPackedTimeseries):
+            timeseries_store = in_timeseries.select_classes(
+                packed_classes + [superclass for superclass in superclasses
+                                  if superclass in in_timeseries.class_to_words])
+        else:
+            timeseries_store = BitPackedTimeseries.from_actor_timeseries_dict_list(in_timeseries, packed_classes)
+        timeseries_store.add_superclasses([superclass for superclass in superclasses
+                                           if superclass not in timeseries_store.class_to_words])
+        return timeseries_store
+
+    def __create_joint_counts_accumulators(self, in_num_actors: int, in_num_time_steps: int,
+                                           in_options: TeSeriesOptions
+                                           ) -> Dict[Tuple[str, str], JointCountsAccumulator]:
+        """
+        Returns the JointCountsAccumulator of each comparison pair, so that each window only counts the bins added or
+        dropped at its edges, or None if the backend counts each block from scratch: backends without
+        supports_joint_count_updates, streamed or swept series, and joint counts above self.max_joint_counts_bytes.
+        """
+        if not self.te_backend.supports_joint_count_updates or in_options.is_swept:
+            return None
+        if in_options.is_streamed:
+            print("streamed blocks : joint counts are counted for each block")
+            return None
+        joint_counts_bytes = len(self.comparison_pairs_list) * JointCountsAccumulator.get_nbytes(
+            in_num_actors, in_num_actors, in_num_time_steps)
+        if joint_counts_bytes > self.max_joint_counts_bytes:
+            print(f"joint counts of {joint_counts_bytes} bytes exceed {self.max_joint_counts_bytes} bytes : "
+                  f"joint counts are counted for each block")
+            return None
+        print(f"joint counts are updated across windows : {joint_counts_bytes} bytes")
+        return {(src_class, tgt_class): JointCountsAccumulator(src_class, tgt_class, in_num_actors, in_num_actors,
+                                                               in_num_time_steps)
+                for src_class, tgt_class in self.comparison_pairs_list}
+
+    def __select_backend(self, in_timeseries_store: BitPackedTimeseries, in_period_start_index: int,
+                         in_period_end_index: int, in_max_sample_actors: int = 64):
+        """
+        Resolves the "auto" backend with a micro-benchmark on the "*" class series of the period (see
+        select_fastest_te_backend). Only the sampled actors are unpacked.
+        """
+        if self.te_backend is None:
+            class_to_words = in_timeseries_store.class_to_words
+            words = class_to_words["*"] if "*" in class_to_words else next(iter(class_to_words.values()))
+            num_time_steps = in_period_end_index - in_period_start_index
+            matrix = unpack_bits(slice_bits(words[:in_max_sample_actors], in_period_start_index, num_time_steps),
+                                 num_time_steps)
+            self.te_backend, _ = select_fastest_te_backend(matrix, multiprocessing.cpu_count() - 1,
+                                                           in_max_sample_actors)
+
+    def __update_skip_counts(self, in_num_actors: int, in_class_to_active: Dict[str, np.ndarray]):
+        """
+        Counts and reports the TE values of the current window that are skipped because a series is constant.
+        """
+        num_pairs = in_num_actors * (in_num_actors - 1)
+        pair_is_zero = np.ones((in_num_actors, in_num_actors), dtype=bool)
+        skipped_te_values = 0
+        for src_class, tgt_class in self.comparison_pairs_list:
+            skipped_te_values += count_zero_te_values(in_class_to_active[src_class], in_class_to_active[tgt_class])
+            pair_is_zero &= ~np.outer(in_class_to_active[src_class], in_class_to_active[tgt_class])
+        np.fill_diagonal(pair_is_zero, False)
+        self.skip_counts = {"active_actors": {this_class: int(active.sum()) for this_class, active in in_class_to_active.items()},
+                            "pairs": num_pairs,
+                            "skipped_pairs": int(pair_is_zero.sum()),
+                            "te_values": num_pairs * len(self.comparison_pairs_list),
+                            "skipped_te_values": skipped_te_values}
+        print("skipped {skipped_pairs}/{pairs} actor pairs and {skipped_te_values}/{te_values} TE values "
+              "(constant series)".format(**self.skip_counts))
+
+    def __get_timeseries_classes(self) -> List[str]:
+        """
+        Classes of the actor timeseries dicts, in their order.
+        """
+        return ["TF", "TM", "UF", "UM"] + (["T", "U", "F", "M"] if self.add_superclasses else []) + ["*"]
+
+    def __get_comparison_classes(self) -> List[str]:
+        return sorted({this_class for pair in self.comparison_pairs_list for this_class in pair})
 
     def __init_comparison_pairs_list(self, in_classes: List[str]):
         self.comparison_pairs_list = []
@@ -205,21 +1186,99 @@ class TransferEntropyCalculator:
                     # print(c, src, tgt, f"{src}->{tgt}")
                     # c += 1
 
-    def __multpool_calculate_transfer_entropy_sets(self,
-                                                  in_actor_id_list: List[str],
-                                                  in_period_start_index: int,
-                                                  in_period_end_index: int,
-                                                  in_actor_timeseries_dict_list: List[Dict[str, np.ndarray]]):
-        params_list = [[src_idx, in_actor_id_list[src_idx],
-                        tgt_idx, in_actor_id_list[tgt_idx],
-                        in_period_start_index, in_period_end_index,
-                        self.comparison_pairs_list, in_actor_timeseries_dict_list]
-                       for src_idx in range(len(in_actor_id_list))
-                       for tgt_idx in range(len(in_actor_id_list))
-                       if src_idx != tgt_idx]
-        with multiprocessing.Pool(multiprocessing.cpu_count() - 1) as p:
-            results = p.starmap(calculate_transfer_entropy_data, params_list)
-        return results
+    def __multpool_iterate_transfer_entropy_blocks(self,
+                                                   in_actor_id_list: List[str],
+                                                   in_period_start_index: int,
+                                                   in_period_end_index: int,
+                                                   in_timeseries_store: BitPackedTimeseries,
+                                                   in_class_to_active: Dict[str, np.ndarray],
+                                                   in_block_size: int,
+                                                   in_ordered: bool,
+                                                   in_edge_selector: TeEdgeSelector
+                                                   ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Calculates the TE values of all actor pairs with pyinform on the worker pool. The timeseries of the period are
+        stored once in a SharedTimeseriesTensor that every worker attaches to, and each task only receives a range of
+        source actor indices. The workers select the rows of their blocks with in_edge_selector.
+
+        Returns
+        -------
+            An iterator of (src_idx, tgt_idx, te_values) blocks (see calculate_transfer_entropy_block_task).
+        """
+        num_actors = len(in_actor_id_list)
+        block_size = get_pool_block_size(num_actors, self.num_workers, 1) if in_block_size is None else in_block_size
+        tensor = SharedTimeseriesTensor.from_bit_packed_timeseries(in_timeseries_store, self.__get_comparison_classes(),
+                                                                   in_period_start_index, in_period_end_index)
+        with tensor:
+            params_list = self.__get_te_block_params_list(tensor, 0, in_period_end_index - in_period_start_index,
+                                                          in_class_to_active, block_size, in_edge_selector)
+            pool = self.__get_pool()
+            imap_function = pool.imap if in_ordered else pool.imap_unordered
+            yield from imap_function(calculate_transfer_entropy_block_task, params_list)
+
+    def __multpool_iterate_window_te_blocks(self, in_actor_id_list: List[str],
+                                            in_period_index_list: List[Tuple[int, int]],
+                                            in_timeseries_store: BitPackedTimeseries,
+                                            in_edge_selector: TeEdgeSelector
+                                            ) -> Iterator[Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        """
+        Pool backend version of __iterate_te_blocks for all windows of a series. The timeseries are copied to one
+        SharedTimeseriesTensor for all windows, and the block tasks of the next windows are submitted to the pool while
+        the results of the current window are consumed. A small network is a single task per window (see
+        get_pool_block_size), so the workers calculate several windows in parallel, while a large network is split
+        into blocks of source actors. At most 2 * num_workers tasks are in flight, which bounds the memory of the
+        results.
+
+        Parameters
+        ----------
+        in_period_index_list :
+            [period_start_index, period_end_index) of each window
+
+        Returns
+        -------
+            An iterator over the windows (in order) of their (src_idx, tgt_idx, te_values) block iterators.
+        """
+        num_actors = len(in_actor_id_list)
+        block_size = get_pool_block_size(num_actors, self.num_workers)
+        max_windows_in_flight = max(1, -(-2 * self.num_workers // max(1, -(-num_actors // block_size))))
+        pool = self.__get_pool()
+        with SharedTimeseriesTensor.from_bit_packed_timeseries(in_timeseries_store,
+                                                               self.__get_comparison_classes()) as tensor:
+            pending_windows = collections.deque()
+            period_index_iterator = iter(in_period_index_list)
+            while True:
+                for period_start_index, period_end_index in period_index_iterator:
+                    class_to_active = {
+                        this_class: in_timeseries_store.get_active_mask(this_class, period_start_index,
+                                                                        period_end_index)
+                        for this_class in self.__get_comparison_classes()}
+                    self.__update_skip_counts(num_actors, class_to_active)
+                    pending_windows.append([pool.apply_async(calculate_transfer_entropy_block_task, (params,))
+                                            for params in self.__get_te_block_params_list(
+                                                tensor, period_start_index, period_end_index, class_to_active,
+                                                block_size, in_edge_selector)])
+                    if len(pending_windows) >= max_windows_in_flight:
+                        break
+                if not pending_windows:
+                    break
+                async_results = pending_windows.popleft()
+                yield in_edge_selector.merge_blocks(async_result.get() for async_result in async_results)
+
+    def __get_te_block_params_list(self, in_tensor: SharedTimeseriesTensor, in_period_start_index: int,
+                                   in_period_end_index: int, in_class_to_active: Dict[str, np.ndarray],
+                                   in_block_size: int, in_edge_selector: TeEdgeSelector) -> List[Tuple]:
+        """
+        Returns the calculate_transfer_entropy_block_task parameters of the blocks of a period of in_tensor.
+        """
+        num_actors = in_tensor.shape[0]
+        classes = in_tensor.classes
+        comparison_class_idx_pairs = [(classes.index(src_class), classes.index(tgt_class))
+                                      for src_class, tgt_class in self.comparison_pairs_list]
+        active = np.stack([in_class_to_active[this_class] for this_class in classes], axis=1)
+        return [(in_tensor.get_attach_args(), src_idx_start, min(src_idx_start + in_block_size, num_actors),
+                 in_period_start_index, in_period_end_index, comparison_class_idx_pairs, active,
+                 self.num_surrogates, self.surrogate_seed, in_edge_selector)
+                for src_idx_start in range(0, num_actors, max(1, in_block_size))]
 
     def __multpool_calculate_actor_to_timeseries_dict_list(self, in_actor_id_list: List[str]) -> List[Dict[str, np.ndarray]]:
         """
@@ -232,6 +1291,4 @@ class TransferEntropyCalculator:
         """
         params_list = [[actor_id, self.data_manager, self.datetime_index, self.frequency, self.add_superclasses]
                        for actor_id in in_actor_id_list]
-        with multiprocessing.Pool(multiprocessing.cpu_count() - 1) as p:
-            results = p.starmap(get_actor_time_series, params_list)
-        return results
+        return self.__get_pool().starmap(get_actor_time_series, params_list)
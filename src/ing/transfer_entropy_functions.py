@@ -28,14 +28,18 @@ SOFTWARE.
 import pandas as pd
 import numpy as np
 import datetime
-import pyinform
 import multiprocessing
 from typing import List, Dict
 
+from .message_store import MessageStore
+from .te_backends import ITeBackend, PyinformTeBackend, check_te_backend, create_te_backend
+from .transfer_entropy_matrix import calculate_active_te_matrix, compute_active_mask, stack_class_timeseries
+
 
 def get_events_of_actor(actor_id: pd.DataFrame, dataset_df: pd.DataFrame, actors_df: pd.DataFrame,
                         indv_actors_df: pd.DataFrame, comm_actors_df: pd.DataFrame,
-                        plat_actors_df: pd.DataFrame) -> pd.DataFrame:
+                        plat_actors_df: pd.DataFrame, message_store: MessageStore = None,
+                        start_date: datetime.datetime = None, end_date: datetime.datetime = None) -> pd.DataFrame:
     """
     Returns the event list of the actor from the dataset.
 
@@ -53,6 +57,13 @@ def get_events_of_actor(actor_id: pd.DataFrame, dataset_df: pd.DataFrame, actors
         community (or group) actors_df dataframe with actor_id as index. Defined in Table 8.
     plat_actors_df : pd.DataFrame
         platform actors_df dataframe with actor_id as index. Defined in Table 9.
+    message_store : MessageStore
+        If given, the events are looked up in the message store (in datetime order) instead of scanning dataset_df.
+        The message store should hold the events of dataset_df.
+    start_date : datetime.datetime
+        inclusive start datetime of the events looked up in message_store (unbounded if None)
+    end_date : datetime.datetime
+        inclusive end datetime of the events looked up in message_store (unbounded if None)
 
     Returns
     -------
@@ -63,10 +74,14 @@ def get_events_of_actor(actor_id: pd.DataFrame, dataset_df: pd.DataFrame, actors
     if actor_type == 'plat':
         plat = plat_actors_df.loc[actor_id][0]
         # print(f"{actor_id} is Platform: {plat}")
+        if message_store is not None:
+            return message_store.get_key_msgs('platform', plat, start_date, end_date)
         return dataset_df[dataset_df['platform'] == plat]
     elif actor_type == 'indv':
         user_id = indv_actors_df.loc[actor_id][0]
         # print(f"{actor_id} is Individual: {user_id}")
+        if message_store is not None:
+            return message_store.get_key_msgs('user_id', user_id, start_date, end_date)
         return dataset_df[dataset_df['user_id'] == user_id]
     elif actor_type == 'comm':
         user_list = comm_actors_df.loc[actor_id]['user_id']
@@ -83,6 +98,8 @@ def get_events_of_actor(actor_id: pd.DataFrame, dataset_df: pd.DataFrame, actors
                 users = ' '.join([f"{u}" for u in np.random.choice(user_list, print_limit, replace=False)])
                 msg = f"{msg} : [{users} ...]"
             #print(msg)
+            if message_store is not None:
+                return message_store.get_key_msgs('user_id', list(user_list), start_date, end_date)
             return dataset_df[dataset_df['user_id'].isin(user_list)]
         else:
             return dataset_df[0:0]  # return 0 records
@@ -178,7 +195,8 @@ def multiprocess_resample_actor_binary_timeseries(ordered_actor_id_events_list,
     return results
 
 
-def calculate_te_values(src_actor_id, tgt_actor_id, src_timeseries_dict, tgt_timeseries_dict, classes):
+def calculate_te_values(src_actor_id, tgt_actor_id, src_timeseries_dict, tgt_timeseries_dict, classes,
+                        te_backend: ITeBackend = None):
     """
     Calculates the transfer entropy from the given source and target timeseries and returns a list that contains
      [Source, Target, TransferEntropy].
@@ -195,6 +213,8 @@ def calculate_te_values(src_actor_id, tgt_actor_id, src_timeseries_dict, tgt_tim
         a dictionary containing, for each class: a binary timeseries of Target
     classes: typing.List[str]
         unique values of the 'class' column. e.g. ['UF','UM','TF','TM']
+    te_backend: ITeBackend
+        TE backend that computes the values (see create_te_backend). Defaults to the pyinform backend.
 
     Returns
     -------
@@ -204,11 +224,14 @@ def calculate_te_values(src_actor_id, tgt_actor_id, src_timeseries_dict, tgt_tim
     """
     #print(f"[{src_actor_id} ==> {tgt_actor_id}]")
     # print(f"{src_timeseries.shape} ==> {tgt_timeseries.shape}")
+    if te_backend is None:
+        te_backend = PyinformTeBackend()
     te_values_list = []
     total_te = 0
     for src_class in classes:
         for tgt_class in classes:
-            this_te = pyinform.transfer_entropy(src_timeseries_dict[src_class], tgt_timeseries_dict[tgt_class], 1)
+            this_te = float(te_backend.calculate_te_matrix(np.asarray(src_timeseries_dict[src_class])[None, :],
+                                                           np.asarray(tgt_timeseries_dict[tgt_class])[None, :])[0, 0])
             te_values_list.append(this_te)
             total_te += this_te
     te_values_list.append(total_te)
@@ -217,10 +240,11 @@ def calculate_te_values(src_actor_id, tgt_actor_id, src_timeseries_dict, tgt_tim
 
 def multiprocess_run_calculate_te_edge_list(ordered_actor_id_list: List[str],
                                             ordered_actor_timeseries_dict_list: Dict[str, np.ndarray],
-                                            classes: List[str]) -> List[List]:
+                                            classes: List[str], te_backend: str = "pyinform") -> List[List]:
     """
-    Utilize multiprocessing Pool for calculating all transfer entropy values using the calculate_te_values function.
-    Returns a list of calculate_te_values function returns for the provided input parameters.
+    Calculates all transfer entropy values with the TE backend te_backend, one TE matrix of all actors per class pair
+    (constant series are skipped, see calculate_active_te_matrix).
+    Returns the calculate_te_values rows of every (source, target) pair of distinct actors, in source then target order.
 
     Parameters
     ----------
@@ -231,31 +255,44 @@ def multiprocess_run_calculate_te_edge_list(ordered_actor_id_list: List[str],
         which represent the binary timeseries. keys are the classes.
     classes:
         unique values of the 'class' column. e.g. ['UF','UM','TF','TM']
+    te_backend:
+        Name of the TE backend (see create_te_backend), e.g. "pyinform", "numpy" or "bitpacked". The other backends
+        are checked against pyinform first (see check_te_backend).
     Returns
     -------
     typing.List[typing.List]
         list of actor_id interactions with their corresponding transfer entropy values. (A list of outputs from the calculate_te_values function)
     """
-    param_list = []
-    for src_idx in range(len(ordered_actor_id_list)):
-        for tgt_idx in range(len(ordered_actor_id_list)):
+    backend = create_te_backend(te_backend)
+    if backend.name != "pyinform":
+        check_te_backend(backend)
+    num_actors = len(ordered_actor_id_list)
+    if num_actors < 2:
+        return []
+    classes = list(classes)
+    class_to_matrix = stack_class_timeseries(ordered_actor_timeseries_dict_list, classes, 0,
+                                             len(ordered_actor_timeseries_dict_list[0][classes[0]]))
+    class_to_active = {this_class: compute_active_mask(matrix) for this_class, matrix in class_to_matrix.items()}
+    print(f"class matrices ready. Pairs: {num_actors * (num_actors - 1)}")
+    # source x target x class pair, in the column order of calculate_te_values
+    te_values = np.stack([calculate_active_te_matrix(class_to_matrix[src_class], class_to_matrix[tgt_class],
+                                                     class_to_active[src_class], class_to_active[tgt_class],
+                                                     backend.calculate_te_matrix)
+                          for src_class in classes for tgt_class in classes], axis=-1)
+    results = []
+    for src_idx in range(num_actors):
+        for tgt_idx in range(num_actors):
             if src_idx == tgt_idx:
                 continue
-            param_list.append((ordered_actor_id_list[src_idx], ordered_actor_id_list[tgt_idx],
-                               ordered_actor_timeseries_dict_list[src_idx], ordered_actor_timeseries_dict_list[tgt_idx], classes))
-    print(f"params ready. Count: {len(param_list)}")
-    # with multiprocessing.Pool(multiprocessing.cpu_count() - 1) as p:
-    #    results = p.starmap(calculate_te_values, param_list)
-    results = []
-    for param in param_list:
-        r = calculate_te_values(param[0], param[1], param[2], param[3], param[4])
-        results.append(r)
-    print("mult proc done")
+            te_values_list = te_values[src_idx, tgt_idx].tolist()
+            results.append([ordered_actor_id_list[src_idx], ordered_actor_id_list[tgt_idx]] + te_values_list +
+                           [sum(te_values_list)])
+    print(f"TE matrices done ({backend.name})")
     return results
 
 
 def generate_te_edge_list(actor_id_list, all_events_df, actors_df, indv_actors_df, comm_actors_df, plat_actors_df,
-                          frequency, start_date, end_date, classes=('UF', 'UM', 'TF', 'TM')):
+                          frequency, start_date, end_date, classes=('UF', 'UM', 'TF', 'TM'), te_backend="pyinform"):
     """
     Calculates the transfer entropy based edge weights for the given set of actors_df.
 
@@ -275,6 +312,8 @@ def generate_te_edge_list(actor_id_list, all_events_df, actors_df, indv_actors_d
         End datetime
     classes :
         Classes of
+    te_backend :
+        Name of the TE backend, see multiprocess_run_calculate_te_edge_list
 
     Returns
     -------
@@ -284,18 +323,21 @@ def generate_te_edge_list(actor_id_list, all_events_df, actors_df, indv_actors_d
     #start_date = all_events_df['datetime'].dt.date.min()
     #end_date = all_events_df['datetime'].dt.date.max() + datetime.timedelta(days=1)
     print(f"Filtering data available from {start_date} to {end_date}")
-    filtered_events_df = all_events_df[ (start_date <= all_events_df['datetime']) & (all_events_df['datetime'] <= end_date) ]
+    message_store = MessageStore(all_events_df)
+    filtered_events_df = message_store.get_msgs(start_date, end_date)
     datetime_index = generate_timeseries_index(start_date, end_date, frequency)
     print("Running resampling timeseries calc...")
     # resample actor timeseries
     actor_timeseries_dict_list = multiprocess_resample_actor_binary_timeseries(
-        [get_events_of_actor(actor_id, filtered_events_df, actors_df, indv_actors_df, comm_actors_df, plat_actors_df) for
+        [get_events_of_actor(actor_id, filtered_events_df, actors_df, indv_actors_df, comm_actors_df, plat_actors_df,
+                             message_store, start_date, end_date) for
          actor_id in actor_id_list],
         datetime_index, frequency, classes)
     print("Running TE edge list calc...")
     #print(in_actor_timeseries_dict_list)
     # calculate te values
-    src_tgt_te_list = multiprocess_run_calculate_te_edge_list(actor_id_list, actor_timeseries_dict_list, classes)
+    src_tgt_te_list = multiprocess_run_calculate_te_edge_list(actor_id_list, actor_timeseries_dict_list, classes,
+                                                              te_backend)
     print("Calculation done. Creating dataframe...")
     te_col_names = []
     for src_class in classes:
@@ -0,0 +1,539 @@
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def get_observation_dtype(in_num_observations: int):
+    """
+    Returns the float dtype that is used for matrix products of binary indicators. Counts are exact in float32 as long as
+    they stay below 2**24, which is the case for any realistic timeseries length.
+    """
+    return np.float32 if in_num_observations < 2 ** 24 else np.float64
+
+
+def compute_target_state_indicators(in_tgt_matrix: np.ndarray, in_history_length: int = 1) -> np.ndarray:
+    """
+    Computes the joint (history, future) state indicators of each target series.
+
+    Parameters
+    ----------
+    in_tgt_matrix :
+        A binary matrix of shape (num_targets, T) where each row is the timeseries of a target actor.
+    in_history_length :
+        History length k of the target.
+
+    Returns
+    -------
+        A binary array of shape (2 ** (k + 1), num_targets, T - k). The element [z, j, t] is 1 if the target j is in
+        the joint state z = 2 * h + x_{t+k} where h is the binary number (x_t, ..., x_{t+k-1}), and 0 otherwise.
+    """
+    num_time_steps = in_tgt_matrix.shape[1]
+    binary_tgt_matrix = (in_tgt_matrix > 0).astype(np.int64)
+    state_codes = np.zeros((in_tgt_matrix.shape[0], num_time_steps - in_history_length), dtype=np.int64)
+    for offset in range(in_history_length + 1):
+        state_codes = 2 * state_codes + binary_tgt_matrix[:, offset:num_time_steps - in_history_length + offset]
+    return np.stack([state_codes == z for z in range(2 ** (in_history_length + 1))])
+
+
+def compute_lagged_source_values(in_src_matrix: np.ndarray, in_history_length: int = 1, in_lag: int = 1) -> np.ndarray:
+    """
+    Aligns the source series with the target states of compute_target_state_indicators for the given history length.
+
+    Returns
+    -------
+        A binary array of shape (num_sources, T - k). Column t holds the source value at (t + k - in_lag), which is
+        the value that is paired with the target future x_{t+k}. The first in_lag - 1 columns have no observation for
+        this lag and are 0.
+    """
+    num_time_steps = in_src_matrix.shape[1]
+    src_values = np.zeros((in_src_matrix.shape[0], num_time_steps - in_history_length), dtype=bool)
+    src_values[:, in_lag - 1:] = in_src_matrix[:, in_history_length - 1:num_time_steps - in_lag] > 0
+    return src_values
+
+
+def compute_joint_counts(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray, in_history_length: int = 1,
+                         in_lag: int = 1) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Computes every joint count required by the transfer entropy estimator for all sources against all targets at once.
+
+    Parameters
+    ----------
+    in_src_matrix :
+        A binary matrix of shape (num_sources, T) where each row is the timeseries of a source actor.
+    in_tgt_matrix :
+        A binary matrix of shape (num_targets, T) where each row is the timeseries of a target actor.
+    in_history_length :
+        History length k of the target.
+    in_lag :
+        Number of time steps between the source value and the target future it is paired with.
+
+    Returns
+    -------
+        A tuple (src_joint_counts, tgt_state_counts, num_observations)
+            src_joint_counts : shape (num_sources, num_targets, 2 ** (k + 1)), number of time steps where the source is
+                1 and the target is in the joint state z.
+            tgt_state_counts : shape (num_targets, 2 ** (k + 1)), number of time steps where the target is in the joint
+                state z.
+            num_observations : number of time steps used by the estimator (T - k - in_lag + 1).
+    """
+    return compute_lagged_joint_counts(in_src_matrix, in_tgt_matrix, in_history_length, [in_lag])[in_lag]
+
+
+def compute_lagged_joint_counts(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray, in_history_length: int,
+                                in_lags: List[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray, int]]:
+    """
+    Computes the joint counts of compute_joint_counts for several lags at once. The target states are computed once
+    and the lagged source matrices are stacked, so each joint state costs a single matrix product for all lags.
+
+    Returns
+    -------
+        Dictionary of lag to (src_joint_counts, tgt_state_counts, num_observations)
+    """
+    if in_src_matrix.shape[1] != in_tgt_matrix.shape[1]:
+        raise ValueError("Source and target timeseries should have the same length!")
+    num_time_steps = in_tgt_matrix.shape[1]
+    if min(in_lags) < 1 or in_history_length < 1:
+        raise ValueError("Lag and history length should be at least 1!")
+    if num_time_steps - in_history_length - max(in_lags) + 1 < 1:
+        raise ValueError("timeseries is too short")
+    num_sources = in_src_matrix.shape[0]
+    dtype = get_observation_dtype(num_time_steps)
+    tgt_states = compute_target_state_indicators(in_tgt_matrix, in_history_length).astype(dtype)
+    src_values = np.concatenate([compute_lagged_source_values(in_src_matrix, in_history_length, lag)
+                                 for lag in in_lags]).astype(dtype)
+    src_joint_counts = np.stack([src_values @ tgt_states[z].T for z in range(tgt_states.shape[0])],
+                                axis=-1).astype(np.float64)
+    lag_to_joint_counts = {}
+    for lag_idx, lag in enumerate(in_lags):
+        tgt_state_counts = tgt_states[:, :, lag - 1:].sum(axis=2).T.astype(np.float64)
+        lag_to_joint_counts[lag] = (src_joint_counts[lag_idx * num_sources:(lag_idx + 1) * num_sources],
+                                    tgt_state_counts, num_time_steps - in_history_length - lag + 1)
+    return lag_to_joint_counts
+
+
+def compute_te_matrix_from_counts(in_src_joint_counts: np.ndarray, in_tgt_state_counts: np.ndarray,
+                                  in_num_observations: int) -> np.ndarray:
+    """
+    Computes the transfer entropy (base 2) from the joint counts produced by compute_joint_counts.
+    The joint state axis is ordered as z = 2 * history + future, so the history state of z is z // 2.
+
+    Parameters
+    ----------
+    in_src_joint_counts :
+        shape (num_sources, num_targets, Z), count of (source=1, target state z).
+    in_tgt_state_counts :
+        shape (num_targets, Z), count of (target state z).
+    in_num_observations :
+        Number of time steps that were counted.
+
+    Returns
+    -------
+        Transfer entropy matrix of shape (num_sources, num_targets). Element [i, j] is TE from source i to target j.
+    """
+    num_states = in_tgt_state_counts.shape[-1]
+    tgt_counts = np.broadcast_to(in_tgt_state_counts, in_src_joint_counts.shape)
+    # counts of history states, for the target alone and for each source value
+    tgt_history_counts = tgt_counts.reshape(tgt_counts.shape[:-1] + (num_states // 2, 2)).sum(axis=-1)
+    te_sum = np.zeros(in_src_joint_counts.shape[:-1])
+    for src_joint_counts in (in_src_joint_counts, tgt_counts - in_src_joint_counts):
+        src_history_counts = src_joint_counts.reshape(src_joint_counts.shape[:-1] + (num_states // 2, 2)).sum(axis=-1)
+        numerator = src_joint_counts * np.repeat(tgt_history_counts, 2, axis=-1)
+        denominator = np.repeat(src_history_counts, 2, axis=-1) * tgt_counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = src_joint_counts * np.log2(numerator / denominator)
+        te_sum += np.where(src_joint_counts > 0, terms, 0.0).sum(axis=-1)
+    return te_sum / in_num_observations
+
+
+def calculate_te_matrix(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray, in_history_length: int = 1,
+                        in_lag: int = 1) -> np.ndarray:
+    """
+    Calculates transfer entropy from every source to every target. Numerically equivalent to calling
+    pyinform.transfer_entropy(src[:T - in_lag + 1], tgt[in_lag - 1:], in_history_length) for each (src, tgt) pair of
+    rows, which is pyinform.transfer_entropy(src, tgt, 1) for the default arguments.
+
+    Parameters
+    ----------
+    in_src_matrix :
+        A binary matrix of shape (num_sources, T)
+    in_tgt_matrix :
+        A binary matrix of shape (num_targets, T)
+    in_history_length :
+        History length k of the target.
+    in_lag :
+        Number of time steps between the source value and the target future it is paired with.
+
+    Returns
+    -------
+        Transfer entropy matrix of shape (num_sources, num_targets).
+    """
+    return compute_te_matrix_from_counts(*compute_joint_counts(in_src_matrix, in_tgt_matrix, in_history_length, in_lag))
+
+
+def calculate_te_sweep_matrices(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray, in_lags: List[int],
+                                in_history_lengths: List[int]) -> Dict[Tuple[int, int], np.ndarray]:
+    """
+    Calculates the transfer entropy matrices of calculate_te_matrix for every (lag, history length) combination. The
+    target states are computed once per history length and shared by all lags.
+
+    Returns
+    -------
+        Dictionary of (lag, history_length) to the transfer entropy matrix of shape (num_sources, num_targets).
+    """
+    lag_history_to_te_matrix = {}
+    for history_length in in_history_lengths:
+        for lag, joint_counts in compute_lagged_joint_counts(in_src_matrix, in_tgt_matrix, history_length,
+                                                             in_lags).items():
+            lag_history_to_te_matrix[(lag, history_length)] = compute_te_matrix_from_counts(*joint_counts)
+    return lag_history_to_te_matrix
+
+
+def compute_active_mask(in_matrix: np.ndarray) -> np.ndarray:
+    """
+    Finds the rows of an actor x time matrix that are not constant. Transfer entropy from or to a constant series is
+    identically 0, so only pairs where both series are active need to be computed.
+
+    Returns
+    -------
+        A boolean array of shape (num_actors,) which is True for the actors whose series is not constant.
+    """
+    if in_matrix.shape[1] == 0:
+        return np.zeros(in_matrix.shape[0], dtype=bool)
+    return in_matrix.min(axis=1) != in_matrix.max(axis=1)
+
+
+def count_zero_te_values(in_src_active: np.ndarray, in_tgt_active: np.ndarray) -> int:
+    """
+    Counts the (source, target) pairs with source != target that are provably 0 because either series is constant.
+    Source and target masks must describe the same list of actors.
+    """
+    num_actors = len(in_src_active)
+    num_computed = int(in_src_active.sum()) * int(in_tgt_active.sum()) - int((in_src_active & in_tgt_active).sum())
+    return num_actors * (num_actors - 1) - num_computed
+
+
+def calculate_active_te_matrix(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray,
+                               in_src_active: np.ndarray, in_tgt_active: np.ndarray,
+                               in_te_matrix_function: Callable[[np.ndarray, np.ndarray], np.ndarray] = None
+                               ) -> np.ndarray:
+    """
+    Calculates the transfer entropy matrix only for the active sources and targets, and fills the rest with 0.
+    in_te_matrix_function(src_matrix, tgt_matrix) computes the TE matrix of the active rows, calculate_te_matrix by
+    default.
+    """
+    if in_te_matrix_function is None:
+        in_te_matrix_function = calculate_te_matrix
+    te_matrix = np.zeros((in_src_matrix.shape[0], in_tgt_matrix.shape[0]))
+    if in_src_active.any() and in_tgt_active.any():
+        te_matrix[np.ix_(in_src_active, in_tgt_active)] = in_te_matrix_function(in_src_matrix[in_src_active],
+                                                                                in_tgt_matrix[in_tgt_active])
+    return te_matrix
+
+
+def calculate_surrogate_statistics(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray, in_te_matrix: np.ndarray,
+                                   in_num_surrogates: int, in_src_rngs: List[np.random.Generator],
+                                   in_max_surrogate_rows: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tests the TE values of calculate_te_matrix (history length 1, lag 1) against source shuffled surrogates. For every
+    source, in_num_surrogates random permutations of its observations are generated in one batch, and the TE of all
+    surrogates against all targets is computed with the same joint count matrix products.
+
+    Parameters
+    ----------
+    in_src_matrix :
+        A binary matrix of shape (num_sources, T)
+    in_tgt_matrix :
+        A binary matrix of shape (num_targets, T)
+    in_te_matrix :
+        Observed TE matrix of shape (num_sources, num_targets)
+    in_num_surrogates :
+        Number of surrogates per source
+    in_src_rngs :
+        Random generator of each source, used for the permutations of its observations (see get_surrogate_rng)
+    in_max_surrogate_rows :
+        Maximum number of surrogate series evaluated in one batch. Bounds the memory to
+        in_max_surrogate_rows x num_targets x 4 counts.
+
+    Returns
+    -------
+        A tuple (p_values, z_scores) of arrays with the shape of in_te_matrix.
+            p_values : (1 + number of surrogates with TE >= observed TE) / (1 + in_num_surrogates)
+            z_scores : (observed TE - mean surrogate TE) / std of surrogate TE, or 0 if the surrogates are constant.
+    """
+    num_sources, num_targets = in_te_matrix.shape
+    p_values = np.ones(in_te_matrix.shape)
+    z_scores = np.zeros(in_te_matrix.shape)
+    num_observations = in_tgt_matrix.shape[1] - 1
+    if num_sources == 0 or num_targets == 0 or num_observations < 1:
+        return p_values, z_scores
+    dtype = get_observation_dtype(num_observations)
+    tgt_states = compute_target_state_indicators(in_tgt_matrix).astype(dtype)
+    tgt_state_counts = tgt_states.sum(axis=2).T.astype(np.float64)
+    src_values = in_src_matrix[:, :-1] > 0
+    sources_per_batch = max(1, in_max_surrogate_rows // in_num_surrogates)
+    for src_idx_start in range(0, num_sources, sources_per_batch):
+        src_idx_end = min(src_idx_start + sources_per_batch, num_sources)
+        # rows [k * S, (k + 1) * S) are the surrogates of the kth source of the batch
+        surrogate_values = np.concatenate([
+            in_src_rngs[src_idx].permuted(np.repeat(src_values[src_idx:src_idx + 1], in_num_surrogates, axis=0), axis=1)
+            for src_idx in range(src_idx_start, src_idx_end)]).astype(dtype)
+        surrogate_counts = np.stack([surrogate_values @ tgt_states[z].T for z in range(tgt_states.shape[0])],
+                                    axis=-1).astype(np.float64)
+        surrogate_te = compute_te_matrix_from_counts(surrogate_counts, tgt_state_counts, num_observations).reshape(
+            src_idx_end - src_idx_start, in_num_surrogates, num_targets)
+        observed_te = in_te_matrix[src_idx_start:src_idx_end]
+        # tolerance for the rounding differences between equal TE values
+        num_greater = (surrogate_te >= observed_te[:, None, :] - 1e-12).sum(axis=1)
+        p_values[src_idx_start:src_idx_end] = (1 + num_greater) / (1 + in_num_surrogates)
+        surrogate_std = surrogate_te.std(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores[src_idx_start:src_idx_end] = np.where(
+                surrogate_std > 1e-12, (observed_te - surrogate_te.mean(axis=1)) / surrogate_std, 0.0)
+    return p_values, z_scores
+
+
+def calculate_active_surrogate_statistics(in_src_matrix: np.ndarray, in_tgt_matrix: np.ndarray,
+                                          in_src_active: np.ndarray, in_tgt_active: np.ndarray,
+                                          in_te_matrix: np.ndarray, in_num_surrogates: int,
+                                          in_src_rngs: List[np.random.Generator]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    calculate_surrogate_statistics for the active sources and targets only. Pairs with a constant series have TE 0 for
+    every surrogate, so they get p-value 1 and z-score 0 without being computed.
+    """
+    p_values = np.ones(in_te_matrix.shape)
+    z_scores = np.zeros(in_te_matrix.shape)
+    if in_src_active.any() and in_tgt_active.any():
+        active_idx = np.ix_(in_src_active, in_tgt_active)
+        p_values[active_idx], z_scores[active_idx] = calculate_surrogate_statistics(
+            in_src_matrix[in_src_active], in_tgt_matrix[in_tgt_active], in_te_matrix[active_idx],
+            in_num_surrogates, [rng for rng, is_active in zip(in_src_rngs, in_src_active) if is_active])
+    return p_values, z_scores
+
+
+def get_surrogate_rng(in_seed: int, in_src_idx: int, in_pair_idx: int) -> np.random.Generator:
+    """
+    Random generator for the surrogates of a source actor and a comparison pair. With a seed, results do not depend on
+    the block size, nor on which worker or in which order the blocks are computed.
+    """
+    return np.random.default_rng(None if in_seed is None else [in_seed, in_src_idx, in_pair_idx])
+
+
+def get_surrogate_rngs(in_seed: int, in_src_idx_start: int, in_src_idx_end: int,
+                       in_pair_idx: int) -> List[np.random.Generator]:
+    """
+    get_surrogate_rng of each source actor of the block [in_src_idx_start, in_src_idx_end).
+    """
+    return [get_surrogate_rng(in_seed, src_idx, in_pair_idx) for src_idx in range(in_src_idx_start, in_src_idx_end)]
+
+
+def stack_class_timeseries(in_actor_timeseries_dict_list: List[Dict[str, np.ndarray]], in_classes: List[str],
+                           in_period_start_idx: int, in_period_end_idx: int) -> Dict[str, np.ndarray]:
+    """
+    Stacks the timeseries of all actors into one actor x time matrix per class.
+
+    Parameters
+    ----------
+    in_actor_timeseries_dict_list :
+        A list which contains "actor timeseries dicts"
+    in_classes :
+        Classes for which the matrices are needed
+    in_period_start_idx :
+        inclusive Start index of the timeseries slice
+    in_period_end_idx :
+        exclusive End index of the timeseries slice
+
+    Returns
+    -------
+        Dictionary of class to a binary uint8 matrix of shape (num_actors, in_period_end_idx - in_period_start_idx)
+    """
+    return {this_class: np.stack([actor_timeseries_dict[this_class][in_period_start_idx:in_period_end_idx]
+                                  for actor_timeseries_dict in in_actor_timeseries_dict_list]).astype(np.uint8)
+            for this_class in in_classes}
+
+
+def calculate_te_matrices(in_class_to_matrix: Dict[str, np.ndarray],
+                          in_class_to_active: Dict[str, np.ndarray],
+                          in_comparison_pairs_list: List[Tuple[str, str]]) -> Dict[Tuple[str, str], np.ndarray]:
+    """
+    Calculates the full N x N transfer entropy matrix of each comparison pair of classes.
+
+    Parameters
+    ----------
+    in_class_to_matrix :
+        Dictionary of class to the actor x time matrix of the window (see stack_class_timeseries)
+    in_class_to_active :
+        Dictionary of class to the active mask of the window (see compute_active_mask)
+    in_comparison_pairs_list :
+        comparison pairs list of classes
+
+    Returns
+    -------
+        Dictionary of (src_class, tgt_class) to the transfer entropy matrix between all actors.
+    """
+    return {(src_class, tgt_class): calculate_active_te_matrix(in_class_to_matrix[src_class],
+                                                               in_class_to_matrix[tgt_class],
+                                                               in_class_to_active[src_class],
+                                                               in_class_to_active[tgt_class])
+            for src_class, tgt_class in in_comparison_pairs_list}
+
+
+def get_pair_indices(in_num_actors: int, in_src_idx_start: int = 0,
+                     in_src_idx_end: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the (source index, target index) arrays of the actor pairs of the sources [in_src_idx_start, in_src_idx_end)
+    in the row order of actor_te_edges_df (source major, self pairs excluded).
+    """
+    if in_src_idx_end is None:
+        in_src_idx_end = in_num_actors
+    is_pair = np.ones((in_src_idx_end - in_src_idx_start, in_num_actors), dtype=bool)
+    is_pair[np.arange(in_src_idx_end - in_src_idx_start), np.arange(in_src_idx_start, in_src_idx_end)] = False
+    src_idx, tgt_idx = np.nonzero(is_pair)
+    return src_idx + in_src_idx_start, tgt_idx
+
+
+def te_block_to_rows(in_te_block: np.ndarray, in_src_idx_start: int) -> np.ndarray:
+    """
+    Flattens a (num_block_sources, num_actors) block of a TE matrix, whose first row is the source in_src_idx_start,
+    to the values of its actor pairs in the row order of actor_te_edges_df.
+    """
+    src_idx, tgt_idx = get_pair_indices(in_te_block.shape[1], in_src_idx_start, in_src_idx_start + in_te_block.shape[0])
+    return in_te_block[src_idx - in_src_idx_start, tgt_idx]
+
+
+def te_matrices_to_rows(in_actor_id_list: List[str], in_comparison_pairs_list: List[Tuple[str, str]],
+                        in_pair_to_te_matrix: Dict[Tuple[str, str], np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Flattens the TE matrices to the columns of actor_te_edges_df. The row order is the same as the pair order used by
+    the pyinform backend (source major, self pairs excluded).
+    """
+    src_idx, tgt_idx = get_pair_indices(len(in_actor_id_list))
+    actor_ids = np.asarray(in_actor_id_list, dtype=object)
+    columns = {"Source": actor_ids[src_idx], "Target": actor_ids[tgt_idx]}
+    for src_class, tgt_class in in_comparison_pairs_list:
+        columns[f"{src_class}_{tgt_class}"] = in_pair_to_te_matrix[(src_class, tgt_class)][src_idx, tgt_idx]
+    return columns
+
+
+class JointCountsAccumulator:
+    """
+    Keeps the joint counts of all sources against all targets of a comparison pair for a window of time steps, so that
+    moving to an overlapping window only costs the time steps that were added or dropped at its edges. The series are
+    not copied: move_to reads the bins that it counts from the class matrices of the calculation, which are shared by
+    the accumulators of all comparison pairs.
+
+    The observation at time step t uses (source_t, target_t, target_{t+1}), hence a window [start, end) of the
+    timeseries contains the observations [start, end - 1).
+
+    Attributes
+    ----------
+    src_class : str
+        Class of the source series
+    tgt_class : str
+        Class of the target series
+    src_joint_counts : np.ndarray
+        shape (num_sources, num_targets, 4), joint counts of the current window, in the float dtype of
+        get_observation_dtype (exact integers, 4 bytes per count)
+    tgt_state_counts : np.ndarray
+        shape (num_targets, 4), target joint state counts of the current window
+    obs_start_idx : int
+        inclusive start of the observations in the current window
+    obs_end_idx : int
+        exclusive end of the observations in the current window
+    """
+
+    def __init__(self, in_src_class: str, in_tgt_class: str, in_num_sources: int, in_num_targets: int,
+                 in_num_time_steps: int):
+        """
+        Parameters
+        ----------
+        in_num_time_steps :
+            Length T of the series that cover all windows
+        """
+        self.src_class = in_src_class
+        self.tgt_class = in_tgt_class
+        dtype = get_observation_dtype(in_num_time_steps)
+        self.src_joint_counts = np.zeros((in_num_sources, in_num_targets, 4), dtype=dtype)
+        self.tgt_state_counts = np.zeros((in_num_targets, 4))
+        self.obs_start_idx = 0
+        self.obs_end_idx = 0
+
+    @staticmethod
+    def get_nbytes(in_num_sources: int, in_num_targets: int, in_num_time_steps: int) -> int:
+        """
+        Returns the memory of the joint counts of an accumulator.
+        """
+        return in_num_sources * in_num_targets * 4 * np.dtype(get_observation_dtype(in_num_time_steps)).itemsize
+
+    def __count_observations(self, in_obs_start_idx: int, in_obs_end_idx: int,
+                             in_get_class_matrix: Callable[[str, int, int], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        # the observations [start, end) read the bins [start, end + 1)
+        src_joint_counts, tgt_state_counts, _ = compute_joint_counts(
+            in_get_class_matrix(self.src_class, in_obs_start_idx, in_obs_end_idx + 1),
+            in_get_class_matrix(self.tgt_class, in_obs_start_idx, in_obs_end_idx + 1))
+        return src_joint_counts.astype(self.src_joint_counts.dtype), tgt_state_counts
+
+    def move_to(self, in_period_start_idx: int, in_period_end_idx: int,
+                in_get_class_matrix: Callable[[str, int, int], np.ndarray]):
+        """
+        Updates the joint counts to the window [in_period_start_idx, in_period_end_idx) of the timeseries.
+        Only the observations that differ from the current window are counted, unless that would cost more than
+        counting the new window from scratch.
+
+        Parameters
+        ----------
+        in_get_class_matrix :
+            Called with (class, start, end), returns the binary matrix of the bins [start, end) of the class series
+            of all actors, e.g. BitPackedTimeseries.get_matrix
+        """
+        new_start, new_end = in_period_start_idx, in_period_end_idx - 1
+        if new_end - new_start < 1:
+            raise ValueError("timeseries is too short")
+        overlap = min(self.obs_end_idx, new_end) - max(self.obs_start_idx, new_start)
+        added = [(new_start, min(self.obs_start_idx, new_end)), (max(self.obs_end_idx, new_start), new_end)]
+        dropped = [(self.obs_start_idx, min(new_start, self.obs_end_idx)), (max(new_end, self.obs_start_idx), self.obs_end_idx)]
+        delta_size = sum(max(0, end - start) for start, end in added + dropped)
+        if overlap <= 0 or delta_size >= new_end - new_start:
+            self.src_joint_counts, self.tgt_state_counts = self.__count_observations(new_start, new_end,
+                                                                                     in_get_class_matrix)
+        else:
+            for start, end in added:
+                if start < end:
+                    src_joint_counts, tgt_state_counts = self.__count_observations(start, end, in_get_class_matrix)
+                    self.src_joint_counts += src_joint_counts
+                    self.tgt_state_counts += tgt_state_counts
+            for start, end in dropped:
+                if start < end:
+                    src_joint_counts, tgt_state_counts = self.__count_observations(start, end, in_get_class_matrix)
+                    self.src_joint_counts -= src_joint_counts
+                    self.tgt_state_counts -= tgt_state_counts
+        self.obs_start_idx, self.obs_end_idx = new_start, new_end
+
+    def get_te_matrix(self, in_src_active: np.ndarray = None, in_tgt_active: np.ndarray = None,
+                      in_src_idx_start: int = 0, in_src_idx_end: int = None) -> np.ndarray:
+        """
+        Returns the transfer entropy matrix of shape (num_sources, num_targets) for the current window, or only its
+        rows [in_src_idx_start, in_src_idx_end).
+
+        Parameters
+        ----------
+        in_src_active :
+            If given, TE is only computed for these sources and the other rows are filled with 0.
+        in_tgt_active :
+            If given, TE is only computed for these targets and the other columns are filled with 0.
+        in_src_idx_start :
+            inclusive index of the first source row
+        in_src_idx_end :
+            exclusive index of the last source row
+        """
+        num_sources, num_targets = self.src_joint_counts.shape[:2]
+        if in_src_idx_end is None:
+            in_src_idx_end = num_sources
+        src_active = np.ones(num_sources, dtype=bool) if in_src_active is None else in_src_active
+        src_active = src_active[in_src_idx_start:in_src_idx_end]
+        tgt_active = np.ones(num_targets, dtype=bool) if in_tgt_active is None else in_tgt_active
+        te_matrix = np.zeros((in_src_idx_end - in_src_idx_start, num_targets))
+        if src_active.any() and tgt_active.any():
+            te_matrix[np.ix_(src_active, tgt_active)] = compute_te_matrix_from_counts(
+                self.src_joint_counts[in_src_idx_start:in_src_idx_end][np.ix_(src_active, tgt_active)].astype(np.float64),
+                self.tgt_state_counts[tgt_active], self.obs_end_idx - self.obs_start_idx)
+        return te_matrix
@@ -0,0 +1,5 @@
+""" Include the src folder of the repository for the unit tests """
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -68,13 +68,11 @@ scenario_to_datafiles = { os.path.basename(os.path.dirname(this_path)): [f"s3://
 pprint.pprint(scenario_to_datafiles)
 
 
-def calculate_te_for_scenario(in_scenario_name, 
-                              in_frequency = '12H',
-                              in_min_plat_size = 200,
-                              in_window_shift_by_days = 4,
-                              in_init_window_shift_by_days = 4):
-    print(in_scenario_name)
-
+def create_scenario_spec(in_scenario_name,
+                         in_frequency = '12H',
+                         in_min_plat_size = 200,
+                         in_window_shift_by_days = 4,
+                         in_init_window_shift_by_days = 4):
     START_DATE = scenario_to_date[in_scenario_name] - datetime.timedelta(14)
     END_DATE = scenario_to_date[in_scenario_name] + datetime.timedelta(35)
 
@@ -86,56 +84,64 @@ def calculate_te_for_scenario(in_scenario_name,
         if not os.path.exists(target_dir):
             os.mkdir(target_dir)
 
-    # let data manager handle data
-    data_manager = ing.DataManager(f"./OUTPUTS/{in_scenario_name}")
-    data_manager.read_data_files(scenario_to_datafiles[in_scenario_name])
+    return ing.ScenarioSpec(in_scenario_name,
+                            scenario_to_datafiles[in_scenario_name],
+                            f"./OUTPUTS/{in_scenario_name}",
+                            START_DATE,
+                            END_DATE,
+                            in_require_date_range=True,
+                            in_params={"frequency": in_frequency,
+                                       "min_plat_size": in_min_plat_size,
+                                       "window_shift_by_days": in_window_shift_by_days,
+                                       "init_window_shift_by_days": in_init_window_shift_by_days})
+
+
+def calculate_te_for_scenario(data_manager, in_spec, in_pool):
+    """ Runs in the process of the scenario, after ScenarioBatchRunner has read and preprocessed its data. """
+    in_scenario_name = in_spec.name
+    START_DATE, END_DATE = in_spec.start_date, in_spec.end_date
+    print("Data found in the given range.")
+
+    # generate tables
+    data_manager.generate_data_tables(in_spec.params["min_plat_size"], None)
+
+    print(f"Start: {START_DATE} \nEnd: {END_DATE}")
+    print(f"Period length: {END_DATE - START_DATE}")
     
-    if data_manager.all_osn_msgs_df.datetime.min() <= START_DATE and END_DATE <= data_manager.all_osn_msgs_df.datetime.max():
-        print("Data found in the given range.")
-
-        # preprocess
-        data_manager.preprocess(news_domain_classes_df, START_DATE, END_DATE)
-
-        # generate tables
-        data_manager.generate_data_tables(in_min_plat_size, None)
-
-        print(f"Start: {START_DATE} \nEnd: {END_DATE}")
-        print(f"Period length: {END_DATE - START_DATE}")
-        
-        print(data_manager.indv_actors_df["msgs_count"].value_counts().sort_index(ascending=False).cumsum())
-        x_msgcount, y_numusers = data_manager.indv_actors_df["msgs_count"].value_counts().sort_index(ascending=False).cumsum().reset_index().values.T
-        point = get_elbow(x_msgcount, y_numusers, True, f"./OUTPUTS/{in_scenario_name}/elbow_indvactors_vs_msgcount.png")
-        min_msg_count = point.x
-        
-        print(f"Min msg count per actor: {min_msg_count}")
-        print(f"Users with more than {min_msg_count} messsages posted\n",
-              data_manager.all_users_df[data_manager.all_users_df["msgs_count"] >= min_msg_count].reset_index())
+    print(data_manager.indv_actors_df["msgs_count"].value_counts().sort_index(ascending=False).cumsum())
+    x_msgcount, y_numusers = data_manager.indv_actors_df["msgs_count"].value_counts().sort_index(ascending=False).cumsum().reset_index().values.T
+    point = get_elbow(x_msgcount, y_numusers, True, f"./OUTPUTS/{in_scenario_name}/elbow_indvactors_vs_msgcount.png")
+    min_msg_count = point.x
+    
+    print(f"Min msg count per actor: {min_msg_count}")
+    print(f"Users with more than {min_msg_count} messsages posted\n",
+          data_manager.all_users_df[data_manager.all_users_df["msgs_count"] >= min_msg_count].reset_index())
 
-        print(f"Platform Actors with more than {in_min_plat_size} users\n",
-              data_manager.actors_df[(data_manager.actors_df["actor_type"] == "plat") &
-                                     (data_manager.actors_df["num_users"] >= in_min_plat_size)].reset_index())
+    print(f"Platform Actors with more than {in_spec.params['min_plat_size']} users\n",
+          data_manager.actors_df[(data_manager.actors_df["actor_type"] == "plat") &
+                                 (data_manager.actors_df["num_users"] >= in_spec.params["min_plat_size"])].reset_index())
 
-        actor_id_list = data_manager.indv_actors_df[(data_manager.indv_actors_df["msgs_count"] >= min_msg_count)].index.to_list()
-        print(f"Actors #: {len(actor_id_list)}")
+    actor_id_list = data_manager.indv_actors_df[(data_manager.indv_actors_df["msgs_count"] >= min_msg_count)].index.to_list()
+    print(f"Actors #: {len(actor_id_list)}")
 
+    with ing.TransferEntropyCalculator(data_manager, in_add_superclasses=False, in_pool=in_pool) as te_calculator:
         for AS_GROWING in [True, False]:
-            te_calculator = ing.TransferEntropyCalculator(data_manager, in_add_superclasses=False)
             folder_type = "growing" if AS_GROWING else "moving"
             te_calculator.calculate_te_network_series(actor_id_list, 
                                                       START_DATE, 
                                                       END_DATE, 
-                                                      in_frequency, 
-                                                      in_window_shift_by_days, 
-                                                      in_init_window_shift_by_days, 
+                                                      in_spec.params["frequency"], 
+                                                      in_spec.params["window_shift_by_days"], 
+                                                      in_spec.params["init_window_shift_by_days"], 
                                                       AS_GROWING, 
                                                       os.path.join(data_manager.output_dir_path, f"dynamic/{folder_type}"))
-    else:
-        print("Error: START_DATE and END_DATE are not within the data set.")
+    return len(actor_id_list)
 
 
 if __name__ == "__main__":
     
-    for scenario_name in scenario_to_datafiles.keys():
-        calculate_te_for_scenario(scenario_name)
-        
-        
\ No newline at end of file
+    # reads the raw files of all scenarios once and runs the scenarios concurrently
+    batch_runner = ing.ScenarioBatchRunner(news_domain_classes_df, calculate_te_for_scenario)
+    scenario_to_num_actors = batch_runner.run([create_scenario_spec(scenario_name)
+                                               for scenario_name in scenario_to_datafiles.keys()])
+    pprint.pprint(scenario_to_num_actors)
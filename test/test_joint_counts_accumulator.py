@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from ing.transfer_entropy_matrix import JointCountsAccumulator, calculate_active_te_matrix, calculate_te_matrix, \
+    compute_active_mask, compute_joint_counts
+
+NUM_TIME_STEPS = 130
+
+# growing, moving by 1, 2 and many bins, jumping without overlap, shrinking, moving back and the window edges
+WINDOWS = [(0, 2), (0, 3), (0, 10), (0, 64), (0, 65), (1, 66), (3, 68), (4, 68), (4, 69), (40, 100), (41, 100),
+           (41, 99), (100, 130), (0, 30), (28, 30), (27, 31), (10, 120), (11, 119), (0, 130), (128, 130), (127, 130),
+           (60, 70), (59, 71), (0, 130)]
+
+
+@pytest.fixture
+def class_to_matrix():
+    rng = np.random.default_rng(3)
+    densities = np.linspace(0.05, 0.95, 7)[:, None]
+    class_to_matrix = {this_class: (rng.random((7, NUM_TIME_STEPS)) < densities).astype(np.int8)
+                       for this_class in ["TF", "UM"]}
+    class_to_matrix["TF"][2] = 0
+    class_to_matrix["UM"][4] = 1
+    class_to_matrix["UM"][5, 50:] = 0
+    return class_to_matrix
+
+
+def test_move_to_equals_counts_from_scratch(class_to_matrix):
+    src_matrix, tgt_matrix = class_to_matrix["TF"], class_to_matrix["UM"]
+    accumulator = JointCountsAccumulator("TF", "UM", len(src_matrix), len(tgt_matrix), NUM_TIME_STEPS)
+    for period_start_idx, period_end_idx in WINDOWS:
+        accumulator.move_to(period_start_idx, period_end_idx,
+                            lambda in_class, in_start, in_end: class_to_matrix[in_class][:, in_start:in_end])
+        window_src, window_tgt = src_matrix[:, period_start_idx:period_end_idx], tgt_matrix[:, period_start_idx:period_end_idx]
+        src_joint_counts, tgt_state_counts, num_observations = compute_joint_counts(window_src, window_tgt)
+        assert (accumulator.obs_start_idx, accumulator.obs_end_idx) == (period_start_idx, period_end_idx - 1)
+        assert accumulator.obs_end_idx - accumulator.obs_start_idx == num_observations
+        np.testing.assert_array_equal(accumulator.src_joint_counts, src_joint_counts)
+        np.testing.assert_array_equal(accumulator.tgt_state_counts, tgt_state_counts)
+        np.testing.assert_allclose(accumulator.get_te_matrix(), calculate_te_matrix(window_src, window_tgt),
+                                   rtol=0, atol=1e-12)
+        src_active, tgt_active = compute_active_mask(window_src), compute_active_mask(window_tgt)
+        np.testing.assert_allclose(accumulator.get_te_matrix(src_active, tgt_active, 1, 6),
+                                   calculate_active_te_matrix(window_src, window_tgt, src_active, tgt_active)[1:6],
+                                   rtol=0, atol=1e-12)
+
+
+def test_move_to_short_window(class_to_matrix):
+    accumulator = JointCountsAccumulator("TF", "UM", 7, 7, NUM_TIME_STEPS)
+    with pytest.raises(ValueError):
+        accumulator.move_to(5, 6, lambda in_class, in_start, in_end: class_to_matrix[in_class][:, in_start:in_end])
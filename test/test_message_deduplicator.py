@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from ing.any_data_source_reader import AnyDataSourceReader
+from ing.interface_source_data_reader import MessageDeduplicator
+
+KEY_COLUMNS = ["platform", "source_msg_id"]
+
+
+def create_message_df(in_msg_ids, in_platforms, in_file_idx: int) -> pd.DataFrame:
+    return pd.DataFrame({"platform": in_platforms, "source_msg_id": in_msg_ids,
+                         "file_row": [f"{in_file_idx}_{row_idx}" for row_idx in range(len(in_msg_ids))]})
+
+
+def test_deduplicate_equals_drop_duplicates():
+    rng = np.random.default_rng(0)
+    dfs = [create_message_df([f"https://x/{msg_idx}" for msg_idx in rng.integers(0, 300, 200)],
+                             rng.choice(["twitter.com", "reddit.com"], 200), file_idx) for file_idx in range(5)]
+    # the same messages in a later file, and a file read in two chunks
+    dfs.append(dfs[1].iloc[::3])
+    dfs.append(dfs[2].iloc[50:])
+    file_paths = [f"file_{file_idx}.csv" for file_idx in range(6)] + ["file_5.csv"]
+    deduplicator = MessageDeduplicator()
+    result_df = pd.concat([deduplicator.deduplicate(df, file_path) for df, file_path in zip(dfs, file_paths)])
+    expected_df = pd.concat(dfs).drop_duplicates(KEY_COLUMNS, keep="first")
+    pd.testing.assert_frame_equal(result_df, expected_df)
+    assert len(deduplicator.seen_hashes) == len(expected_df)
+    assert sum(num_msgs for num_msgs, _ in deduplicator.file_to_stats.values()) == sum(len(df) for df in dfs)
+    assert deduplicator.file_to_stats["file_5.csv"] == (len(dfs[5]) + len(dfs[6]), len(dfs[5]) + len(dfs[6]))
+    assert deduplicator.deduplicate(None) is None
+
+
+def write_brandwatch_file(in_file_path, in_msg_ids, in_platforms):
+    df = pd.DataFrame({"Date": "2022-01-10 11:07:50.000", "Author": [f"user{idx % 7}" for idx in range(len(in_msg_ids))],
+                       "Full Text": "no links", "Title": "t", "Thread Id": None, "Thread Author": None,
+                       "Domain": in_platforms, "Url": in_msg_ids, "Display URLs": None, "Expanded URLs": None,
+                       "Media URLs": None, "Original Url": None, "Short URLs": None, "Thread URL": None,
+                       "Broadcast Media Url": None})
+    with open(in_file_path, "w") as file:
+        file.write("Query Name,x\nQuery Id,1\nAuthor,me\nStart,2022\nEnd,2022\nNote,none\n")
+        df.to_csv(file, index=False)
+
+
+def test_read_files_list_equals_drop_duplicates(tmp_path):
+    rng = np.random.default_rng(1)
+    file_paths = [str(tmp_path / f"mentions_{file_idx}.csv") for file_idx in range(4)]
+    for file_path in file_paths:
+        write_brandwatch_file(file_path, [f"https://x/{msg_idx}" for msg_idx in rng.integers(0, 150, 100)],
+                              rng.choice(["twitter.com", "reddit.com"], 100))
+    reader = AnyDataSourceReader()
+    file_to_df = {}
+    for file_path_list in [file_paths[:2], file_paths[1:], file_paths[::-1], file_paths]:
+        result_df = reader.read_files_list(file_path_list, file_to_df)
+        file_to_df_copy = {file_path: df.copy() for file_path, df in file_to_df.items()}
+        expected_df = pd.concat([file_to_df[file_path] for file_path in file_path_list]) \
+            .drop_duplicates(KEY_COLUMNS, keep="first").reset_index(drop=True)
+        pd.testing.assert_frame_equal(result_df, expected_df)
+        # the shared dataframes are reused whole by the next calls
+        result_df.drop(result_df.index, inplace=True)
+        for file_path, df in file_to_df.items():
+            pd.testing.assert_frame_equal(df, file_to_df_copy[file_path])
+    assert sorted(file_to_df) == sorted(file_paths)
+    assert all(len(df) == 100 for df in file_to_df.values())
@@ -0,0 +1,84 @@
+import numpy as np
+import pyinform
+import pytest
+
+from ing.te_backends import TE_BACKENDS, check_te_backend, create_te_backend
+from ing.transfer_entropy_calculator import TransferEntropyCalculator
+
+CLASSES = ["TF", "TM", "UF", "UM", "*"]
+
+
+def create_actor_timeseries_dict_list(in_num_actors: int, in_num_time_steps: int, in_seed: int = 0):
+    """
+    Random actor timeseries dicts of different densities, with constant (all 0 and all 1) series for some actors and
+    classes.
+    """
+    rng = np.random.default_rng(in_seed)
+    densities = np.linspace(0.05, 0.95, in_num_actors)
+    actor_timeseries_dict_list = []
+    for actor_idx, density in enumerate(densities):
+        class_to_timeseries = {this_class: (rng.random(in_num_time_steps) < density).astype(np.int64)
+                               for this_class in CLASSES}
+        if actor_idx % 4 == 0:
+            class_to_timeseries["TF"][:] = 0
+        if actor_idx % 5 == 1:
+            class_to_timeseries["UM"][:] = 1
+        actor_timeseries_dict_list.append(class_to_timeseries)
+    # an actor without any message
+    actor_timeseries_dict_list.append({this_class: np.zeros(in_num_time_steps, dtype=np.int64)
+                                       for this_class in CLASSES})
+    return actor_timeseries_dict_list
+
+
+def calculate_te_network(in_backend: str, in_actor_timeseries_dict_list, in_period_start_idx: int,
+                         in_period_end_idx: int):
+    actor_id_list = [f"actor_{actor_idx}" for actor_idx in range(len(in_actor_timeseries_dict_list))]
+    with TransferEntropyCalculator(None, in_add_superclasses=False, in_backend=in_backend) as te_calculator:
+        return te_calculator.calculate_te_network(actor_id_list, in_period_start_idx, in_period_end_idx,
+                                                  in_actor_timeseries_dict_list)
+
+
+def numba_param():
+    return pytest.param("numba", marks=pytest.mark.skipif(not TE_BACKENDS["numba"].is_available(),
+                                                           reason="numba is not installed"))
+
+
+@pytest.mark.parametrize("in_backend", ["numpy", "bitpacked", numba_param()])
+@pytest.mark.parametrize("in_num_time_steps,in_period_start_idx", [(2, 0), (3, 0), (5, 0), (64, 0), (65, 0),
+                                                                     (130, 0), (130, 7)])
+def test_te_network_equals_pyinform(in_backend, in_num_time_steps, in_period_start_idx):
+    actor_timeseries_dict_list = create_actor_timeseries_dict_list(9, in_num_time_steps, in_num_time_steps)
+    expected_df = calculate_te_network("pyinform", actor_timeseries_dict_list, in_period_start_idx,
+                                       in_num_time_steps)
+    te_df = calculate_te_network(in_backend, actor_timeseries_dict_list, in_period_start_idx, in_num_time_steps)
+    assert te_df[["Source", "Target"]].equals(expected_df[["Source", "Target"]])
+    np.testing.assert_allclose(te_df.iloc[:, 2:].to_numpy(), expected_df.iloc[:, 2:].to_numpy(), rtol=0,
+                               atol=1e-12)
+
+
+def test_numba_backend_check():
+    pytest.importorskip("numba")
+    check_te_backend(create_te_backend("numba"))
+
+
+@pytest.mark.parametrize("in_num_time_steps", [65, 130])
+def test_te_sweep_equals_pyinform(in_num_time_steps):
+    lags, history_lengths = [1, 2, 3], [1, 2]
+    actor_timeseries_dict_list = create_actor_timeseries_dict_list(6, in_num_time_steps, 1)
+    actor_id_list = [f"actor_{actor_idx}" for actor_idx in range(len(actor_timeseries_dict_list))]
+    actor_idx = {actor_id: idx for idx, actor_id in enumerate(actor_id_list)}
+    te_calculator = TransferEntropyCalculator(None, in_add_superclasses=False, in_backend="numpy")
+    te_df = te_calculator.calculate_te_sweep(actor_id_list, 0, in_num_time_steps, actor_timeseries_dict_list, lags,
+                                             history_lengths)
+    assert len(te_df) == len(lags) * len(history_lengths) * len(actor_id_list) * (len(actor_id_list) - 1)
+    pair_columns = [column for column in te_df.columns if column not in ("Source", "Target", "Lag", "History")]
+    for row in te_df.itertuples(index=False):
+        row_dict = row._asdict()
+        src_dict = actor_timeseries_dict_list[actor_idx[row_dict["Source"]]]
+        tgt_dict = actor_timeseries_dict_list[actor_idx[row_dict["Target"]]]
+        lag, history_length = row_dict["Lag"], row_dict["History"]
+        for pair_idx, pair_column in enumerate(pair_columns):
+            src_class, tgt_class = te_calculator.comparison_pairs_list[pair_idx]
+            expected = pyinform.transfer_entropy(src_dict[src_class][:in_num_time_steps - lag + 1],
+                                                 tgt_dict[tgt_class][lag - 1:], history_length)
+            assert abs(row[4 + pair_idx] - expected) < 1e-12, (row_dict, pair_column)